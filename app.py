@@ -1,11 +1,27 @@
+import os
+import time
+_script_start = time.perf_counter()  # measured for time-to-first-render
+
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from src.llm_helpers import load_data, generate_insight
+from src import instrumentation, resources, settings
+from src.answer_cache import get_answer_cache
+from src.charts import CHART_VIEWS, momentum_leaders, render_view
+from src.dashboard_store import DashboardStore
+from src.data_store import (PARTITION_MANIFEST, load_partitioned, open_shared_dataset, partition_info,
+                            source_signature)
+from src.filter_engine import filter_key
+from src.ingest import catch_up, get_ingest_worker, start_ingest_worker
+from src.llm_helpers import load_data, generate_insight, stream_insight
+from src.momentum import LONG_WINDOW, MOMENTUM_COLUMNS, MomentumEngine
+from src.near_duplicates import describe_cluster
+from src.query_client import QueryClient, RemoteStore
 
 
 # --- Enhanced dark mode for all charts with better quality ---
+CHART_THEME = "dark"  # part of the rendered-chart cache key
 plt.style.use('dark_background')
 sns.set_theme(
     style="darkgrid",
@@ -50,7 +66,80 @@ st.markdown(
 
 st.info("ℹ️ Use the sidebar to select filters and generate charts. If no chart appears, adjust your selections for sufficient data.")
 
-df = load_data()
+# Span trace of this rerun, shown by the performance panel at the end of the sidebar.
+# Streamlit reuses the script thread, so a previous rerun that was interrupted
+# before finish() would otherwise leave its trace bound here.
+instrumentation.reset_trace()
+rerun_trace = (instrumentation.start_trace("rerun")
+               if instrumentation.enabled() or st.session_state.get("perf_panel") else None)
+
+@st.cache_resource(show_spinner=False)
+def get_dashboard_store(data_signature):
+    # Keyed by the source signature so an updated CSV rebuilds the indexes.
+    return DashboardStore(open_shared_dataset() if settings.SHARED_DATASET else load_data(), data_signature)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_partition_store(dataset_signature, start_date, end_date, sectors):
+    # Only the months and sectors of the current filter are read from the partitioned dataset.
+    return DashboardStore(load_partitioned(settings.PARTITIONED_DATA_PATH, start_date, end_date, list(sectors)),
+                          dataset_signature,
+                          momentum_loader=lambda: get_partition_momentum(dataset_signature, start_date, end_date))
+
+
+def momentum_history_start(start_date):
+    # The first day whose rows fall in a trailing window ending on start_date.
+    return pd.Timestamp(start_date) - pd.Timedelta(days=LONG_WINDOW - 1)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_partition_momentum(dataset_signature, start_date, end_date):
+    # Every sector (a company's windows count all its rows) from LONG_WINDOW - 1 days before
+    # the range, run through the end date, so windows match the ones over the full dataset.
+    rows = load_partitioned(settings.PARTITIONED_DATA_PATH, momentum_history_start(start_date), end_date,
+                            columns=MOMENTUM_COLUMNS)
+    engine = MomentumEngine(rows)
+    date_max = pd.Timestamp(partition_info(settings.PARTITIONED_DATA_PATH)['date_max'])
+    engine.extend_to(min(pd.Timestamp(end_date), date_max))
+    return engine
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_client(base_url):
+    # Thin-client mode: filters, KPIs and answers are computed by the shared query service.
+    return QueryClient(base_url)
+
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_endpoint(port):
+    # One Prometheus /metrics endpoint per dashboard process.
+    return instrumentation.start_metrics_server(port=port)
+
+
+if instrumentation.enabled() and settings.METRICS_PORT:
+    start_metrics_endpoint(settings.METRICS_PORT)
+
+
+if settings.QUERY_SERVICE_URL:
+    # /meta is read on every rerun, so the data version keying the charts follows the service's ingest commits.
+    store = RemoteStore(get_query_client(settings.QUERY_SERVICE_URL))
+    min_date, max_date = pd.Timestamp(store.meta['date_min']), pd.Timestamp(store.meta['date_max'])
+    sectors, sentiments = store.meta['sectors'], store.meta['sentiments']
+elif settings.USE_PARTITIONED_DATA:
+    # Sidebar options come from the dataset manifest; rows are loaded per filter below.
+    dataset = partition_info(settings.PARTITIONED_DATA_PATH)
+    dataset_signature = source_signature(os.path.join(settings.PARTITIONED_DATA_PATH, PARTITION_MANIFEST))
+    min_date, max_date = pd.Timestamp(dataset['date_min']), pd.Timestamp(dataset['date_max'])
+    sectors, sentiments = dataset['sector_values'], dataset['sentiment_values']
+else:
+    store = get_dashboard_store(source_signature(settings.DATA_PATH))
+    # Rows committed by live ingestion (this or another process) since the last rerun.
+    catch_up(store)
+    if settings.INGEST:
+        start_ingest_worker(store)
+    engine = store.engine
+    min_date, max_date = (pd.Timestamp(d) for d in engine.date_range())
+    sectors, sentiments = engine.values('sector'), engine.values('sentiment')
 
 left, right = st.columns([1, 2])
 
@@ -59,15 +148,11 @@ with right:
 
     with st.sidebar:
         st.header("Filter Options")
-        min_date, max_date = df['date'].min(), df['date'].max()
         start_date, end_date = st.date_input(
             "Select Date Range",
             value=(min_date, max_date), min_value=min_date, max_value=max_date
         )
 
-        sectors = df['sector'].unique().tolist()
-        sentiments = df['sentiment'].unique().tolist()
-
         # Start with no default selection, user selects at least one
         selected_sectors = st.multiselect(
             "Select Sector(s)", options=sectors,
@@ -78,114 +163,75 @@ with right:
             default=[]
         )
 
-    # If user hasn't selected sectors or sentiments - empty dataframe
+    # If user hasn't selected sectors or sentiments - empty selection
     if not selected_sectors or not selected_sentiments:
-        filtered_df = pd.DataFrame()  # empty df
+        selection = None
+        total_records = 0
     else:
-        filtered_df = df[
-            (df['date'] >= pd.to_datetime(start_date)) &
-            (df['date'] <= pd.to_datetime(end_date)) &
-            (df['sector'].isin(selected_sectors)) &
-            (df['sentiment'].isin(selected_sentiments))
-        ]
-
-    st.markdown(f"### Displaying {len(filtered_df)} records after filtering")
-
-    dashboard_options = [
-        "Price Change Over Time",
-        "Trading Volume by Sector",
-        "Sentiment Distribution",
-        "Emotion Trends Over Time"
-    ]
-    selected_dashboard = st.selectbox("Select Dashboard View", options=dashboard_options)
-
-    def darkize_ax(ax):
-        ax.tick_params(colors="white", which="both")
-        ax.xaxis.label.set_color('white')
-        ax.yaxis.label.set_color('white')
-        ax.title.set_color('white')
-        plt.setp(ax.get_xticklabels(), color="white")
-        plt.setp(ax.get_yticklabels(), color="white")
-        for spine in ax.spines.values():
-            spine.set_edgecolor("white")
-        legend = ax.get_legend()
-        if legend:
-            for text in legend.get_texts():
-                text.set_color('white')
-            legend.get_frame().set_edgecolor('white')
-            legend.get_frame().set_facecolor('#181826')
-
-    if filtered_df.empty:
+        filters = dict(sectors=selected_sectors, sentiments=selected_sentiments)
+        if settings.USE_PARTITIONED_DATA and not settings.QUERY_SERVICE_URL:
+            store = get_partition_store(dataset_signature, start_date, end_date, tuple(sorted(selected_sectors)))
+        with instrumentation.span("filter") as filter_span:
+            selection = store.select(start_date, end_date, **filters)
+            total_records = len(selection)
+            filter_span.set(rows=total_records)
+
+        def rollup(*by):
+            return store.rollup(start_date, end_date, by=by, **filters)
+
+        def momentum(level, latest=False):
+            # Rolling windows run over every sentiment; only the date range and sectors apply.
+            return store.momentum(level, start_date, end_date, sectors=selected_sectors, latest=latest)
+
+    st.markdown(f"### Displaying {total_records} records after filtering")
+
+    selected_dashboard = st.selectbox("Select Dashboard View", options=CHART_VIEWS)
+
+    if total_records == 0:
         st.warning("No data available for selected filters. Please select at least one sector and one sentiment in the sidebar.")
     else:
+        # All charts and KPIs below are rolled up from the aggregate cube.
+        with instrumentation.span("kpis"):
+            by_sector = rollup('sector')
+            by_sentiment = rollup('sentiment')
         try:
-            if selected_dashboard == "Price Change Over Time":
-                if filtered_df['sector'].nunique() < 1 or filtered_df['date'].nunique() < 2:
-                    st.info("Not enough data to plot trends. Try broadening your selection.")
-                else:
-                    st.subheader("Price Change Over Time")
-                    fig, ax = plt.subplots(figsize=(13, 6))
-                    sns.lineplot(data=filtered_df, x='date', y='price_change', hue='sector', marker="o", ax=ax, linewidth=2.5)
-                    ax.set_ylabel("Price Change (%)")
-                    ax.set_xlabel("Date")
-                    ax.set_title("Price Change Trends by Sector")
-                    darkize_ax(ax)
-                    plt.xticks(rotation=45)
-                    st.pyplot(fig)
-                    plt.clf()
-
-            elif selected_dashboard == "Trading Volume by Sector":
-                if filtered_df['sector'].nunique() < 1:
-                    st.info("Not enough sectors for a trading volume chart. Try more sectors.")
-                else:
-                    st.subheader("Trading Volume by Sector")
-                    fig, ax = plt.subplots(figsize=(10, 4))
-                    volume_by_sector = filtered_df.groupby('sector')['trading_volume_crore'].sum().sort_values(ascending=False)
-                    volume_by_sector.plot(kind='bar', ax=ax)
-                    ax.set_ylabel("Trading Volume (cr)")
-                    ax.set_title("Trading Volume by Sector")
-                    darkize_ax(ax)
-                    st.pyplot(fig)
-                    plt.clf()
-
-            elif selected_dashboard == "Sentiment Distribution":
-                if filtered_df['sentiment'].nunique() < 1:
-                    st.info("No sentiment data to display.")
-                else:
-                    st.subheader("Sentiment Distribution")
-                    fig, ax = plt.subplots(figsize=(10, 4))
-                    sentiment_counts = filtered_df['sentiment'].value_counts()
-                    sentiment_counts.plot(kind='bar', ax=ax)
-                    ax.set_ylabel("Count")
-                    ax.set_title("Sentiment Distribution")
-                    darkize_ax(ax)
-                    st.pyplot(fig)
-                    plt.clf()
-
-            elif selected_dashboard == "Emotion Trends Over Time":
-                if filtered_df['emotion'].nunique() < 1 or filtered_df['date'].nunique() < 2:
-                    st.info("Not enough emotion data to plot trends.")
-                else:
-                    st.subheader("Emotion Trends Over Time")
-                    fig, ax = plt.subplots(figsize=(12, 5))
-                    emotion_date_counts = filtered_df.groupby(['date', 'emotion']).size().unstack(fill_value=0)
-                    emotion_date_counts.plot(kind='line', ax=ax)
-                    ax.set_ylabel("Count")
-                    ax.set_xlabel("Date")
-                    ax.set_title("Emotions Over Time")
-                    plt.xticks(rotation=45)
-                    darkize_ax(ax)
-                    st.pyplot(fig)
-                    plt.clf()
+            # Rendered charts are cached per (view, filter fingerprint, data version, theme).
+            chart_key = (filter_key(start_date, end_date, **filters), store.signature, store.version)
+            with instrumentation.span("chart", view=selected_dashboard) as chart_span:
+                chart = render_view(selected_dashboard, rollup, chart_key, theme=CHART_THEME, momentum=momentum)
+                chart_span.set(cached=chart['cached'])
+            if chart['image'] is None:
+                st.info(chart['message'])
+            else:
+                st.subheader(selected_dashboard)
+                st.image(chart['image'], width="stretch")
+                st.caption(
+                    "Chart served from cache" if chart['cached']
+                    else f"Chart rendered in {chart['seconds'] * 1000:.0f} ms"
+                )
+            if selected_dashboard == "Company Momentum" and chart['image'] is not None:
+                leaders = momentum_leaders(momentum('company', latest=True))
+                ranked_on = f"Ranked on {leaders['date'].iloc[0]:%d %b %Y}, over trailing 7- and 30-day windows"
+                if settings.USE_PARTITIONED_DATA and not settings.QUERY_SERVICE_URL:
+                    # Only the windows' history is loaded, so the cumulative change starts there.
+                    history_start = max(momentum_history_start(start_date), min_date)
+                    ranked_on += f"; cumulative price change since {history_start:%d %b %Y}"
+                st.caption(ranked_on)
+                metrics = [col for col in leaders.columns if col not in ('rank', 'sectors', 'date')]
+                st.dataframe(leaders[['rank', 'sectors'] + metrics], column_config={
+                    col: st.column_config.NumberColumn(format="%.0f" if col.startswith('news_') else "%.2f")
+                    for col in metrics
+                })
+                company = st.selectbox("Latest news for", options=list(leaders.index))
+                st.dataframe(store.company_news(company, start_date, end_date), hide_index=True)
         except Exception as e:
             st.error(f"An error occurred generating the chart: {e}")
 
         # --- Filter Summary and Stats with edge-safety ---
         summary_col, stat_col = st.columns([3, 2])
         with summary_col:
-            total_records = len(filtered_df)
-            avg_price_change = filtered_df.groupby('sector')['price_change'].mean().sort_values(ascending=False)
-            top_volume = filtered_df.groupby('sector')['trading_volume_crore'].sum().sort_values(ascending=False).head(3)
+            avg_price_change = by_sector['price_change_mean'].sort_values(ascending=False)
+            top_volume = by_sector['trading_volume_crore_sum'].sort_values(ascending=False).head(3)
 
             def get_top(top_vol, idx):
                 if len(top_vol) > idx:
@@ -209,7 +255,7 @@ with right:
 
         with stat_col:
             if selected_dashboard != "Sentiment Distribution":
-                sentiment_counts = filtered_df['sentiment'].value_counts()
+                sentiment_counts = by_sentiment['count'].sort_values(ascending=False)
                 st.markdown("#### Sentiment Breakdown")
                 if not sentiment_counts.empty:
                     most_common = sentiment_counts.idxmax()
@@ -218,7 +264,7 @@ with right:
                 else:
                     st.markdown("_No sentiment data in filter._")
 
-            avg_by_selected = filtered_df.groupby('sector')['price_change'].mean().reindex(selected_sectors).dropna()
+            avg_by_selected = by_sector['price_change_mean'].reindex(selected_sectors).dropna()
             if not avg_by_selected.empty:
                 st.markdown("#### Avg. Price Change per Selected Sector")
                 st.markdown(
@@ -233,16 +279,117 @@ with right:
 with left:
     st.header("💬 Analyst AI Chatbot")
 
-    if filtered_df.empty:
+    if total_records == 0:
         st.info("Adjust filters on the right to unlock analysis.")
     else:
         user_question = st.text_input("Ask your question:", key="user_input")
+        stream_answer = st.toggle("Stream answer", value=True)
         if st.button("Ask Analyst AI"):
             if not user_question.strip():
                 st.warning("Please type a question!")
+            elif stream_answer:
+                # Sources are shown as soon as retrieval finishes, then tokens as they arrive.
+                # A rerun closes the event stream, which cancels the LLM request.
+                if settings.QUERY_SERVICE_URL:
+                    events = store.client.stream(user_question, start_date, end_date, **filters)
+                else:
+                    events = stream_insight(user_question, selection.frame, [])
+                stream_stats = {}
+                try:
+                    for kind, payload in events:
+                        if kind == 'sources':
+                            with st.expander(f"📚 Retrieved sources ({len(payload)})"):
+                                for doc in payload:
+                                    st.text(doc.page_content)
+                                    similar = describe_cluster(doc.metadata)
+                                    if similar:
+                                        st.caption(similar)
+                            break
+
+                    def answer_tokens():
+                        for kind, payload in events:
+                            if kind == 'token':
+                                yield payload
+                            elif kind == 'done':
+                                stream_stats.update(payload)
+
+                    st.markdown("### Overview & Recommendations")
+                    st.write_stream(answer_tokens())
+                except (ValueError, TimeoutError) as e:
+                    st.error(str(e))
+                finally:
+                    events.close()
+                if stream_stats.get('cached'):
+                    st.caption("⚡ Served from the answer cache")
+                elif stream_stats.get('time_to_first_token') is not None:
+                    st.caption(
+                        f"First token after {stream_stats['time_to_first_token']:.2f}s, "
+                        f"complete in {stream_stats['total_seconds']:.2f}s"
+                    )
             else:
                 # Directly call generate_insight without chat history or spinner for faster response
-                answer, sources = generate_insight(user_question, filtered_df, [])
-                
-                st.markdown("### Overview & Recommendations")
-                st.markdown(answer)
+                try:
+                    if settings.QUERY_SERVICE_URL:
+                        answer, sources = store.client.ask(user_question, start_date, end_date, **filters)
+                    else:
+                        answer, sources = generate_insight(user_question, selection.frame, [])
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    st.markdown("### Overview & Recommendations")
+                    st.markdown(answer)
+                    if settings.QUERY_SERVICE_URL:
+                        cache_stats = store.client.stats()['answer_cache']
+                    else:
+                        cache_stats = get_answer_cache().stats()
+                    st.caption(
+                        f"Answer cache: {cache_stats['hits']} exact / {cache_stats['semantic_hits']} similar hits, "
+                        f"{cache_stats['misses']} misses, {cache_stats['entries']} entries"
+                    )
+
+# --- Startup timing and background warm-up of the chatbot resources ---
+if "first_render_seconds" not in st.session_state:
+    st.session_state["first_render_seconds"] = time.perf_counter() - _script_start
+    resources.record_timing("first_render", st.session_state["first_render_seconds"])
+if settings.WARM_UP_ON_START and not settings.QUERY_SERVICE_URL:
+    resources.warm_up(background=True)
+
+ingest_worker = get_ingest_worker()
+if ingest_worker is not None:
+    with st.sidebar.expander("📥 Live ingestion"):
+        ingest_stats = ingest_worker.stats()
+        lag = ingest_stats['lag_seconds']
+        st.caption(
+            f"{ingest_stats['rows']:,} rows in {ingest_stats['batches']} batches, "
+            f"{ingest_stats['pending_rows']:,} pending"
+        )
+        if ingest_stats['rows_per_second']:
+            st.caption(f"{ingest_stats['rows_per_second']:,.0f} rows/s while committing, "
+                       f"{ingest_stats['rows_per_minute']:,.0f} rows/min overall")
+        if lag['p50'] is not None:
+            st.caption(f"Lag p50 {lag['p50']:.1f}s · p95 {lag['p95']:.1f}s · last {lag['last']:.1f}s")
+
+with st.sidebar.expander("⏱️ Startup timings"):
+    st.json({"session_first_render": st.session_state["first_render_seconds"], **resources.startup_timings()})
+
+# --- Performance panel: where the time of this rerun went ---
+show_performance = st.sidebar.toggle("⏱️ Performance panel", key="perf_panel")
+if rerun_trace is not None:
+    rerun_trace.finish()
+    if show_performance:
+        spans = rerun_trace.rows()
+        with st.sidebar.expander("Latest rerun", expanded=True):
+            st.caption(f"Rerun took {rerun_trace.root.seconds * 1000:.0f} ms")
+            st.dataframe(pd.DataFrame({
+                "stage": ["· " * row['depth'] + row['name'] for row in spans],
+                "at ms": [row['offset'] * 1000 for row in spans],
+                "ms": [row['seconds'] * 1000 for row in spans],
+                "share": [row['share'] for row in spans],
+                "rows": [row.get('rows') for row in spans],
+                "Δ MB": [row['memory_delta_mb'] for row in spans],
+            }), hide_index=True, column_config={
+                "at ms": st.column_config.NumberColumn(format="%.0f"),
+                "ms": st.column_config.NumberColumn(format="%.1f"),
+                "share": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="percent"),
+                "Δ MB": st.column_config.NumberColumn(format="%.1f"),
+            })
@@ -0,0 +1 @@
+# Makes the repository root importable (``import src...``) when pytest runs the tests/ directory.
@@ -0,0 +1,152 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.filter_engine import filter_key
+
+CUBE_DIMENSIONS = ['date', 'sector', 'sentiment', 'emotion']
+CUBE_MEASURES = ['price_change', 'trading_volume_crore']
+
+
+def _measure_columns():
+    cols = ['count']
+    for measure in CUBE_MEASURES:
+        cols += [f'{measure}_sum', f'{measure}_sumsq']
+    return cols
+
+
+class AggregateCube:
+    """
+    Pre-aggregated (date, sector, sentiment, emotion) cube of the news data.
+
+    Each cell stores the row count plus sum and sum of squares of price change
+    and trading volume, which is enough to answer counts, means, totals and
+    standard deviations for any filter by rolling up cells instead of rows.
+    The cube size is bounded by the number of distinct dimension combinations,
+    so dashboard cost no longer grows with the raw row count.
+
+    Args:
+        df (pd.DataFrame): Initial rows to aggregate (optional).
+        cache_size (int): Number of rollup results to memoize.
+    """
+
+    def __init__(self, df=None, cache_size=256):
+        self.cells = pd.DataFrame(columns=CUBE_DIMENSIONS + _measure_columns())
+        self._dates = np.array([], dtype='datetime64[ns]')
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        if df is not None:
+            self.append(df)
+
+    def __len__(self):
+        return len(self.cells)
+
+    @property
+    def total_rows(self):
+        return int(self.cells['count'].sum())
+
+    @staticmethod
+    def aggregate(df):
+        """
+        Aggregate raw rows into cube cells.
+
+        Args:
+            df (pd.DataFrame): Rows with the cube dimension and measure columns.
+
+        Returns:
+            pd.DataFrame: One row per (date, sector, sentiment, emotion).
+        """
+        frame = df[CUBE_DIMENSIONS].copy()
+        frame['count'] = 1
+        for measure in CUBE_MEASURES:
+            values = df[measure].to_numpy(dtype='float64')
+            frame[f'{measure}_sum'] = values
+            frame[f'{measure}_sumsq'] = values * values
+        for col in CUBE_DIMENSIONS[1:]:
+            frame[col] = frame[col].astype(object)
+        cells = frame.groupby(CUBE_DIMENSIONS, sort=False).sum().reset_index()
+        return cells
+
+    def append(self, df):
+        """
+        Fold new rows into the cube; cost is proportional to the new rows
+        plus the cube size, not to the full history.
+
+        Args:
+            df (pd.DataFrame): Newly appended rows.
+        """
+        if len(df) == 0:
+            return
+        partial = self.aggregate(df)
+        with self._lock:
+            if len(self.cells):
+                cells = pd.concat([self.cells, partial], ignore_index=True)
+                cells = cells.groupby(CUBE_DIMENSIONS, sort=False).sum().reset_index()
+            else:
+                cells = partial
+            cells = cells.sort_values('date', kind='stable').reset_index(drop=True)
+            self.cells = cells
+            self._dates = cells['date'].values
+            self._cache.clear()
+
+    def _slice(self, key):
+        start, end, sectors, sentiments, emotions = key
+        cells = self.cells
+        lo = np.searchsorted(self._dates, np.datetime64(start), side='left')
+        hi = np.searchsorted(self._dates, np.datetime64(end), side='right')
+        cells = cells.iloc[lo:max(lo, hi)]
+        for col, values in (('sector', sectors), ('sentiment', sentiments), ('emotion', emotions)):
+            if values is not None:
+                cells = cells[cells[col].isin(values)]
+        return cells
+
+    def rollup(self, start_date, end_date, sectors=None, sentiments=None, emotions=None, by=('sector',)):
+        """
+        Roll up the cube for a filter selection.
+
+        Args:
+            start_date: First date to include.
+            end_date: Last date to include.
+            sectors (list): Sectors to keep, or None for all.
+            sentiments (list): Sentiments to keep, or None for all.
+            emotions (list): Emotions to keep, or None for all.
+            by (tuple): Dimensions to group by; empty for a grand total.
+
+        Returns:
+            pd.DataFrame: ``count`` plus ``<measure>_sum``, ``<measure>_mean``
+            and ``<measure>_std`` for price_change and trading_volume_crore,
+            indexed by ``by``.
+        """
+        key = filter_key(start_date, end_date, sectors, sentiments, emotions)
+        cache_key = (key, tuple(by))
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                return cached
+            cells = self._slice(key)
+
+        measures = _measure_columns()
+        if by:
+            grouped = cells.groupby(list(by), sort=True)[measures].sum()
+        else:
+            grouped = cells[measures].sum().to_frame().T
+        result = pd.DataFrame({'count': grouped['count'].astype('int64')}, index=grouped.index)
+        count = grouped['count'].replace(0, np.nan)
+        for measure in CUBE_MEASURES:
+            total = grouped[f'{measure}_sum']
+            mean = total / count
+            # Sample variance (ddof=1) from the running sums, matching pandas' std().
+            variance = ((grouped[f'{measure}_sumsq'] - count * mean ** 2) / (count - 1)).clip(lower=0)
+            result[f'{measure}_sum'] = total
+            result[f'{measure}_mean'] = mean
+            result[f'{measure}_std'] = np.sqrt(variance)
+
+        with self._lock:
+            self._cache[cache_key] = result
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
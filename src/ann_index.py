@@ -0,0 +1,124 @@
+import math
+import re
+
+import faiss
+import numpy as np
+
+from src import settings
+
+
+def resolve_factory(spec, num_vectors):
+    """
+    Turn the configured index spec into a faiss index_factory string.
+
+    ``auto`` picks by corpus size: exact Flat for small corpora, HNSW32 for
+    medium ones and IVF-PQ beyond that. Any other value is used as-is
+    (e.g. "Flat", "SQ8", "HNSW32", "IVF1024,PQ48").
+
+    Args:
+        spec (str): Factory string or "auto".
+        num_vectors (int): Number of vectors the index will hold.
+
+    Returns:
+        str: faiss index_factory string.
+    """
+    if spec != 'auto':
+        return spec
+    if num_vectors < 50_000:
+        return 'Flat'
+    if num_vectors < 1_000_000:
+        return 'HNSW32'
+    nlist = 2 ** round(math.log2(4 * math.sqrt(num_vectors)))
+    return f'IVF{nlist},PQ48'
+
+
+def _nlist(spec):
+    match = re.search(r'IVF(\d+)', spec)
+    return int(match.group(1)) if match else 0
+
+
+def prepare_index(index):
+    """
+    Make an index usable by the dashboard retrieval code: IVF indexes get a
+    hashtable direct map so vectors can be reconstructed (filtered search)
+    and removed (incremental updates).
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """
+    Apply query-time parameters; ones that do not apply to the index type
+    are skipped.
+
+    Args:
+        index (faiss.Index): Index to tune.
+        nprobe (int): IVF lists visited per query. Defaults to settings.INDEX_NPROBE.
+        ef_search (int): HNSW candidate list size. Defaults to settings.INDEX_EF_SEARCH.
+    """
+    params = {
+        'nprobe': settings.INDEX_NPROBE if nprobe is None else nprobe,
+        'efSearch': settings.INDEX_EF_SEARCH if ef_search is None else ef_search,
+    }
+    space = faiss.ParameterSpace()
+    for name, value in params.items():
+        try:
+            space.set_index_parameter(index, name, value)
+        except RuntimeError:
+            pass  # not an IVF / HNSW index
+    return index
+
+
+def supports_removal(index):
+    """
+    Whether vectors can be deleted in place. LangChain's FAISS.delete assumes
+    remove_ids shifts later vectors down, which only flat-code indexes (Flat,
+    SQ, PQ) do; IVF keeps the old ids and HNSW cannot remove at all.
+    """
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlatCodes)
+
+
+def train_index(vectors, spec, train_size=None, seed=0):
+    """
+    Create and train an empty FAISS index from a factory string.
+
+    Args:
+        vectors (np.ndarray): float32 matrix the index is built for (training sample source).
+        spec (str): faiss index_factory string or "auto" (see resolve_factory).
+        train_size (int): Max vectors sampled for training. Defaults to settings.INDEX_TRAIN_SIZE.
+        seed (int): Seed for the training sample.
+
+    Returns:
+        faiss.Index: Trained, empty index with search parameters applied.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    spec = resolve_factory(spec, len(vectors))
+    nlist = _nlist(spec)
+    if nlist and len(vectors) < nlist:
+        raise ValueError(f"Index '{spec}' needs at least {nlist} vectors to train, got {len(vectors)}.")
+    index = faiss.index_factory(vectors.shape[1], spec, faiss.METRIC_L2)
+    if not index.is_trained:
+        train_size = train_size or settings.INDEX_TRAIN_SIZE
+        sample = vectors
+        if len(vectors) > train_size:
+            rng = np.random.default_rng(seed)
+            sample = vectors[np.sort(rng.choice(len(vectors), train_size, replace=False))]
+        index.train(sample)
+    prepare_index(index)
+    set_search_params(index)
+    return index
+
+
+def build_index(vectors, spec, train_size=None, seed=0):
+    """Trained index (see train_index) holding ``vectors`` at positions 0..n-1."""
+    index = train_index(vectors, spec, train_size, seed)
+    index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    return index
+
+
+def index_size_bytes(index):
+    """Serialized size of the index, i.e. what index.faiss takes on disk."""
+    return int(faiss.serialize_index(index).nbytes)
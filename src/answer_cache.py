@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from src import settings
+from src.instrumentation import traced
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    embedding BLOB,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_fingerprint ON answers (fingerprint);
+"""
+
+
+def normalize_question(question):
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def data_version():
+    """
+    Source signature of the dataset the dashboard serves: the CSV, or the
+    partitioned dataset's manifest in partitioned mode (None if missing).
+    """
+    from src.data_store import PARTITION_MANIFEST, source_signature
+
+    path = (os.path.join(settings.PARTITIONED_DATA_PATH, PARTITION_MANIFEST) if settings.USE_PARTITIONED_DATA
+            else settings.DATA_PATH)
+    try:
+        return source_signature(path)
+    except OSError:
+        return None
+
+
+def selection_fingerprint(filtered_df, version=None):
+    """
+    Fingerprint of a filter selection: hash of the dataset version and the
+    selected row ids.
+
+    Two selections with the same rows (whatever widgets produced them) share
+    cached answers; any change to the selected rows changes the fingerprint.
+    Row ids restart with a regenerated dataset, so its version is part of the
+    hash and answers about the previous data are not served.
+
+    Args:
+        filtered_df (pd.DataFrame): Selected rows indexed by row id.
+        version: JSON-serialisable dataset version. Defaults to data_version().
+    """
+    version = data_version() if version is None else version
+    row_ids = np.sort(np.asarray(filtered_df.index.values, dtype=np.int64))
+    digest = hashlib.sha1(json.dumps(version).encode('utf-8'))
+    digest.update(row_ids.tobytes())
+    return digest.hexdigest()
+
+
+def _serialize_sources(sources):
+    return json.dumps([
+        {'page_content': doc.page_content, 'metadata': dict(doc.metadata)} for doc in sources
+    ])
+
+
+def _deserialize_sources(payload):
+    from langchain_core.documents import Document
+    return [Document(page_content=d['page_content'], metadata=d['metadata']) for d in json.loads(payload)]
+
+
+class AnswerCache:
+    """
+    Persistent cache of Analyst AI answers keyed by filter fingerprint + question.
+
+    Exact (normalized) questions are looked up by key. Otherwise the question is
+    embedded and compared with the cached questions for the same fingerprint;
+    the best match above ``similarity_threshold`` is served. Entries expire
+    after ``ttl_seconds`` and the least recently used ones are evicted beyond
+    ``max_entries``.
+
+    Args:
+        path (str): SQLite file.
+        max_entries (int): Size bound.
+        ttl_seconds (float): Entry lifetime.
+        similarity_threshold (float): Minimum cosine similarity for a near-duplicate hit.
+        embed_fn (callable): text -> vector; defaults to the shared embedding model.
+    """
+
+    def __init__(self, path=None, max_entries=None, ttl_seconds=None, similarity_threshold=None, embed_fn=None):
+        self.path = path or settings.ANSWER_CACHE_PATH
+        self.max_entries = max_entries or settings.ANSWER_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or settings.ANSWER_CACHE_TTL_SECONDS
+        self.similarity_threshold = similarity_threshold or settings.ANSWER_CACHE_SIMILARITY
+        self._embed_fn = embed_fn
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'semantic_hits': 0, 'misses': 0}
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _embed(self, text):
+        if self._embed_fn is None:
+            from src import resources
+            self._embed_fn = resources.get_embeddings().embed_query
+        vector = np.asarray(self._embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _key(fingerprint, question):
+        return hashlib.sha256(f"{fingerprint}\n{normalize_question(question)}".encode('utf-8')).hexdigest()
+
+    @traced("answer_cache.get")
+    def get(self, fingerprint, question):
+        """
+        Look up a cached answer.
+
+        Returns:
+            tuple or None: (answer, sources) on a hit, None on a miss.
+        """
+        now = time.time()
+        cutoff = now - self.ttl_seconds
+        key = self._key(fingerprint, question)
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT answer, sources FROM answers WHERE key = ? AND created >= ?", (key, cutoff)
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+                self._counters['hits'] += 1
+                return row[0], _deserialize_sources(row[1])
+            candidates = conn.execute(
+                "SELECT key, embedding FROM answers WHERE fingerprint = ? AND created >= ? AND embedding IS NOT NULL",
+                (fingerprint, cutoff)
+            ).fetchall()
+
+        query = None
+        if candidates:
+            try:
+                query = self._embed(question)
+            except Exception:
+                candidates = []  # embedder unavailable: exact matches only
+        if candidates:
+            matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in candidates])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity_threshold:
+                match_key = candidates[best][0]
+                with self._lock, self._connect() as conn:
+                    row = conn.execute("SELECT answer, sources FROM answers WHERE key = ?", (match_key,)).fetchone()
+                    if row:
+                        conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, match_key))
+                        self._counters['semantic_hits'] += 1
+                        return row[0], _deserialize_sources(row[1])
+
+        with self._lock:
+            self._counters['misses'] += 1
+        return None
+
+    @traced("answer_cache.put")
+    def put(self, fingerprint, question, answer, sources):
+        """Store an answer, then expire and evict entries beyond the bounds."""
+        now = time.time()
+        try:
+            embedding = self._embed(question).tobytes()
+        except Exception:
+            embedding = None  # exact-match caching still works without the embedder
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(fingerprint, question), fingerprint, question, answer,
+                 _serialize_sources(sources), embedding, now, now)
+            )
+            conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                " SELECT key FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current entry count."""
+        with self._lock, self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            counters = dict(self._counters)
+        lookups = sum(counters.values())
+        counters['entries'] = entries
+        counters['hit_rate'] = (counters['hits'] + counters['semantic_hits']) / lookups if lookups else 0.0
+        return counters
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM answers")
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """Process-wide AnswerCache configured from settings."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = AnswerCache()
+        return _default_cache
@@ -0,0 +1,381 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import tracemalloc
+import zlib
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from langchain_core.embeddings import Embeddings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from src import settings
+from src.dashboard_store import DashboardStore
+from src.data_generation import write_dataset
+from src.data_processing import aggregate_trends, clean_data, feature_engineering, preprocess_partitioned
+from src.data_store import (clear_memory_cache, load_dataset, load_partitioned, open_shared_dataset,
+                            publish_shared_dataset)
+from src.momentum import MomentumEngine
+from src.trend_rollup import TrendRollup
+
+DEFAULT_SIZES = [2_500, 50_000, 1_000_000, 10_000_000]
+DEFAULT_OUTPUT = "benchmarks/results.json"
+BENCH_DATA_DIR = os.path.join(settings.CACHE_DIR, "benchmarks")
+QUERIES = [
+    "Which banking stocks rallied after strong results?",
+    "Negative news about pharma exports",
+    "IT sector layoffs and weak guidance",
+    "Auto sales growth during the festive season",
+    "Energy companies hit by crude oil prices",
+]
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Cheap deterministic embeddings (hashed bag of words, L2-normalised).
+
+    Lets the index build and search stages be benchmarked without loading a
+    sentence-transformers model; the FAISS side of the cost is unchanged.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            vector[zlib.crc32(token.encode('utf-8')) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def dataset_path(num_rows, data_dir=BENCH_DATA_DIR):
+    """Generate (once) and return the seeded benchmark CSV with ``num_rows`` rows."""
+    path = os.path.join(data_dir, f"news_{num_rows}.csv")
+    if not os.path.exists(path):
+        print(f"🛠️ Generating {num_rows:,} rows -> {path}")
+        write_dataset(path, num_rows, start_year=2020, max_days=5 * 365, seed=42)
+    return path
+
+
+def random_filters(rng, store, count):
+    """Sidebar-like filter selections: a date window plus a few sectors and sentiments."""
+    start, end = (pd.Timestamp(value) for value in store.engine.date_range())
+    span = max((end - start).days, 1)
+    sectors = store.engine.values('sector')
+    sentiments = store.engine.values('sentiment')
+    filters = []
+    for _ in range(count):
+        first = int(rng.integers(0, span))
+        last = int(rng.integers(first, span + 1))
+        filters.append((
+            start + pd.Timedelta(days=first),
+            start + pd.Timedelta(days=last),
+            list(rng.choice(sectors, size=int(rng.integers(1, len(sectors) + 1)), replace=False)),
+            list(rng.choice(sentiments, size=int(rng.integers(1, len(sentiments) + 1)), replace=False)),
+        ))
+    return filters
+
+
+def measure(fn, setup=None, repeat=3, memory=True):
+    """
+    Time ``fn`` (best of ``repeat`` runs) and record its peak traced memory.
+
+    ``setup`` runs before every call, outside the timed region, and its
+    return value is passed to ``fn``. Memory is measured in an extra run so
+    tracing overhead does not distort the timings.
+
+    Returns:
+        dict: ``seconds`` and, when ``memory`` is set, ``peak_mb``.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    result = {'seconds': best}
+    if memory:
+        args = setup() if setup else ()
+        tracemalloc.start()
+        try:
+            fn(*args)
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def bench_size(num_rows, repeat=3, memory=True, queries=50, index_rows=200_000, embeddings=None):
+    """
+    Run every stage for one dataset size.
+
+    Query-style stages (filtering, KPIs, retrieval) report the time per call
+    averaged over ``queries`` calls. The vector index is built over at most
+    ``index_rows`` rows.
+
+    Returns:
+        dict: Stage name -> measurement dict.
+    """
+    path = dataset_path(num_rows)
+    cache_dir = os.path.join(BENCH_DATA_DIR, f"cache_{num_rows}")
+    results = {}
+
+    def run(name, fn, setup=None, calls=1, **extra):
+        result = measure(fn, setup, repeat, memory)
+        result['seconds'] /= calls
+        result.update(extra)
+        results[name] = result
+        print(f"  {name:<22} {result['seconds'] * 1000:>11.3f} ms"
+              + (f"  {result['peak_mb']:>9.1f} MB" if 'peak_mb' in result else ""))
+
+    def cold_cache():
+        clear_memory_cache()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return ()
+
+    run('load_csv', lambda: load_dataset(path, cache_dir), setup=cold_cache)
+    run('load_cached', lambda: load_dataset(path, cache_dir), setup=lambda: clear_memory_cache() or ())
+    df = load_dataset(path, cache_dir)
+    run('clean', lambda: clean_data(df))
+    run('feature_engineering', feature_engineering, setup=lambda: (df.copy(),))
+    featured = feature_engineering(df.copy())
+    # A fresh (shallow) frame per repeat, so the per-frame rollup is built every time.
+    run('aggregate_trends', aggregate_trends, setup=lambda: (featured.copy(deep=False),))
+    run('aggregate_trends_cached', lambda: aggregate_trends(featured))
+    run('trend_rollups', lambda: TrendRollup(featured).all_trends(('D', 'W', 'M')))
+    partition_dir = os.path.join(BENCH_DATA_DIR, f"partitioned_{num_rows}")
+    run('preprocess_partitioned', lambda: preprocess_partitioned(path, partition_dir))
+
+    run('store_build', lambda: DashboardStore(df))
+    publish_shared_dataset(path, cache_dir)
+    run('load_shared', lambda: open_shared_dataset(path, cache_dir), setup=lambda: clear_memory_cache() or ())
+    run('store_build_shared', lambda: DashboardStore(open_shared_dataset(path, cache_dir)))
+    store = DashboardStore(df)
+    rng = np.random.default_rng(0)
+
+    # Fresh random filters per run so the memoised selections/rollups miss.
+    def select_all(filters):
+        for start, end, sectors, sentiments in filters:
+            len(store.select(start, end, sectors=sectors, sentiments=sentiments))
+
+    def kpis_all(filters):
+        for start, end, sectors, sentiments in filters:
+            for by in (('sector',), ('sentiment',), ()):
+                store.rollup(start, end, sectors=sectors, sentiments=sentiments, by=by)
+
+    run('filter_select', select_all, setup=lambda: (random_filters(rng, store, queries),), calls=queries)
+    run('kpi_rollup', kpis_all, setup=lambda: (random_filters(rng, store, queries),), calls=queries)
+
+    run('momentum_build', lambda: MomentumEngine(df))
+    momentum = MomentumEngine(df)
+
+    def momentum_all(filters):
+        for start, end, sectors, _ in filters:
+            momentum.ranking('company', end, sectors)
+            momentum.series('sector', start, end, sectors)
+
+    run('momentum_query', momentum_all, setup=lambda: (random_filters(rng, store, queries),), calls=queries)
+
+    def load_slices(filters):
+        for start, end, sectors, _ in filters:
+            load_partitioned(partition_dir, start, end, sectors)
+
+    slices = min(queries, 10)
+    run('load_partition_slice', load_slices, setup=lambda: (random_filters(rng, store, slices),), calls=slices)
+
+    from langchain_community.vectorstores import FAISS
+    from src.create_memory_for_llm import build_vectorstore, content_ids, rows_to_texts, save_vectorstore
+    from src.docstore import open_vectorstore, resolve_index_dir
+    from src.lexical_index import build_lexical_index
+    from src.near_duplicates import cluster_near_duplicates, near_duplicate_text
+    from src.retrieval import filtered_similarity_search, hybrid_search
+
+    embeddings = embeddings or HashingEmbeddings()
+    indexed = df.head(index_rows)
+    run('near_duplicates', lambda: cluster_near_duplicates(near_duplicate_text(indexed).tolist()), rows=len(indexed))
+    run('index_build', lambda: build_vectorstore(indexed, embeddings), rows=len(indexed))
+    vectorstore = build_vectorstore(indexed, embeddings)
+    index_dir = os.path.join(BENCH_DATA_DIR, f"index_{num_rows}")
+    ids = content_ids(rows_to_texts(indexed))
+    run('lexical_build', lambda: build_lexical_index(vectorstore, indexed, ids), rows=len(indexed))
+    lexical = build_lexical_index(vectorstore, indexed, ids)
+    save_vectorstore(vectorstore, index_dir)
+    run('index_load_pickle', lambda: FAISS.load_local(resolve_index_dir(index_dir), embeddings,
+                                                      allow_dangerous_deserialization=True),
+        rows=len(indexed))
+    run('index_open_mmap', lambda: open_vectorstore(index_dir, embeddings), rows=len(indexed))
+    questions = [QUERIES[i % len(QUERIES)] for i in range(queries)]
+
+    def search_all():
+        for question in questions:
+            vectorstore.similarity_search(question, k=3)
+
+    def filtered_all(selections):
+        for question, selection in zip(questions, selections):
+            filtered_similarity_search(vectorstore, question, selection.row_ids, k=3)
+
+    def hybrid_all(selections):
+        for question, selection in zip(questions, selections):
+            hybrid_search(vectorstore, lexical, question, selection.row_ids, k=3)
+
+    def selections():
+        return ([store.select(start, end, sectors=sectors, sentiments=sentiments)
+                 for start, end, sectors, sentiments in random_filters(rng, store, queries)],)
+
+    run('retrieval_topk', search_all, calls=queries, rows=len(indexed))
+    run('retrieval_filtered', filtered_all, setup=selections, calls=queries, rows=len(indexed))
+    run('retrieval_hybrid', hybrid_all, setup=selections, calls=queries, rows=len(indexed))
+    if resource is not None:
+        # tracemalloc misses native buffers (e.g. the CSV parser); keep the process high-water mark too.
+        results['process'] = {'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    clear_memory_cache()
+    return results
+
+
+def run_suite(sizes=None, repeat=3, memory=True, queries=50, index_rows=200_000, embedder='hash'):
+    """
+    Benchmark every size and return the results document.
+
+    Args:
+        sizes (list[int]): Dataset sizes in rows. Defaults to DEFAULT_SIZES.
+        repeat (int): Timed runs per stage (the best one is kept).
+        memory (bool): Also record peak traced memory per stage.
+        queries (int): Calls per query-style stage.
+        index_rows (int): Cap on rows embedded for the index stages.
+        embedder (str): 'hash' for HashingEmbeddings, 'model' for settings.EMBEDDING_MODEL.
+
+    Returns:
+        dict: ``meta`` (environment and parameters) and ``results`` keyed by size.
+    """
+    sizes = sizes or DEFAULT_SIZES
+    if embedder == 'model':
+        from src.resources import get_embeddings
+        embeddings = get_embeddings()
+    else:
+        embeddings = HashingEmbeddings()
+
+    results = {}
+    for num_rows in sizes:
+        print(f"📏 {num_rows:,} rows")
+        results[str(num_rows)] = bench_size(num_rows, repeat, memory, queries, index_rows, embeddings)
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.platform(),
+            'cpus': os.cpu_count(),
+            'repeat': repeat,
+            'queries': queries,
+            'index_rows': index_rows,
+            'index_factory': settings.INDEX_FACTORY,
+            'embedder': settings.EMBEDDING_MODEL if embedder == 'model' else 'hash',
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.2, min_seconds=1e-4, min_mb=1.0):
+    """
+    Compare two results documents stage by stage.
+
+    A stage regresses when its time (or peak memory) grew by more than
+    ``threshold`` relative to the baseline and by more than the absolute
+    noise floor (``min_seconds`` / ``min_mb``).
+
+    Returns:
+        list[dict]: One row per (size, stage, metric) present in both documents,
+        with baseline, current, ratio and a ``regression`` flag.
+    """
+    rows = []
+    for size, stages in current['results'].items():
+        for stage, result in stages.items():
+            base = baseline['results'].get(size, {}).get(stage)
+            if base is None:
+                continue
+            for metric, floor in (('seconds', min_seconds), ('peak_mb', min_mb)):
+                if metric not in result or metric not in base:
+                    continue
+                old, new = base[metric], result[metric]
+                ratio = new / old if old else float('inf')
+                rows.append({
+                    'size': size, 'stage': stage, 'metric': metric,
+                    'baseline': old, 'current': new, 'ratio': ratio,
+                    'regression': ratio > 1 + threshold and new - old > floor,
+                })
+    return rows
+
+
+def print_comparison(rows):
+    for row in rows:
+        flag = "❌ REGRESSION" if row['regression'] else ""
+        scale, unit = (1000, 'ms') if row['metric'] == 'seconds' else (1, 'MB')
+        print(f"{row['size']:>10} {row['stage']:<22} {row['baseline'] * scale:>12.3f} -> "
+              f"{row['current'] * scale:>12.3f} {unit}  x{row['ratio']:.2f} {flag}")
+    regressions = sum(row['regression'] for row in rows)
+    print(f"{'❌' if regressions else '✅'} {regressions} regression(s) in {len(rows)} comparisons")
+    return regressions
+
+
+def _load(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def _save(doc, path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as fh:
+        json.dump(doc, fh, indent=2)
+    print(f"💾 Results written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the data, dashboard and retrieval hot paths.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run the suite and write a results JSON")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="dataset sizes in rows")
+    run_parser.add_argument("--output", default=DEFAULT_OUTPUT, help="results JSON path")
+    run_parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage (best is kept)")
+    run_parser.add_argument("--queries", type=int, default=50, help="calls per filter/KPI/retrieval stage")
+    run_parser.add_argument("--index-rows", type=int, default=200_000, help="max rows embedded for index stages")
+    run_parser.add_argument("--embedder", choices=["hash", "model"], default="hash",
+                            help="hashing embeddings (fast) or the configured sentence-transformers model")
+    run_parser.add_argument("--no-memory", action="store_true", help="skip peak memory measurement")
+    run_parser.add_argument("--baseline", help="baseline JSON to compare the new results against")
+    run_parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown (0.2 = 20%%)")
+
+    compare_parser = sub.add_parser("compare", help="compare a results JSON against a baseline")
+    compare_parser.add_argument("baseline", help="baseline results JSON")
+    compare_parser.add_argument("current", help="new results JSON")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown (0.2 = 20%%)")
+    for sub_parser in (run_parser, compare_parser):
+        sub_parser.add_argument("--min-seconds", type=float, default=1e-4,
+                                help="ignore slowdowns smaller than this many seconds (noise floor)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        doc = run_suite(args.sizes, args.repeat, not args.no_memory, args.queries, args.index_rows, args.embedder)
+        _save(doc, args.output)
+        if args.baseline:
+            sys.exit(1 if print_comparison(compare(_load(args.baseline), doc, args.threshold, args.min_seconds)) else 0)
+    else:
+        sys.exit(1 if print_comparison(compare(_load(args.baseline), _load(args.current), args.threshold, args.min_seconds)) else 0)
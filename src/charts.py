@@ -0,0 +1,290 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+
+from src import settings
+from src.instrumentation import span
+from src.momentum import LONG_WINDOW, SHORT_WINDOW
+
+CHART_VIEWS = [
+    "Price Change Over Time",
+    "Trading Volume by Sector",
+    "Sentiment Distribution",
+    "Emotion Trends Over Time",
+    "Company Momentum",
+    "Sector Sentiment Momentum",
+]
+# Views drawn from the rolling momentum analytics instead of the cube.
+MOMENTUM_VIEWS = ["Company Momentum", "Sector Sentiment Momentum"]
+# Strongest and weakest companies shown by the company momentum view.
+MOMENTUM_TOP_N = 8
+
+
+def darkize_ax(ax):
+    ax.tick_params(colors="white", which="both")
+    ax.xaxis.label.set_color('white')
+    ax.yaxis.label.set_color('white')
+    ax.title.set_color('white')
+    plt.setp(ax.get_xticklabels(), color="white")
+    plt.setp(ax.get_yticklabels(), color="white")
+    for spine in ax.spines.values():
+        spine.set_edgecolor("white")
+    legend = ax.get_legend()
+    if legend:
+        for text in legend.get_texts():
+            text.set_color('white')
+        legend.get_frame().set_edgecolor('white')
+        legend.get_frame().set_facecolor('#181826')
+
+
+def _date_buckets(dates, max_points):
+    """
+    Map each date to the first date of its bucket, using at most ``max_points``
+    buckets of consecutive distinct dates. Dates are returned unchanged when
+    there are already few enough.
+    """
+    unique = np.unique(dates)
+    if not max_points or len(unique) <= max_points:
+        return dates
+    bucket_of_unique = np.arange(len(unique)) * max_points // len(unique)
+    first_of_bucket = unique[np.searchsorted(bucket_of_unique, np.arange(max_points))]
+    return first_of_bucket[bucket_of_unique[np.searchsorted(unique, dates)]]
+
+
+def price_series(rollup, max_points=None):
+    """
+    Mean price change per (date, sector) from the cube, optionally averaged
+    into at most ``max_points`` date buckets (weighted by row count).
+    """
+    cells = rollup('date', 'sector')[['count', 'price_change_sum']].reset_index()
+    cells['date'] = _date_buckets(cells['date'].values, max_points)
+    cells = cells.groupby(['date', 'sector'], sort=True)[['count', 'price_change_sum']].sum().reset_index()
+    cells['price_change_mean'] = cells['price_change_sum'] / cells['count']
+    return cells[['date', 'sector', 'price_change_mean']]
+
+
+def emotion_series(rollup, max_points=None):
+    """Rows per (date, emotion) from the cube, averaged per day within date buckets."""
+    counts = rollup('date', 'emotion')['count'].unstack(fill_value=0)
+    if max_points and len(counts) > max_points:
+        buckets = _date_buckets(counts.index.values, max_points)
+        counts = counts.groupby(buckets).mean()
+        counts.index.name = 'date'
+    return counts
+
+
+def _draw_price(rollup, max_points):
+    series = price_series(rollup, max_points)
+    if series['sector'].nunique() < 1 or series['date'].nunique() < 2:
+        return None, "Not enough data to plot trends. Try broadening your selection."
+
+    def draw():
+        fig, ax = plt.subplots(figsize=(13, 6))
+        sns.lineplot(data=series, x='date', y='price_change_mean', hue='sector', marker="o", ax=ax,
+                     linewidth=2.5, errorbar=None)
+        ax.set_ylabel("Price Change (%)")
+        ax.set_xlabel("Date")
+        ax.set_title("Price Change Trends by Sector")
+        darkize_ax(ax)
+        plt.setp(ax.get_xticklabels(), rotation=45)
+        return fig
+    return draw, None
+
+
+def _draw_volume(rollup, max_points):
+    by_sector = rollup('sector')
+    if len(by_sector) < 1:
+        return None, "Not enough sectors for a trading volume chart. Try more sectors."
+
+    def draw():
+        fig, ax = plt.subplots(figsize=(10, 4))
+        volume_by_sector = by_sector['trading_volume_crore_sum'].sort_values(ascending=False)
+        volume_by_sector.plot(kind='bar', ax=ax)
+        ax.set_ylabel("Trading Volume (cr)")
+        ax.set_title("Trading Volume by Sector")
+        darkize_ax(ax)
+        return fig
+    return draw, None
+
+
+def _draw_sentiment(rollup, max_points):
+    by_sentiment = rollup('sentiment')
+    if len(by_sentiment) < 1:
+        return None, "No sentiment data to display."
+
+    def draw():
+        fig, ax = plt.subplots(figsize=(10, 4))
+        sentiment_counts = by_sentiment['count'].sort_values(ascending=False)
+        sentiment_counts.plot(kind='bar', ax=ax)
+        ax.set_ylabel("Count")
+        ax.set_title("Sentiment Distribution")
+        darkize_ax(ax)
+        return fig
+    return draw, None
+
+
+def _draw_emotion(rollup, max_points):
+    emotion_date_counts = emotion_series(rollup, max_points)
+    if emotion_date_counts.shape[1] < 1 or len(emotion_date_counts) < 2:
+        return None, "Not enough emotion data to plot trends."
+
+    def draw():
+        fig, ax = plt.subplots(figsize=(12, 5))
+        emotion_date_counts.plot(kind='line', ax=ax)
+        ax.set_ylabel("Count")
+        ax.set_xlabel("Date")
+        ax.set_title("Emotions Over Time")
+        plt.setp(ax.get_xticklabels(), rotation=45)
+        darkize_ax(ax)
+        return fig
+    return draw, None
+
+
+def momentum_leaders(ranking, top_n=MOMENTUM_TOP_N):
+    """Strongest and weakest ``top_n`` ranked entities, strongest first."""
+    ranked = ranking[ranking['rank'].notna()]
+    if len(ranked) <= 2 * top_n:
+        return ranked
+    return ranked.iloc[np.r_[:top_n, len(ranked) - top_n:len(ranked)]]
+
+
+def sector_momentum_series(momentum, max_points=None):
+    """Short-window sentiment balance and long-window price change per (date, sector), date-bucketed."""
+    columns = [f'sentiment_balance_{SHORT_WINDOW}d', f'price_change_{LONG_WINDOW}d']
+    series = momentum('sector')[['date', 'sector'] + columns]
+    series['date'] = _date_buckets(series['date'].values, max_points)
+    return series.groupby(['date', 'sector'], sort=True)[columns].mean().reset_index()
+
+
+def _draw_company_momentum(momentum, max_points):
+    leaders = momentum_leaders(momentum('company', latest=True))
+    if len(leaders) < 2:
+        return None, "Not enough recent company news to rank momentum. Try a later end date or more sectors."
+
+    def draw():
+        fig, ax = plt.subplots(figsize=(11, max(4, 0.42 * len(leaders))))
+        values = leaders['momentum'][::-1]
+        colors = np.where(values.to_numpy() >= 0, '#2ecc71', '#e74c3c')
+        ax.barh(values.index.astype(str), values.to_numpy(), color=colors)
+        ax.axvline(0, color='white', linewidth=1)
+        ax.set_xlabel(f"{SHORT_WINDOW}-day minus {LONG_WINDOW}-day sentiment balance")
+        ax.set_title("Company Sentiment Momentum")
+        darkize_ax(ax)
+        return fig
+    return draw, None
+
+
+def _draw_sector_momentum(momentum, max_points):
+    series = sector_momentum_series(momentum, max_points)
+    if series['sector'].nunique() < 1 or series['date'].nunique() < 2:
+        return None, "Not enough data to plot sector momentum. Try broadening your selection."
+
+    def draw():
+        fig, (top, bottom) = plt.subplots(2, 1, figsize=(13, 8), sharex=True)
+        sns.lineplot(data=series, x='date', y=f'sentiment_balance_{SHORT_WINDOW}d', hue='sector', ax=top,
+                     errorbar=None)
+        top.axhline(0, color='white', linewidth=1)
+        top.set_ylabel(f"{SHORT_WINDOW}-day sentiment balance")
+        top.set_title("Sector Sentiment Momentum")
+        sns.lineplot(data=series, x='date', y=f'price_change_{LONG_WINDOW}d', hue='sector', ax=bottom,
+                     errorbar=None, legend=False)
+        bottom.set_ylabel(f"{LONG_WINDOW}-day price change (%)")
+        bottom.set_xlabel("Date")
+        plt.setp(bottom.get_xticklabels(), rotation=45)
+        darkize_ax(top)
+        darkize_ax(bottom)
+        return fig
+    return draw, None
+
+
+_VIEWS = dict(zip(CHART_VIEWS, [_draw_price, _draw_volume, _draw_sentiment, _draw_emotion,
+                                _draw_company_momentum, _draw_sector_momentum]))
+
+
+class ChartCache:
+    """Byte-bounded LRU of rendered chart results."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def put(self, key, item):
+        size = len(item['image'] or b'')
+        with self._lock:
+            if key in self._items:
+                self._bytes -= len(self._items.pop(key)['image'] or b'')
+            self._items[key] = item
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self._bytes -= len(old['image'] or b'')
+
+
+chart_cache = ChartCache()
+# pyplot keeps global state, so concurrent sessions render one figure at a time.
+_render_lock = threading.Lock()
+
+
+def render_view(view, rollup, cache_key, theme="dark", max_points=None, dpi=None, momentum=None):
+    """
+    Render a dashboard view to PNG, reusing a cached image when possible.
+
+    Args:
+        view (str): One of CHART_VIEWS.
+        rollup (callable): ``rollup(*by)`` returning cube aggregates for the current filter.
+        cache_key: Hashable fingerprint of the filter selection and data version.
+        theme (str): Name of the active plotting theme (part of the cache key).
+        max_points (int): Downsample line views to at most this many dates.
+        dpi (int): Output resolution, defaults to settings.CHART_DPI.
+        momentum (callable): ``momentum(level, latest=False)`` returning momentum
+            analytics for the current filter; required for MOMENTUM_VIEWS.
+
+    Returns:
+        dict: ``image`` (PNG bytes or None), ``message`` (why nothing was drawn),
+        ``seconds`` (render time of this call) and ``cached`` flag.
+    """
+    max_points = settings.CHART_MAX_POINTS if max_points is None else max_points
+    dpi = dpi or settings.CHART_DPI
+    key = (view, cache_key, theme, max_points, dpi)
+    start = time.perf_counter()
+    cached = chart_cache.get(key)
+    if cached is not None:
+        return dict(cached, cached=True, seconds=time.perf_counter() - start)
+
+    with span("chart.data"):
+        draw, message = _VIEWS[view](momentum if view in MOMENTUM_VIEWS else rollup, max_points)
+    image = None
+    if draw is not None:
+        with _render_lock:
+            open_before = set(plt.get_fignums())
+            try:
+                with span("chart.draw"):
+                    fig = draw()
+                with span("chart.encode") as encode:
+                    buffer = io.BytesIO()
+                    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+                    image = buffer.getvalue()
+                    encode.set(bytes=len(image))
+            finally:
+                # Every figure opened here, also one left behind by a draw() that raised part-way
+                # (only this module uses pyplot, always under the lock).
+                for number in set(plt.get_fignums()) - open_before:
+                    plt.close(number)
+
+    result = {'image': image, 'message': message, 'seconds': time.perf_counter() - start}
+    chart_cache.put(key, result)
+    return dict(result, cached=False)
@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+
+from src import settings
+
+
+def estimate_tokens(text):
+    """
+    Rough token count of ``text``: about four characters per token, the usual
+    ratio for English text under BPE tokenizers (Mistral's included).
+    """
+    return (len(text) + 3) // 4
+
+
+def _shorten(text, width=90):
+    text = " ".join(str(text).split())
+    return text if len(text) <= width else text[:width - 1].rstrip() + "…"
+
+
+def _codes(series):
+    """Integer group codes (-1 for missing) and the group labels of ``series``."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    return pd.factorize(series)
+
+
+def _group_stats(codes, labels, values=None, weights=None):
+    """
+    Per-group item count, mean / min / max of ``values`` and sum of
+    ``weights`` with NumPy reductions over the group codes; groups without
+    items are dropped. Missing (non-finite) values and weights are skipped,
+    like pandas' mean/min/max/sum; a group with no finite value gets NaN.
+    """
+    size = len(labels)
+    keep = codes >= 0
+    codes = codes[keep]
+    stats = {'items': np.bincount(codes, minlength=size)}
+    if values is not None:
+        values = values[keep]
+        finite = np.isfinite(values)
+        value_codes, values = codes[finite], values[finite]
+        counts = np.bincount(value_codes, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats['mean'] = np.bincount(value_codes, weights=values, minlength=size) / counts
+        stats['low'] = np.full(size, np.inf)
+        stats['high'] = np.full(size, -np.inf)
+        np.minimum.at(stats['low'], value_codes, values)
+        np.maximum.at(stats['high'], value_codes, values)
+        stats['low'][counts == 0] = np.nan
+        stats['high'][counts == 0] = np.nan
+    if weights is not None:
+        weights = weights[keep]
+        finite = np.isfinite(weights)
+        stats['volume'] = np.bincount(codes[finite], weights=weights[finite], minlength=size)
+    stats = pd.DataFrame(stats, index=pd.Index(labels))
+    return stats[stats['items'] > 0]
+
+
+def _mix(series, limit=None):
+    codes, labels = _codes(series)
+    counts = _group_stats(codes, labels)['items'].sort_values(ascending=False, kind='stable')
+    shares = counts / max(len(series), 1)
+    if limit is not None:
+        shares = shares.head(limit)
+    return ", ".join(f"{value} {share:.0%}" for value, share in shares.items())
+
+
+def digest_sections(df):
+    """
+    Statistical digest of a filtered selection, most important section first.
+
+    Computed with vectorised reductions over the whole selection (not a
+    sample of rows): overview and date span, per-sector counts, mean and extreme
+    price moves and volume, volume leaders, sentiment and emotion mix, the
+    largest single moves and the monthly trend.
+
+    Args:
+        df (pd.DataFrame): Filtered rows (date, headline, sector, sentiment,
+            emotion, price_change, trading_volume_crore; missing columns are skipped).
+
+    Returns:
+        list[tuple]: (title, lines) per section; lines are ordered by importance.
+    """
+    if len(df) == 0:
+        return [("Selection", ["No news items match the filters."])]
+
+    price = df['price_change'].to_numpy(dtype=float) if 'price_change' in df else None
+    volume = df['trading_volume_crore'].to_numpy(dtype=float) if 'trading_volume_crore' in df else None
+    dates = df['date'].dropna() if 'date' in df else pd.Series(dtype='datetime64[ns]')
+
+    overview = [f"{len(df):,} news items"]
+    if len(dates):
+        start, end = dates.min(), dates.max()
+        overview[0] += f" from {start:%Y-%m-%d} to {end:%Y-%m-%d} ({(end - start).days + 1} days)"
+    if price is not None:
+        overview.append(f"average price change {np.nanmean(price):+.2f}% "
+                        f"({(price > 0).mean():.0%} of items up, {(price < 0).mean():.0%} down)")
+    if volume is not None:
+        overview.append(f"total trading volume {np.nansum(volume):,.0f} crore")
+    sections = [("Selection", ["; ".join(overview) + "."])]
+
+    if 'sector' in df and price is not None:
+        stats = _group_stats(*_codes(df['sector']), price, volume).sort_values('items', ascending=False, kind='stable')
+        sections.append(("Sectors (items, avg / min / max price change, volume)", [
+            f"- {sector}: {row['items']:,.0f}, {row['mean']:+.2f}% / {row['low']:+.2f}% / {row['high']:+.2f}%"
+            + (f", {row['volume']:,.0f} cr" if volume is not None else "")
+            for sector, row in stats.iterrows()
+        ]))
+        ranked = stats.dropna(subset=['mean']).sort_values('mean', ascending=False)
+        if len(ranked) > 1:
+            sections.append(("Best and worst sectors by average move", [
+                f"- best: {ranked.index[0]} {ranked['mean'].iloc[0]:+.2f}%; "
+                f"worst: {ranked.index[-1]} {ranked['mean'].iloc[-1]:+.2f}%",
+            ]))
+        if volume is not None and len(stats) > 1:
+            leaders = stats['volume'].nlargest(3)
+            share = leaders / stats['volume'].sum()
+            sections.append(("Volume leaders", [
+                "- " + ", ".join(f"{sector} {value:,.0f} cr ({pct:.0%})"
+                                 for (sector, value), pct in zip(leaders.items(), share)),
+            ]))
+
+    mixes = [f"- {col}: {_mix(df[col], 6)}" for col in ('sentiment', 'emotion') if col in df]
+    if mixes:
+        sections.append(("Sentiment and emotion mix", mixes))
+
+    if price is not None and 'headline' in df:
+        # Rows without a price change cannot rank among the largest moves.
+        finite = np.flatnonzero(np.isfinite(price))
+        order = finite[np.argsort(price[finite], kind='stable')]
+        picks = list(order[::-1][:3]) + list(order[:3])
+        seen, lines = set(), []
+        for position in picks:
+            if position in seen:
+                continue
+            seen.add(position)
+            row = df.iloc[position]
+            when = f"{row['date']:%Y-%m-%d} " if 'date' in df and pd.notna(row['date']) else ""
+            sector = f"{row['sector']}, " if 'sector' in df else ""
+            lines.append(f"- {row['price_change']:+.2f}% ({when}{sector}{row['sentiment'] if 'sentiment' in df else ''}): "
+                         f"{_shorten(row['headline'])}")
+        if lines:
+            sections.append(("Largest single moves", lines))
+
+    if price is not None and len(dates) and (dates.max() - dates.min()).days > 31:
+        months = df['date'].to_numpy().astype('datetime64[M]')
+        codes, labels = pd.factorize(months, sort=True)
+        monthly = _group_stats(codes, labels, price)
+        sections.append(("Monthly trend (items, avg price change)", [
+            f"- {period:%Y-%m}: {row['items']:,.0f}, {row['mean']:+.2f}%" for period, row in monthly.iterrows()
+        ]))
+    return sections
+
+
+def build_context(df, token_budget=None):
+    """
+    Statistical digest of the selection that fits ``token_budget``.
+
+    Sections are added in order of importance; a section that does not fit
+    is cut after its most important lines (with a note of what was left out),
+    and later sections are still tried in case a smaller one fits.
+
+    Args:
+        df (pd.DataFrame): Filtered rows.
+        token_budget (int): Approximate token limit (see estimate_tokens).
+            Defaults to settings.CONTEXT_TOKEN_BUDGET.
+
+    Returns:
+        str: The digest text.
+    """
+    budget = settings.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    out, used = [], 0
+    for title, lines in digest_sections(df):
+        header = f"{title}:"
+        first_note = f"- … {len(lines) - 1} more" if len(lines) > 1 else ""
+        if used + estimate_tokens(header) + estimate_tokens(lines[0]) + estimate_tokens(first_note) + 3 > budget:
+            continue
+        out.append(header)
+        used += estimate_tokens(header) + 1
+        for i, line in enumerate(lines):
+            remaining = len(lines) - i
+            note = f"- … {remaining - 1} more" if remaining > 1 else ""
+            if used + estimate_tokens(line) + 1 + estimate_tokens(note) > budget:
+                out.append(f"- … {remaining} more")
+                used += estimate_tokens(out[-1]) + 1
+                break
+            out.append(line)
+            used += estimate_tokens(line) + 1
+    return "\n".join(out)
@@ -1,9 +1,29 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
 import pandas as pd
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 
 from langchain.docstore.document import Document
 
+from src import settings
+from src.ann_index import prepare_index, resolve_factory, set_search_params, supports_removal, train_index
+from src.data_store import load_dataset, read_ingest_segments
+from src.docstore import CURRENT_FILE, DOCSTORE_FILE, adopt_appended, resolve_index_dir, write_docstore
+from src.embedding_cache import CachedEmbeddings, get_document_embedder
+from src.lexical_index import LEXICAL_FILE, build_lexical_index
+
+DB_FAISS_PATH = settings.VECTORSTORE_PATH
+EMBEDDING_MODEL = settings.EMBEDDING_MODEL
+MANIFEST_FILE = "manifest.json"
+INDEX_FILES = ("index.faiss", "index.pkl")
+
+
 def row_to_doc(row):
     content = (
         f"Date: {row['date']}\n"
@@ -17,23 +37,362 @@ def row_to_doc(row):
     )
     return Document(page_content=content)
 
-def get_vectorstore(csv_path="C:\\Users\\AYUSH\\financial-news-dashboard\\data\\indian_stock_news_2024_25.csv"):
+
+def _text(series):
+    """str() of every value; missing values read "nan" whatever the pandas string dtype."""
+    text = series.astype(str)
+    return text.fillna('nan') if text.hasnans else text
+
+
+def _dates(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime('%Y-%m-%d')
+    return series.astype(str)
+
+
+def rows_to_texts(df):
+    """
+    Vectorized equivalent of row_to_doc: the page content for every row.
+
+    Args:
+        df (pd.DataFrame): News rows.
+
+    Returns:
+        list[str]: One document text per row, in row order.
+    """
+    dates = _dates(df['date'])
+    texts = (
+        "Date: " + dates
+        + "\nHeadline: " + _text(df['headline'])
+        + "\nSummary: " + _text(df['summary'])
+        + "\nSector: " + _text(df['sector'])
+        + "\nSentiment: " + _text(df['sentiment'])
+        + "\nEmotion: " + _text(df['emotion'])
+        + "\nPrice Change: " + _text(df['price_change'])
+        + "%\nTrading Volume: ₹" + _text(df['trading_volume_crore']) + " Cr"
+    )
+    return texts.tolist()
+
+
+def rows_to_metadata(df):
+    """
+    Structured metadata for every row, used for filter-aware retrieval.
+
+    Args:
+        df (pd.DataFrame): News rows; the index holds the dataset row ids.
+            Rows collapsed by near_duplicates.collapse also carry their
+            cluster aggregates.
+
+    Returns:
+        list[dict]: row_id, date, sector, sentiment and emotion per row, plus
+        cluster_size, cluster_rows, first_date and last_date for
+        representatives of more than one row.
+    """
+    dates = _dates(df['date'])
+    meta = pd.DataFrame({
+        'row_id': df.index.astype('int64'),
+        'date': dates.values,
+        'sector': _text(df['sector']).values,
+        'sentiment': _text(df['sentiment']).values,
+        'emotion': _text(df['emotion']).values,
+    })
+    records = meta.to_dict('records')
+    if 'cluster_size' in df:
+        sizes = df['cluster_size'].to_numpy(dtype=np.int64)
+        members = df['cluster_rows'].to_numpy()
+        first, last = _dates(df['first_date']).to_numpy(), _dates(df['last_date']).to_numpy()
+        for position in np.flatnonzero(sizes > 1):
+            records[position].update(cluster_size=int(sizes[position]), cluster_rows=list(members[position]),
+                                     first_date=first[position], last_date=last[position])
+    return records
+
+
+def content_ids(texts):
+    """
+    Stable document ids derived from content: SHA-1 of the text, suffixed with
+    an occurrence number so identical rows still get distinct ids.
+
+    Args:
+        texts (list[str]): Document texts.
+
+    Returns:
+        list[str]: One id per text.
+    """
+    seen = {}
+    ids = []
+    for text in texts:
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(digest if occurrence == 0 else f"{digest}-{occurrence}")
+    return ids
+
+
+def load_manifest(index_dir=DB_FAISS_PATH):
+    """Return the saved manifest dict, or None if the index has none."""
+    path = os.path.join(resolve_index_dir(index_dir), MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_vectorstore(vectorstore, index_dir=DB_FAISS_PATH, manifest=None, lexical=None, members=None):
+    """
+    Save the index, docstore, lexical index and manifest atomically.
+
+    Besides LangChain's index.faiss/index.pkl (used for incremental updates)
+    the documents are exported to docstore.sqlite, which the app opens
+    instead of unpickling index.pkl, together with the rows in ``members``
+    (those collapsed into a near-duplicate representative, so retrieval can
+    show the member a filter selected), and the BM25 index (when given) to
+    lexical.npz. Everything is written to a new version subdirectory of
+    ``index_dir``, then ``index_dir/CURRENT`` is switched to it with a
+    single os.replace, so readers (see docstore.resolve_index_dir) get
+    either every file of the previous version or every file of the new one.
+    The previous version is deleted afterwards; processes that already
+    opened its files keep reading them.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    previous = resolve_index_dir(index_dir)
+    version = f"v{time.time_ns()}"
+    target = os.path.join(index_dir, version)
+    vectorstore.save_local(target)
+    member_docs = None
+    if members is not None and len(members):
+        member_docs = zip(members.index, rows_to_texts(members), rows_to_metadata(members))
+    write_docstore(vectorstore, os.path.join(target, DOCSTORE_FILE), member_docs=member_docs)
+    if lexical is not None:
+        lexical.save(os.path.join(target, LEXICAL_FILE))
+    if manifest is not None:
+        with open(os.path.join(target, MANIFEST_FILE), 'w') as fh:
+            json.dump(manifest, fh)
+    pointer = os.path.join(index_dir, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(pointer, 'w') as fh:
+        fh.write(version)
+    os.replace(pointer, os.path.join(index_dir, CURRENT_FILE))
+
+    if previous != index_dir:
+        shutil.rmtree(previous, ignore_errors=True)
+    else:
+        # Files of a store saved before versioning, now superseded.
+        for name in INDEX_FILES + (DOCSTORE_FILE, LEXICAL_FILE, MANIFEST_FILE):
+            if os.path.exists(os.path.join(index_dir, name)):
+                os.remove(os.path.join(index_dir, name))
+
+
+def build_vectorstore(df, embeddings, index_factory=None):
+    """
+    Embed every row of ``df`` into a new FAISS store keyed by content ids.
+
+    Args:
+        df (pd.DataFrame): News rows; the index holds the dataset row ids.
+        embeddings: LangChain embeddings.
+        index_factory (str): faiss index_factory string or "auto". Defaults to
+            settings.INDEX_FACTORY; "Flat" keeps the exact float32 index.
+
+    Returns:
+        FAISS: In-memory vector store.
+    """
+    texts = rows_to_texts(df)
+    metadatas = rows_to_metadata(df)
+    ids = content_ids(texts)
+    spec = resolve_factory(index_factory or settings.INDEX_FACTORY, len(texts))
+    if spec == 'Flat':
+        return FAISS.from_texts(texts, embedding=embeddings, metadatas=metadatas, ids=ids)
+
+    vectors = embeddings.embed_documents(texts)
+    index = train_index(vectors, spec)
+    vectorstore = FAISS(embeddings, index, InMemoryDocstore(), {})
+    vectorstore.add_embeddings(zip(texts, vectors), metadatas=metadatas, ids=ids)
+    return vectorstore
+
+
+def load_vectorstore(index_dir=DB_FAISS_PATH, embeddings=None):
+    """
+    Load a saved store and apply the configured search parameters
+    (IVF nprobe, HNSW efSearch). Documents appended by live ingestion since
+    index.pkl was written are taken over from docstore.sqlite.
+    """
+    embeddings = embeddings or get_document_embedder(EMBEDDING_MODEL)
+    index_dir = resolve_index_dir(index_dir)
+    vectorstore = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    adopt_appended(vectorstore, index_dir)
+    set_search_params(prepare_index(vectorstore.index))
+    return vectorstore
+
+
+def get_vectorstore(csv_path=None, embeddings=None):
+    """
+    Build a fresh FAISS store over every row of the dataset.
+
+    Args:
+        csv_path (str): Dataset CSV. Defaults to settings.DATA_PATH.
+        embeddings: LangChain embeddings; defaults to the cached MiniLM embedder.
+
+    Returns:
+        FAISS: In-memory vector store keyed by content ids (one document per
+        near-duplicate cluster with settings.DEDUPE_INDEX).
+    """
+    csv_path = csv_path or settings.DATA_PATH
     print(f"📄 Loading data from {csv_path}")
-    df = pd.read_csv(csv_path)
+    df = load_dataset(csv_path)
     print(f"✅ Loaded {len(df)} rows")
 
-    docs = [row_to_doc(row) for _, row in df.iterrows()]
-    print(f"🧾 Converted to {len(docs)} LangChain documents")
-
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    embeddings = embeddings or get_document_embedder(EMBEDDING_MODEL)
     print("🔗 Embeddings model loaded")
 
-    vectorstore = FAISS.from_documents(docs, embedding=embeddings)
-    print("🧠 FAISS vector store built")
+    df = _index_rows(df)
+    vectorstore = build_vectorstore(df, embeddings)
+    print(f"🧠 FAISS vector store built over {len(df)} documents")
 
     return vectorstore
 
+
+def _dedupe_config():
+    """Near-duplicate settings recorded in the manifest (None when rows are indexed one by one)."""
+    if not settings.DEDUPE_INDEX:
+        return None
+    return {
+        'threshold': settings.DEDUPE_THRESHOLD,
+        'permutations': settings.DEDUPE_PERMUTATIONS,
+        'bands': settings.DEDUPE_BANDS,
+        'shingle_size': settings.DEDUPE_SHINGLE_SIZE,
+    }
+
+
+def _index_rows(df):
+    """The rows to embed: ``df``, or one representative per near-duplicate cluster with settings.DEDUPE_INDEX."""
+    if not settings.DEDUPE_INDEX:
+        return df
+    from src.near_duplicates import collapse_near_duplicates
+
+    collapsed, seconds = collapse_near_duplicates(df)
+    print(f"🧬 Near-duplicates: {len(df)} rows -> {len(collapsed)} documents ({seconds:.2f}s)")
+    return collapsed
+
+
+def update_vectorstore(csv_path=None, index_dir=DB_FAISS_PATH, embeddings=None):
+    """
+    Incrementally bring the saved FAISS store in line with the dataset.
+
+    Rows are identified by content hash. The manifest next to the index
+    records which ids are indexed; only new or changed rows are embedded and
+    added, and ids no longer in the dataset are removed. Rows added by live
+    ingestion (src/ingest.py) count as part of the dataset. Without a usable
+    manifest (first run, or a different embedding model or index type) the
+    store is rebuilt from scratch, as it is when rows were removed from an
+    index type that cannot delete vectors in place (IVF, HNSW). Unchanged documents whose row metadata moved
+    (e.g. rows shifted by a deletion) get their metadata updated in place.
+    With settings.DEDUPE_INDEX only one representative per near-duplicate
+    cluster is indexed; a row that joins an indexed cluster only updates the
+    representative's cluster metadata; the other rows' texts are saved in
+    the docstore so filtered retrieval can show the member a filter
+    selected. Changing the near-duplicate settings triggers a full rebuild.
+    The BM25 lexical index is rebuilt alongside whenever the store is saved.
+
+    Args:
+        csv_path (str): Dataset CSV. Defaults to settings.DATA_PATH.
+        index_dir (str): Directory holding index.faiss/index.pkl/manifest.json.
+        embeddings: LangChain embeddings; defaults to the cached MiniLM embedder.
+
+    Returns:
+        tuple: (FAISS vector store, stats dict with rows/documents/added/removed/unchanged/seconds).
+    """
+    start = time.perf_counter()
+    csv_path = csv_path or settings.DATA_PATH
+    embeddings = embeddings or get_document_embedder(EMBEDDING_MODEL)
+    df = load_dataset(csv_path)
+    ingested, ingest_segment = read_ingest_segments(csv_path)
+    if ingested is not None:
+        df = pd.concat([df, ingested])
+    rows = len(df)
+    collapsed = _index_rows(df)
+    members = df[~df.index.isin(collapsed.index)] if collapsed is not df else df.iloc[:0]
+    member_ids = sorted(content_ids(rows_to_texts(members))) if len(members) else []
+    df = collapsed
+    texts = rows_to_texts(df)
+    ids = content_ids(texts)
+    current = dict(zip(ids, texts))
+    metadata = dict(zip(ids, rows_to_metadata(df)))
+
+    # Every file of the previous save is read from the same version.
+    current_dir = resolve_index_dir(index_dir)
+    manifest = load_manifest(current_dir)
+    reusable = (
+        manifest is not None
+        and manifest.get('embedding_model') == EMBEDDING_MODEL
+        and manifest.get('index_factory', 'Flat') == settings.INDEX_FACTORY
+        and manifest.get('dedupe') == _dedupe_config()
+        and all(os.path.exists(os.path.join(current_dir, name)) for name in INDEX_FILES)
+    )
+
+    vectorstore = None
+    if reusable:
+        vectorstore = load_vectorstore(current_dir, embeddings)
+        # Diff against what the index actually holds, not just the manifest.
+        indexed = set(vectorstore.index_to_docstore_id.values())
+        removed = [doc_id for doc_id in indexed if doc_id not in current]
+        added = [doc_id for doc_id in ids if doc_id not in indexed]
+        if removed and not supports_removal(vectorstore.index):
+            print("🔁 Index type cannot remove vectors, rebuilding")
+            vectorstore = None
+            reusable = False
+
+    if vectorstore is not None:
+        relabelled = 0
+        for doc_id in indexed.intersection(current):
+            doc = vectorstore.docstore.search(doc_id)
+            if isinstance(doc, Document) and doc.metadata != metadata[doc_id]:
+                doc.metadata = metadata[doc_id]
+                relabelled += 1
+        if removed:
+            vectorstore.delete(removed)
+        if added:
+            vectorstore.add_texts(
+                [current[doc_id] for doc_id in added],
+                metadatas=[metadata[doc_id] for doc_id in added],
+                ids=added,
+            )
+        print(f"♻️ Incremental update: +{len(added)} / -{len(removed)} documents, {relabelled} relabelled")
+    else:
+        removed = []
+        added = ids
+        relabelled = 0
+        vectorstore = build_vectorstore(df, embeddings)
+        print(f"🧠 Full build: {len(ids)} documents ({resolve_factory(settings.INDEX_FACTORY, len(ids))})")
+
+    sidecar_missing = not all(os.path.exists(os.path.join(current_dir, name)) for name in (DOCSTORE_FILE, LEXICAL_FILE))
+    members_changed = manifest is None or manifest.get('member_ids', []) != member_ids
+    if added or removed or relabelled or not reusable or sidecar_missing or members_changed:
+        lexical = build_lexical_index(vectorstore, df, ids)
+        print(f"🔤 Lexical index: {len(lexical.terms)} terms, {len(lexical.entities)} known entities")
+        save_vectorstore(vectorstore, index_dir, {
+            'embedding_model': EMBEDDING_MODEL,
+            'index_factory': settings.INDEX_FACTORY,
+            'index_type': resolve_factory(settings.INDEX_FACTORY, len(ids)),
+            'source': csv_path,
+            'ingest_segment': ingest_segment,
+            'dedupe': _dedupe_config(),
+            'ids': sorted(current),
+            'member_ids': member_ids,
+        }, lexical, members)
+
+    stats = {
+        'rows': rows,
+        'documents': len(ids),
+        'added': len(added),
+        'removed': len(removed),
+        'unchanged': len(ids) - len(added),
+        'seconds': time.perf_counter() - start,
+    }
+    return vectorstore, stats
+
+
 if __name__ == "__main__":
-    vectorstore = get_vectorstore()
-    vectorstore.save_local("vectorstore")  # ✅ This saves the index to disk
-    print("✅ FAISS Vector Store saved to 'vectorstore/' directory.")
+    embedder = get_document_embedder(EMBEDDING_MODEL)
+    vectorstore, stats = update_vectorstore(embeddings=embedder)
+    print(f"✅ FAISS Vector Store saved to '{DB_FAISS_PATH}' directory "
+          f"(+{stats['added']} / -{stats['removed']}, {stats['unchanged']} unchanged, {stats['seconds']:.1f}s).")
+    if isinstance(embedder, CachedEmbeddings):
+        print(f"🔢 Embeddings: {CachedEmbeddings.describe(embedder.totals)}")
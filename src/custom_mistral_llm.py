@@ -1,51 +1,169 @@
-from langchain_openai import ChatOpenAI
-from langchain.chains import ConversationalRetrievalChain
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from dotenv import load_dotenv
-import os
+import logging
+import time
 
-load_dotenv()
+from src import instrumentation, resources, settings
 
-HF_TOKEN = os.environ.get("HF_TOKEN")
-if not HF_TOKEN:
-    raise ValueError("HF_TOKEN not found in environment variables. Please set it before running.")
+logger = logging.getLogger(__name__)
 
-DB_FAISS_PATH = "vectorstore/"
-
-# Embedding model
-embedding_model = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
+# Same wording as LangChain's default "stuff" QA chat prompt used by qa_chain.
+QA_SYSTEM_TEMPLATE = (
+    "Use the following pieces of context to answer the user's question. \n"
+    "If you don't know the answer, just say that you don't know, don't try to make up an answer.\n"
+    "----------------\n"
+    "{context}"
 )
 
-# Load FAISS vector store
-db = FAISS.load_local(
-    DB_FAISS_PATH,
-    embedding_model,
-    allow_dangerous_deserialization=True
-)
+# The embedder, FAISS index and LLM client are loaded lazily by src.resources
+# on first use and shared process-wide; importing this module is cheap.
 
-# LLM via HuggingFace OpenAI Router
-llm = ChatOpenAI(
-    api_key=HF_TOKEN,
-    api_base="https://api-inference.huggingface.co/v1",
-    model="mistralai/Mistral-7B-Instruct-v0.2",
-    temperature=0.5,
-    max_tokens=512,
-)
+_qa_chain = None
+
+
+def get_qa_chain():
+    """Unfiltered conversational QA chain over the whole index (built once)."""
+    global _qa_chain
+    if _qa_chain is None:
+        from langchain.chains import ConversationalRetrievalChain
+        from src.retrieval import FilteredRetriever
+        _qa_chain = ConversationalRetrievalChain.from_llm(
+            llm=resources.get_llm(),
+            retriever=FilteredRetriever(vectorstore=resources.get_vectorstore(), k=3,
+                                        lexical=resources.get_lexical_index()),
+            return_source_documents=True,
+        )
+    return _qa_chain
 
-# Conversational QA chain
-qa_chain = ConversationalRetrievalChain.from_llm(
-    llm=llm,
-    retriever=db.as_retriever(search_kwargs={'k': 3}),
-    return_source_documents=True,
-)
 
-def ask_question(user_question, chat_history):
-    response = qa_chain({
+def __getattr__(name):
+    # Backwards-compatible module attributes, resolved lazily.
+    lazy = {
+        'embedding_model': resources.get_embeddings,
+        'db': resources.get_vectorstore,
+        'llm': resources.get_llm,
+        'qa_chain': get_qa_chain,
+    }
+    if name in lazy:
+        return lazy[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@instrumentation.traced("ask_question")
+def ask_question(user_question, chat_history, row_ids=None, instructions=None):
+    """
+    Answer a question with retrieval-augmented generation.
+
+    When ``row_ids`` is given (the rows selected in the dashboard), retrieval
+    is restricted to those rows; otherwise the whole index is searched.
+    ``instructions`` (e.g. the analyst brief and data digest) are added to the
+    system message; only ``user_question`` is used as the retrieval query.
+    """
+    if instructions is not None:
+        docs = _retrieve(user_question, row_ids)
+        message = resources.get_llm_gateway().invoke(_qa_messages(user_question, chat_history, docs, instructions))
+        return message.content, docs
+    if row_ids is None:
+        chain = get_qa_chain()
+    else:
+        from langchain.chains import ConversationalRetrievalChain
+        from src.retrieval import FilteredRetriever
+        chain = ConversationalRetrievalChain.from_llm(
+            llm=resources.get_llm(),
+            retriever=FilteredRetriever(vectorstore=resources.get_vectorstore(), k=3, row_ids=row_ids,
+                                        lexical=resources.get_lexical_index()),
+            return_source_documents=True,
+        )
+    response = chain({
         "question": user_question,
         "chat_history": chat_history
     })
     answer = response.get("answer") or response.get("result")
     source_docs = response.get("source_documents", [])
     return answer, source_docs
+
+
+@instrumentation.traced("retrieve", rows=True)
+def _retrieve(user_question, row_ids, k=3):
+    vectorstore = resources.get_vectorstore()
+    lexical = resources.get_lexical_index()
+    if lexical is not None:
+        from src.retrieval import hybrid_search
+        return hybrid_search(vectorstore, lexical, user_question, row_ids, k)
+    from src.retrieval import filtered_similarity_search
+    return filtered_similarity_search(vectorstore, user_question, row_ids, k)
+
+
+def _context_text(doc):
+    """Document text for the prompt, with the near-duplicate count of a cluster representative."""
+    from src.near_duplicates import describe_cluster
+    similar = describe_cluster(doc.metadata)
+    return doc.page_content if similar is None else f"{doc.page_content}\n{similar}"
+
+
+def _qa_messages(user_question, chat_history, docs, instructions=None):
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+    context = "\n\n".join(_context_text(doc) for doc in docs)
+    system = QA_SYSTEM_TEMPLATE.format(context=context)
+    if instructions:
+        system = f"{instructions}\n\n{system}"
+    messages = [SystemMessage(content=system)]
+    for human, ai in chat_history:
+        messages += [HumanMessage(content=human), AIMessage(content=ai)]
+    messages.append(HumanMessage(content=user_question))
+    return messages
+
+
+def stream_question(user_question, chat_history, row_ids=None, timeout=None, instructions=None):
+    """
+    Streaming variant of ask_question.
+
+    Retrieval runs first, then the answer is streamed through the shared LLM
+    gateway (which queues, coalesces and retries upstream calls):
+
+    - ``('sources', docs)`` once retrieval finishes, before any token;
+    - ``('token', text)`` for every streamed chunk of the answer;
+    - ``('done', stats)`` with time-to-first-token, total time and chunk count.
+
+    Closing the generator early (e.g. a Streamlit rerun) unsubscribes from
+    the gateway stream, which cancels the upstream request when no other
+    session shares it. Waiting longer than ``timeout`` for the next token
+    raises TimeoutError.
+
+    Args:
+        user_question (str): Question to answer; also the retrieval query.
+        chat_history (list): (human, ai) message pairs.
+        row_ids (array-like): Restrict retrieval to these dataset rows.
+        timeout (float): Maximum wait for the next token, defaults to settings.LLM_TIMEOUT_SECONDS.
+        instructions (str): Extra system instructions (not used for retrieval).
+
+    Yields:
+        tuple: (kind, payload) events as described above.
+    """
+    timeout = timeout or settings.LLM_TIMEOUT_SECONDS
+    start = time.perf_counter()
+    gateway = resources.get_llm_gateway()
+    docs = _retrieve(user_question, row_ids)
+    yield 'sources', docs
+
+    tokens = gateway.stream(_qa_messages(user_question, chat_history, docs, instructions),
+                            timeout=timeout)
+    llm_start = time.perf_counter()
+    ttft, chunks, finished = None, 0, False
+    try:
+        for text in tokens:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+                logger.info("Time to first token: %.3fs", ttft)
+            chunks += 1
+            yield 'token', text
+        finished = True
+    finally:
+        tokens.close()
+        if not finished:
+            logger.info("LLM stream stopped after %.3fs", time.perf_counter() - start)
+        instrumentation.record("llm.stream", time.perf_counter() - llm_start, chunks=chunks,
+                               time_to_first_token=ttft, completed=finished)
+    yield 'done', {
+        'time_to_first_token': ttft,
+        'total_seconds': time.perf_counter() - start,
+        'chunks': chunks,
+    }
@@ -0,0 +1,103 @@
+import threading
+
+from src.aggregate_cube import AggregateCube
+from src.filter_engine import LayeredFilterEngine
+from src.momentum import MomentumEngine
+
+COMPANY_NEWS_COLUMNS = ['date', 'headline', 'sentiment', 'price_change', 'trading_volume_crore']
+
+
+class DashboardStore:
+    """
+    Dataset plus its derived indexes, shared by every dashboard session.
+
+    Holds the date-sorted LayeredFilterEngine used for row selections, the
+    AggregateCube used for charts and KPIs and the MomentumEngine behind the
+    company/sector momentum views (built on first use). ``version``
+    increases on every append so caches keyed on it (e.g. rendered charts)
+    see new data; ``segment`` is the last live-ingestion segment appended
+    (see src/ingest.py).
+
+    Args:
+        df (pd.DataFrame): Loaded news dataset.
+        signature: Source signature of the data (see data_store.source_signature);
+            together with ``version`` it identifies the rows across stores.
+        momentum_loader (callable): Returns the MomentumEngine to use instead of
+            one built from ``df``, for stores whose rows do not hold the history
+            the trailing windows need (see get_partition_store in app.py).
+    """
+
+    def __init__(self, df, signature=None, momentum_loader=None):
+        self._lock = threading.Lock()
+        self.signature = signature
+        self.version = 0
+        self.segment = 0
+        self.engine = LayeredFilterEngine(df)
+        self.cube = AggregateCube(df)
+        self._momentum = None
+        self._momentum_loader = momentum_loader
+
+    @property
+    def df(self):
+        return self.engine.df
+
+    def select(self, *args, **kwargs):
+        """Row selection for a filter, see LayeredFilterEngine.select."""
+        return self.engine.select(*args, **kwargs)
+
+    def rollup(self, *args, **kwargs):
+        """Aggregates for a filter, see AggregateCube.rollup."""
+        return self.cube.rollup(*args, **kwargs)
+
+    @property
+    def momentum_engine(self):
+        with self._lock:
+            if self._momentum is None and self._momentum_loader is not None:
+                self._momentum = self._momentum_loader()
+            elif self._momentum is None:
+                base, *appended = self.engine.frames
+                self._momentum = MomentumEngine(base)
+                for rows in appended:
+                    self._momentum.append(rows)
+            return self._momentum
+
+    def momentum(self, level, start_date, end_date, sectors=None, latest=False):
+        """
+        Rolling momentum metrics for a filter, see MomentumEngine.
+
+        Args:
+            level (str): 'company' or 'sector'.
+            start_date: First day of the series.
+            end_date: Last day of the series, and the day rankings are taken on.
+            sectors (list): Sectors to keep, or None for all.
+            latest (bool): Return the ranking on ``end_date`` instead of the daily series.
+
+        Returns:
+            pd.DataFrame: MomentumEngine.ranking or MomentumEngine.series.
+        """
+        if latest:
+            return self.momentum_engine.ranking(level, end_date, sectors)
+        return self.momentum_engine.series(level, start_date, end_date, sectors)
+
+    def company_news(self, company, start_date, end_date, limit=5):
+        """Latest ``limit`` rows naming ``company`` in the date range, from its posting list."""
+        frame = self.engine.rows_of('company', company, start_date, end_date).frame
+        return frame.iloc[::-1].head(limit)[COMPANY_NEWS_COLUMNS]
+
+    def append(self, rows):
+        """
+        Add new rows: the cube and the momentum grids are updated
+        incrementally, the filter index indexes them in its delta layer (the
+        base frame stays as loaded, e.g. memory-mapped).
+
+        Args:
+            rows (pd.DataFrame): New rows with the dataset columns.
+        """
+        if len(rows) == 0:
+            return
+        with self._lock:
+            self.cube.append(rows)
+            if self._momentum is not None:
+                self._momentum.append(rows)
+            self.engine.append(rows)
+            self.version += 1
@@ -1,8 +1,10 @@
-import pandas as pd
-import numpy as np
-import random
-from datetime import datetime, timedelta
+import argparse
 import os
+import string
+import time
+
+import numpy as np
+import pandas as pd
 
 companies_expanded = {
     'Technology': ['Infosys', 'TCS', 'Wipro', 'HCL Technologies', 'Tech Mahindra', 'L&T Infotech', 'Mindtree', 'Mphasis', 'Persistent Systems', 'Coforge'],
@@ -75,94 +77,204 @@ sentiments_expanded = ['Positive', 'Negative', 'Neutral', 'Mixed']
 
 emotions_expanded = ['Optimism', 'Caution', 'Fear', 'Confidence', 'Uncertainty']
 
-def generate_price_change(sentiment):
-    if sentiment == 'Positive':
-        return round(random.uniform(0.5, 7), 2)
-    elif sentiment == 'Negative':
-        return round(random.uniform(-7, -0.5), 2)
-    elif sentiment == 'Mixed':
-        return round(random.uniform(-3, 3), 2)
-    else:
-        return round(random.uniform(-1, 1), 2)
-
-def generate_volume():
-    return round(random.uniform(1, 1000), 2)
-
-def generate_dataset(num_rows=2500, start_year=2024, file_name='data/indian_stock_news_2024_25.csv'):
-    rows_expanded = []
-    start_date_expanded = datetime.strptime(f"{start_year}-01-01", "%Y-%m-%d")
-    max_days = 600  # Approx 1.5 years
-
-    for _ in range(num_rows):
-        sector = random.choice(sectors_expanded)
-        company = random.choice(companies_expanded[sector])
-        sentiment = random.choices(sentiments_expanded, weights=[0.4,0.3,0.2,0.1])[0]
-        emotion = random.choice(emotions_expanded)
-        price_change = generate_price_change(sentiment)
-        volume = generate_volume()
-        movement_word = 'rise' if price_change > 0 else 'fall' if price_change < 0 else 'stabilize'
-        headline_template = random.choice(headline_templates_expanded)
-        reason = random.choice(reasons_expanded)
-        result = random.choice(results_expanded)
-        event = random.choice(events_expanded)
-        announcement = random.choice(announcements_expanded)
-        headline = headline_template.format(
-            company=company, sector=sector, movement=movement_word, reason=reason,
-            result=result, event=event, announcement=announcement
-        )
-        summary = f"{company} in the {sector} sector has seen a {movement_word} of {price_change}% due to {reason}. Market sentiment is {sentiment} with {emotion} prevailing."
-        rand_days = random.randint(0, max_days)
-        date = start_date_expanded + timedelta(days=rand_days)
-        rows_expanded.append([
-            date.strftime("%Y-%m-%d"), headline, summary, sector, sentiment, emotion,
-            price_change, volume
-        ])
-    df_expanded = pd.DataFrame(rows_expanded, columns=[
-        'date', 'headline', 'summary', 'sector', 'sentiment', 'emotion',
-        'price_change', 'trading_volume_crore'
-    ])
-    os.makedirs(os.path.dirname(file_name), exist_ok=True)
-    df_expanded.to_csv(file_name, index=False)
-    print(f"Dataset generated and saved to {file_name}")
-
-def generate_dataset_large(num_rows=50000, start_year=2020, file_name='data/indian_stock_news_large_2020_25.csv'):
-    rows_expanded = []
-    start_date_expanded = datetime.strptime(f"{start_year}-01-01", "%Y-%m-%d")
-    max_days = 5 * 365  # 5 years
-
-    for _ in range(num_rows):
-        sector = random.choice(sectors_expanded)
-        company = random.choice(companies_expanded[sector])
-        sentiment = random.choices(sentiments_expanded, weights=[0.4,0.3,0.2,0.1])[0]
-        emotion = random.choice(emotions_expanded)
-        price_change = generate_price_change(sentiment)
-        volume = generate_volume()
-        movement_word = 'rise' if price_change > 0 else 'fall' if price_change < 0 else 'stabilize'
-        headline_template = random.choice(headline_templates_expanded)
-        reason = random.choice(reasons_expanded)
-        result = random.choice(results_expanded)
-        event = random.choice(events_expanded)
-        announcement = random.choice(announcements_expanded)
-        headline = headline_template.format(
-            company=company, sector=sector, movement=movement_word, reason=reason,
-            result=result, event=event, announcement=announcement
-        )
-        summary = f"{company} in the {sector} sector has seen a {movement_word} of {price_change}% due to {reason}. Market sentiment is {sentiment} with {emotion} prevailing."
-        rand_days = random.randint(0, max_days)
-        date = start_date_expanded + timedelta(days=rand_days)
-        rows_expanded.append([
-            date.strftime("%Y-%m-%d"), headline, summary, sector, sentiment, emotion,
-            price_change, volume
-        ])
-    df_expanded = pd.DataFrame(rows_expanded, columns=[
-        'date', 'headline', 'summary', 'sector', 'sentiment', 'emotion',
-        'price_change', 'trading_volume_crore'
-    ])
-    os.makedirs(os.path.dirname(file_name), exist_ok=True)
-    df_expanded.to_csv(file_name, index=False)
-    print(f"Large dataset generated and saved to {file_name}")
+# Uniform price-change range per sentiment, aligned with sentiments_expanded.
+price_change_ranges = {
+    'Positive': (0.5, 7),
+    'Negative': (-7, -0.5),
+    'Mixed': (-3, 3),
+    'Neutral': (-1, 1),
+}
+sentiment_weights = [0.4, 0.3, 0.2, 0.1]
+
+OUTPUT_COLUMNS = [
+    'date', 'headline', 'summary', 'sector', 'sentiment', 'emotion',
+    'price_change', 'trading_volume_crore'
+]
+
+
+def _vocab(values):
+    return np.array(values, dtype=object)
+
+
+def _parse_template(template):
+    """Split a headline template into [(literal, field_name_or_None), ...]."""
+    return [(literal, field) for literal, field, _, _ in string.Formatter().parse(template)]
+
+
+_company_names = _vocab([c for s in sectors_expanded for c in companies_expanded[s]])
+_company_counts = np.array([len(companies_expanded[s]) for s in sectors_expanded])
+_company_offsets = np.concatenate([[0], np.cumsum(_company_counts)[:-1]])
+_parsed_templates = [_parse_template(t) for t in headline_templates_expanded]
+_price_lo = np.array([price_change_ranges[s][0] for s in sentiments_expanded])
+_price_hi = np.array([price_change_ranges[s][1] for s in sentiments_expanded])
+_max_cents = int(round(max(abs(_price_lo).max(), abs(_price_hi).max()) * 100))
+# str() of every representable 2-decimal price change, indexed by cents + _max_cents.
+_price_strings = _vocab([str(round(c / 100, 2)) for c in range(-_max_cents, _max_cents + 1)])
+_movement_words = _vocab(['fall', 'stabilize', 'rise'])  # indexed by sign + 1
+
+
+def generate_chunk(rng, num_rows, start_date, max_days):
+    """
+    Generate one chunk of synthetic news rows with vectorized NumPy sampling.
+
+    Headlines and summaries are assembled from template and vocabulary indices
+    by array concatenation rather than per-row string formatting.
+
+    Args:
+        rng (np.random.Generator): Random generator (controls reproducibility).
+        num_rows (int): Rows in this chunk.
+        start_date (np.datetime64): First possible date.
+        max_days (int): Dates are drawn uniformly from [start_date, start_date + max_days].
+
+    Returns:
+        pd.DataFrame: Chunk with the dataset columns; sector/sentiment/emotion
+        are categoricals and date is datetime64.
+    """
+    sector_idx = rng.integers(0, len(sectors_expanded), num_rows)
+    company_idx = _company_offsets[sector_idx] + (rng.random(num_rows) * _company_counts[sector_idx]).astype(np.int64)
+    sentiment_idx = rng.choice(len(sentiments_expanded), size=num_rows, p=sentiment_weights)
+    emotion_idx = rng.integers(0, len(emotions_expanded), num_rows)
+
+    price_change = np.round(rng.uniform(_price_lo[sentiment_idx], _price_hi[sentiment_idx]), 2)
+    price_cents = np.rint(price_change * 100).astype(np.int64)
+    volume = np.round(rng.uniform(1, 1000, num_rows), 2)
+    days = rng.integers(0, max_days + 1, num_rows)
+
+    sectors = _vocab(sectors_expanded)[sector_idx]
+    companies = _company_names[company_idx]
+    sentiments = _vocab(sentiments_expanded)[sentiment_idx]
+    emotions = _vocab(emotions_expanded)[emotion_idx]
+    movements = _movement_words[np.sign(price_cents) + 1]
+    reasons = _vocab(reasons_expanded)[rng.integers(0, len(reasons_expanded), num_rows)]
+    fields = {
+        'company': companies,
+        'sector': sectors,
+        'movement': movements,
+        'reason': reasons,
+        'result': _vocab(results_expanded)[rng.integers(0, len(results_expanded), num_rows)],
+        'event': _vocab(events_expanded)[rng.integers(0, len(events_expanded), num_rows)],
+        'announcement': _vocab(announcements_expanded)[rng.integers(0, len(announcements_expanded), num_rows)],
+    }
+
+    template_idx = rng.integers(0, len(headline_templates_expanded), num_rows)
+    headlines = np.empty(num_rows, dtype=object)
+    for t, parts in enumerate(_parsed_templates):
+        rows = np.flatnonzero(template_idx == t)
+        if len(rows) == 0:
+            continue
+        text = np.full(len(rows), '', dtype=object)
+        for literal, field in parts:
+            text = text + literal
+            if field is not None:
+                text = text + fields[field][rows]
+        headlines[rows] = text
+
+    summaries = (
+        companies + " in the " + sectors + " sector has seen a " + movements + " of "
+        + _price_strings[price_cents + _max_cents] + "% due to " + reasons
+        + ". Market sentiment is " + sentiments + " with " + emotions + " prevailing."
+    )
+
+    return pd.DataFrame({
+        'date': start_date + days.astype('timedelta64[D]'),
+        'headline': headlines,
+        'summary': summaries,
+        'sector': pd.Categorical.from_codes(sector_idx, categories=sectors_expanded),
+        'sentiment': pd.Categorical.from_codes(sentiment_idx, categories=sentiments_expanded),
+        'emotion': pd.Categorical.from_codes(emotion_idx, categories=emotions_expanded),
+        'price_change': price_change,
+        'trading_volume_crore': volume,
+    }, columns=OUTPUT_COLUMNS)
+
+
+def iter_dataset(num_rows, start_year=2024, max_days=600, seed=None, chunk_size=500_000):
+    """
+    Yield the synthetic dataset in chunks of at most ``chunk_size`` rows.
+
+    The same seed and chunk size always produce the same rows.
+
+    Args:
+        num_rows (int): Total rows to generate.
+        start_year (int): Dates start on January 1st of this year.
+        max_days (int): Span of the date range in days.
+        seed (int): Seed for np.random.default_rng, or None for a random run.
+        chunk_size (int): Rows per chunk; bounds peak memory.
+
+    Yields:
+        pd.DataFrame: Successive chunks.
+    """
+    rng = np.random.default_rng(seed)
+    start_date = np.datetime64(f"{start_year}-01-01", 'D')
+    for offset in range(0, num_rows, chunk_size):
+        yield generate_chunk(rng, min(chunk_size, num_rows - offset), start_date, max_days)
+
+
+def write_dataset(file_name, num_rows, start_year=2024, max_days=600, seed=None, chunk_size=500_000):
+    """
+    Stream the synthetic dataset to CSV or Parquet (chosen by file extension)
+    chunk by chunk, so memory stays bounded by ``chunk_size``.
+
+    Args:
+        file_name (str): Output path ending in .csv or .parquet.
+        num_rows (int): Total rows to generate.
+        start_year (int): Dates start on January 1st of this year.
+        max_days (int): Span of the date range in days.
+        seed (int): Seed for reproducible output.
+        chunk_size (int): Rows generated and written per chunk.
+
+    Returns:
+        dict: rows, seconds and rows_per_sec of the run.
+    """
+    if os.path.dirname(file_name):
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    use_parquet = file_name.endswith('.parquet')
+    writer = None
+    start = time.perf_counter()
+    try:
+        for i, chunk in enumerate(iter_dataset(num_rows, start_year, max_days, seed, chunk_size)):
+            if use_parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(file_name, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(file_name, mode='w' if i == 0 else 'a', header=(i == 0),
+                             index=False, date_format='%Y-%m-%d')
+    finally:
+        if writer is not None:
+            writer.close()
+    seconds = time.perf_counter() - start
+    return {'rows': num_rows, 'seconds': seconds, 'rows_per_sec': num_rows / seconds if seconds else float('inf')}
+
+
+def generate_dataset(num_rows=2500, start_year=2024, file_name='data/indian_stock_news_2024_25.csv', seed=None, chunk_size=500_000):
+    stats = write_dataset(file_name, num_rows, start_year, max_days=600, seed=seed, chunk_size=chunk_size)  # Approx 1.5 years
+    print(f"Dataset generated and saved to {file_name} ({stats['rows_per_sec']:,.0f} rows/sec)")
+    return stats
+
+
+def generate_dataset_large(num_rows=50000, start_year=2020, file_name='data/indian_stock_news_large_2020_25.csv', seed=None, chunk_size=500_000):
+    stats = write_dataset(file_name, num_rows, start_year, max_days=5 * 365, seed=seed, chunk_size=chunk_size)  # 5 years
+    print(f"Large dataset generated and saved to {file_name} ({stats['rows_per_sec']:,.0f} rows/sec)")
+    return stats
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the synthetic Indian stock news dataset.")
+    parser.add_argument("--large", action="store_true", help="5-year, 50k-row defaults instead of the small dataset")
+    parser.add_argument("--rows", type=int, help="number of rows to generate")
+    parser.add_argument("--output", help="output path (.csv or .parquet)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible output")
+    parser.add_argument("--chunk-size", type=int, default=500_000, help="rows per generated/written chunk")
+    args = parser.parse_args()
+
     # Choose which dataset to generate
-    generate_dataset()      # Default smaller dataset
-    # generate_dataset_large() # Uncomment to generate large scaled dataset
+    generate = generate_dataset_large if args.large else generate_dataset
+    kwargs = {'seed': args.seed, 'chunk_size': args.chunk_size}
+    if args.rows:
+        kwargs['num_rows'] = args.rows
+    if args.output:
+        kwargs['file_name'] = args.output
+    generate(**kwargs)
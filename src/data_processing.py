@@ -1,8 +1,29 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+import numpy as np
 import pandas as pd
 
+from src import settings
+from src.data_store import (CATEGORICAL_COLUMNS, COMPANY_COLUMN, NUMERIC_COLUMNS, PARTITION_COLUMNS,
+                            PARTITION_MANIFEST, extract_companies, load_dataset, source_signature)
+from src.trend_rollup import shared_rollup
+
+PRICE_MOVEMENTS = ['Negative', 'Neutral', 'Positive']
+REQUIRED_COLUMNS = ['date', 'headline', 'sector', 'sentiment', 'price_change', 'trading_volume_crore']
+# Columns of a news row, in CSV order (see clean_incoming).
+INCOMING_COLUMNS = ['date', 'headline', 'summary', 'sector', 'sentiment', 'emotion', 'price_change',
+                    'trading_volume_crore']
+
 def load_data(csv_path='data/indian_stock_news_2024_25.csv'):
     """
     Load dataset CSV into a pandas DataFrame with date parsing.
+    The parsed, typed frame is cached as Arrow so repeated loads skip the CSV.
     
     Args:
         csv_path (str): Path to the CSV data file.
@@ -10,8 +31,7 @@ def load_data(csv_path='data/indian_stock_news_2024_25.csv'):
     Returns:
         pd.DataFrame: Loaded DataFrame.
     """
-    df = pd.read_csv(csv_path, parse_dates=['date'])
-    return df
+    return load_dataset(csv_path)
 
 def clean_data(df):
     """
@@ -26,15 +46,28 @@ def clean_data(df):
         pd.DataFrame: Cleaned DataFrame.
     """
     df = df.drop_duplicates()
-    df = df.dropna(subset=['date', 'headline', 'sector', 'sentiment', 'price_change', 'trading_volume_crore'])
+    df = df.dropna(subset=REQUIRED_COLUMNS)
     return df
 
+def _capitalize(series):
+    """str.capitalize that keeps categoricals categorical (only the categories are touched)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        capitalized = series.cat.categories.str.capitalize()
+        categories = pd.Index(capitalized.unique())
+        # The appended -1 keeps missing values (code -1) missing.
+        codes = np.append(categories.get_indexer(capitalized), -1)[series.cat.codes.to_numpy()]
+        return pd.Series(pd.Categorical.from_codes(codes, categories), index=series.index, name=series.name)
+    return series.str.capitalize()
+
 def feature_engineering(df):
     """
     Add useful engineered features for analysis and visualization:
-    - Categorize price change direction (Positive, Negative, Neutral)
+    - Categorize price change direction (Positive, Negative, Neutral) from its sign
     - Normalize sentiment text casing
     - Add price_change_abs for magnitude analysis
+    - Add is_positive / is_negative sentiment indicator columns
+    
+    All features are computed column-wise, without per-row Python calls.
     
     Args:
         df (pd.DataFrame): DataFrame to enrich.
@@ -42,32 +75,69 @@ def feature_engineering(df):
     Returns:
         pd.DataFrame: Enriched DataFrame.
     """
-    df['price_movement'] = df['price_change'].apply(lambda x: 'Positive' if x > 0 else ('Negative' if x < 0 else 'Neutral'))
-    df['sentiment'] = df['sentiment'].str.capitalize()
-    df['price_change_abs'] = df['price_change'].abs()
-    
-    # Example: You can add new columns here, e.g. weekly/monthly aggregates, event flags, etc.
+    price_change = df['price_change'].to_numpy(dtype='float64')
+    # sign -1/0/1 -> category code 0/1/2 (a missing change counts as Neutral, as before)
+    codes = (np.sign(np.nan_to_num(price_change)) + 1).astype(np.int8)
+    df['price_movement'] = pd.Categorical.from_codes(codes, PRICE_MOVEMENTS)
+    df['sentiment'] = _capitalize(df['sentiment'])
+    df['price_change_abs'] = np.abs(price_change)
+    df['is_positive'] = (df['sentiment'] == 'Positive').to_numpy(dtype=bool)
+    df['is_negative'] = (df['sentiment'] == 'Negative').to_numpy(dtype=bool)
     
     return df
 
 def aggregate_trends(df, freq='W'):
     """
     Aggregate sentiment and emotion trends by sector over time.
+    Rows are summed per (sector, day) in one pass and rolled up to ``freq``.
+    The rollup is kept per frame (trend_rollup.shared_rollup), so calls for
+    other frequencies of the same frame reuse the daily sums and a repeated
+    frequency is not recomputed.
     
     Args:
         df (pd.DataFrame): Processed DataFrame.
         freq (str): Frequency string for resampling (e.g., 'D' daily, 'W' weekly, 'M' monthly).
     
     Returns:
-        pd.DataFrame: Aggregated trend DataFrame with multi-index (date, sector).
+        pd.DataFrame: Aggregated trend DataFrame with columns sector, date and the trend measures.
+    """
+    return shared_rollup(df).trends(freq)
+
+def clean_incoming(df):
+    """
+    Validate and clean rows arriving after the dataset was built (see
+    src/ingest.py) with the same rules as the batch pipeline:
+
+    - Keep the dataset columns (missing ones are added empty, extra ones dropped)
+    - Parse dates and numbers; unparseable values become missing, and dates
+      with a UTC offset are converted to UTC and stored without it
+    - Trim text (a missing summary becomes empty) and normalize sentiment text casing
+    - Drop duplicates and rows with missing critical fields (clean_data)
+    - Extract the company column like the batch load (data_store.extract_companies)
+
+    Args:
+        df (pd.DataFrame): Raw incoming rows, e.g. parsed JSON lines.
+
+    Returns:
+        pd.DataFrame: Cleaned rows with the dataset's column layout and types.
     """
-    df_agg = df.set_index('date').groupby(['sector', pd.Grouper(freq=freq)]).agg(
-        sentiment_positive_pct=('sentiment', lambda x: (x == 'Positive').mean()),
-        sentiment_negative_pct=('sentiment', lambda x: (x == 'Negative').mean()),
-        avg_price_change=('price_change', 'mean'),
-        avg_trading_volume=('trading_volume_crore', 'mean')
-    ).reset_index()
-    return df_agg
+    df = df.reindex(columns=INCOMING_COLUMNS)
+    # utc=True so a batch mixing naive and offset dates parses instead of raising.
+    df['date'] = pd.to_datetime(df['date'], errors='coerce', format='mixed', utc=True).dt.tz_localize(None)
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    for col in ['headline', 'summary'] + CATEGORICAL_COLUMNS:
+        text = df[col].astype('string').str.strip()
+        # Back to the text dtype read_csv gives, with blanks missing.
+        text = text.mask(text == '').to_numpy(dtype=object, na_value=np.nan)
+        df[col] = pd.Series(text, index=df.index).infer_objects()
+    df['summary'] = df['summary'].fillna('')
+    df['sentiment'] = _capitalize(df['sentiment'])
+    df = clean_data(df)
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype('category')
+    df[COMPANY_COLUMN] = extract_companies(df)
+    return df
 
 def preprocess(csv_path='data/indian_stock_news_2024_25.csv'):
     """
@@ -84,12 +154,230 @@ def preprocess(csv_path='data/indian_stock_news_2024_25.csv'):
     df = feature_engineering(df)
     return df
 
+class RowHashSet:
+    """
+    64-bit hashes of every distinct row seen so far, for deduplicating a
+    stream of chunks. Hashes are kept in one sorted uint64 array (8 bytes per
+    distinct row), so membership is a binary search and adding a chunk is a
+    merge of two sorted runs.
+    """
+
+    def __init__(self):
+        self._hashes = np.empty(0, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def first_seen(self, df, remember=True):
+        """
+        Mask of the rows of ``df`` not seen in earlier chunks or earlier in
+        this one (drop_duplicates' keep='first'), remembering them unless
+        ``remember`` is False.
+        """
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        _, first = np.unique(hashes, return_index=True)
+        keep = np.zeros(len(hashes), dtype=bool)
+        keep[first] = True
+        if len(self._hashes):
+            pos = np.minimum(np.searchsorted(self._hashes, hashes), len(self._hashes) - 1)
+            keep &= self._hashes[pos] != hashes
+        if not remember:
+            return keep
+        new = np.sort(hashes[keep])
+        self._hashes = np.concatenate([self._hashes, new])
+        self._hashes.sort(kind='stable')  # two sorted runs: a linear merge
+        return keep
+
+
+def _partitioned_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('row_id', pa.int64()),
+        ('date', pa.timestamp('ns')),
+        ('headline', pa.string()),
+        ('summary', pa.string()),
+        ('sector', pa.string()),
+        ('sentiment', pa.string()),
+        ('emotion', pa.string()),
+        ('company', pa.string()),
+        ('price_change', pa.float64()),
+        ('trading_volume_crore', pa.float64()),
+        ('price_movement', pa.string()),
+        ('price_change_abs', pa.float64()),
+        ('is_positive', pa.bool_()),
+        ('is_negative', pa.bool_()),
+        ('year', pa.int16()),
+        ('month', pa.int8()),
+    ])
+
+
+class PartitionWriter:
+    """
+    Hive-style partitioned Parquet output (``year=2024/month=3/sector=Banking/``).
+
+    Every write is flushed to disk as its own row group, so nothing is
+    buffered between chunks. At most ``max_open`` files are open at once; a
+    partition whose writer was closed continues in a new part file.
+
+    Args:
+        root (str): Dataset directory.
+        schema (pa.Schema): Full row schema including the partition columns.
+        max_open (int): Maximum simultaneously open part files.
+    """
+
+    def __init__(self, root, schema, max_open=256):
+        import pyarrow as pa
+
+        self.root = root
+        self.schema = pa.schema([field for field in schema if field.name not in PARTITION_COLUMNS])
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._parts = {}
+
+    def _path(self, key):
+        directory = os.path.join(self.root, *(
+            f"{col}={quote(str(value), safe='')}" for col, value in zip(PARTITION_COLUMNS, key)))
+        os.makedirs(directory, exist_ok=True)
+        part = self._parts.get(key, 0)
+        self._parts[key] = part + 1
+        return os.path.join(directory, f"part-{part}.parquet")
+
+    def write(self, key, table):
+        import pyarrow.parquet as pq
+
+        writer = self._open.pop(key, None)
+        if writer is None:
+            if len(self._open) >= self.max_open:
+                self._open.popitem(last=False)[1].close()
+            writer = pq.ParquetWriter(self._path(key), self.schema)
+        writer.write_table(table.select(self.schema.names).cast(self.schema))
+        self._open[key] = writer
+
+    def close(self):
+        while self._open:
+            self._open.popitem()[1].close()
+
+    @property
+    def files(self):
+        return sum(self._parts.values())
+
+
+def preprocess_partitioned(csv_path=None, output_dir=None, chunk_rows=None):
+    """
+    Out-of-core preprocess: stream the CSV in chunks into a Parquet dataset
+    partitioned by year/month/sector.
+
+    Each chunk is deduplicated against every earlier row with a RowHashSet,
+    cleaned, feature-engineered and written out as one row group per
+    partition it touches (see PartitionWriter), so peak memory is one chunk
+    plus 8 bytes per distinct row. The
+    result matches preprocess() row for row; ``row_id`` keeps each row's
+    position in the CSV (the dataset row id used by the vector store).
+    The dataset is written next to ``output_dir`` and swapped in when complete,
+    together with a ``_dataset.json`` manifest (source, counts, date range,
+    category values) that the dashboard reads instead of scanning the data.
+
+    Args:
+        csv_path (str): Source CSV. Defaults to settings.DATA_PATH.
+        output_dir (str): Dataset directory. Defaults to settings.PARTITIONED_DATA_PATH.
+        chunk_rows (int): Rows per CSV chunk. Defaults to settings.PREPROCESS_CHUNK_ROWS.
+
+    Returns:
+        dict: The manifest written, including rows read/written and duplicates dropped.
+    """
+    import pyarrow as pa
+
+    start = time.perf_counter()
+    csv_path = csv_path or settings.DATA_PATH
+    output_dir = (output_dir or settings.PARTITIONED_DATA_PATH).rstrip(os.sep)
+    chunk_rows = chunk_rows or settings.PREPROCESS_CHUNK_ROWS
+    schema = _partitioned_schema()
+    seen = RowHashSet()
+    stats = {'rows_read': 0, 'duplicates': 0, 'missing': 0, 'rows_written': 0, 'chunks': 0}
+    values = {col: set() for col in CATEGORICAL_COLUMNS}
+    dates = []
+
+    dtypes = {col: 'category' for col in CATEGORICAL_COLUMNS}
+    dtypes.update({col: 'float64' for col in NUMERIC_COLUMNS})
+
+    staging = f"{output_dir}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    writer = PartitionWriter(staging, schema)
+    offset = 0
+    try:
+        for chunk in pd.read_csv(csv_path, dtype=dtypes, parse_dates=['date'], chunksize=chunk_rows):
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            stats['rows_read'] += len(chunk)
+            stats['chunks'] += 1
+            unique = chunk[seen.first_seen(chunk)]
+            stats['duplicates'] += len(chunk) - len(unique)
+            cleaned = unique.dropna(subset=REQUIRED_COLUMNS)
+            stats['missing'] += len(unique) - len(cleaned)
+            if len(cleaned) == 0:
+                continue
+            featured = feature_engineering(cleaned.copy())
+            featured[COMPANY_COLUMN] = extract_companies(featured)
+            featured['row_id'] = featured.index.to_numpy(dtype='int64')
+            featured['year'] = featured['date'].dt.year.astype('int16')
+            featured['month'] = featured['date'].dt.month.astype('int8')
+            for col in CATEGORICAL_COLUMNS:
+                values[col].update(featured[col].dropna().astype(str).unique())
+            dates.extend([featured['date'].min(), featured['date'].max()])
+            stats['rows_written'] += len(featured)
+            table = pa.Table.from_pandas(featured[schema.names], preserve_index=False)
+            groups = featured.groupby(PARTITION_COLUMNS, observed=True, sort=True).indices
+            for key, rows in groups.items():
+                writer.write(key, table.take(rows))
+    finally:
+        writer.close()
+    stats['files'] = writer.files
+    size, mtime_ns = source_signature(csv_path)
+    manifest = {
+        'source': csv_path,
+        'size': size,
+        'mtime_ns': mtime_ns,
+        **stats,
+        'date_min': min(dates).isoformat() if dates else None,
+        'date_max': max(dates).isoformat() if dates else None,
+        **{f'{col}_values': sorted(found) for col, found in values.items()},
+        'seconds': time.perf_counter() - start,
+    }
+    os.makedirs(staging, exist_ok=True)
+    with open(os.path.join(staging, PARTITION_MANIFEST), 'w') as fh:
+        json.dump(manifest, fh, indent=2)
+
+    # Swap the finished dataset in; readers see either the old or the new one.
+    retired = f"{output_dir}.old"
+    shutil.rmtree(retired, ignore_errors=True)
+    if os.path.exists(output_dir):
+        os.replace(output_dir, retired)
+    os.replace(staging, output_dir)
+    shutil.rmtree(retired, ignore_errors=True)
+    return manifest
+
+
 if __name__ == "__main__":
-    df_processed = preprocess()
-    print("Sample processed data:")
-    print(df_processed.head())
-
-    # Example aggregation
-    df_trends = aggregate_trends(df_processed)
-    print("\nSample aggregated sentiment trends by sector (weekly):")
-    print(df_trends.head())
+    parser = argparse.ArgumentParser(description="Preprocess the news dataset.")
+    parser.add_argument("--csv", default=settings.DATA_PATH, help="source CSV")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="stream the CSV in chunks into a year/month/sector partitioned Parquet dataset")
+    parser.add_argument("--output", default=settings.PARTITIONED_DATA_PATH, help="partitioned dataset directory")
+    parser.add_argument("--chunk-rows", type=int, default=settings.PREPROCESS_CHUNK_ROWS, help="rows per CSV chunk")
+    args = parser.parse_args()
+
+    if args.partitioned:
+        manifest = preprocess_partitioned(args.csv, args.output, args.chunk_rows)
+        print(f"✅ {manifest['rows_written']:,} of {manifest['rows_read']:,} rows written to '{args.output}' "
+              f"in {manifest['chunks']} chunks ({manifest['duplicates']:,} duplicates, "
+              f"{manifest['missing']:,} incomplete rows dropped, {manifest['seconds']:.1f}s)")
+    else:
+        df_processed = preprocess(args.csv)
+        print("Sample processed data:")
+        print(df_processed.head())
+
+        # Example aggregation
+        df_trends = aggregate_trends(df_processed)
+        print("\nSample aggregated sentiment trends by sector (weekly):")
+        print(df_trends.head())
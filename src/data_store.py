@@ -0,0 +1,554 @@
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import settings
+from src.instrumentation import traced
+
+CATEGORICAL_COLUMNS = ['sector', 'sentiment', 'emotion']
+NUMERIC_COLUMNS = ['price_change', 'trading_volume_crore']
+
+# Company named by each row, extracted from the summary when the data is parsed
+# (the generator writes "<company> in the <sector> sector has seen ..."); rows
+# whose summary does not follow that form are matched against the known names.
+COMPANY_COLUMN = 'company'
+COMPANY_SUMMARY_PATTERN = r"^\s*(.+?) in the [^.]*? sector has seen"
+# Bumped when the parsed layout changes (e.g. a derived column is added), so
+# columnar caches written by older code are rebuilt.
+CACHE_FORMAT = 2
+
+# Partitioned Parquet dataset written by data_processing.preprocess_partitioned.
+PARTITION_COLUMNS = ['year', 'month', 'sector']
+PARTITION_MANIFEST = "_dataset.json"
+# Columns the dashboard needs (filters, cube measures and the chatbot context).
+DASHBOARD_COLUMNS = ['row_id', 'date', 'headline', 'summary', 'sector', 'sentiment', 'emotion', 'company',
+                     'price_change', 'trading_volume_crore']
+
+# Date-sorted Arrow IPC copy of the dataset that every process memory-maps.
+SHARED_SUFFIX = ".shared.arrow"
+SHARED_SOURCE_KEY = b"finlytics.source"
+
+# Rows added by live ingestion (src/ingest.py): one Arrow IPC file per committed batch.
+INGEST_SUFFIX = ".ingest"
+INGEST_META_KEY = b"finlytics.ingest"
+
+HAS_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+_memory_cache = {}
+_lock = threading.Lock()
+
+# Details of the most recent load_dataset() call, useful for reporting cold vs warm timings.
+last_load_stats = {}
+
+
+def _file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(csv_path, cache_dir):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return (
+        os.path.join(cache_dir, f"{stem}.arrow"),
+        os.path.join(cache_dir, f"{stem}.meta.json"),
+    )
+
+
+def source_signature(csv_path):
+    """
+    Cheap signature of the source file used to detect changes between reruns.
+
+    Args:
+        csv_path (str): Path to the CSV data file.
+
+    Returns:
+        tuple: (size in bytes, modification time in ns).
+    """
+    stat = os.stat(csv_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _known_company_pattern():
+    from src.data_generation import companies_expanded
+
+    names = {company for companies in companies_expanded.values() for company in companies}
+    # Longest first, so "Tech Mahindra" wins over "Mahindra".
+    alternatives = '|'.join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    return rf"(?<![\w&])({alternatives})(?!\w)"
+
+
+def extract_companies(df):
+    """
+    Company named by each row, as a categorical column.
+
+    One vectorized regex pass over the summaries; only rows whose summary
+    does not follow the generated form are searched for a known company name
+    (headline first, then summary). Rows naming no company are missing.
+
+    Args:
+        df (pd.DataFrame): Rows with ``headline`` and ``summary`` columns.
+
+    Returns:
+        pd.Series: Categorical company names aligned with ``df``.
+    """
+    company = df['summary'].astype('str').str.extract(COMPANY_SUMMARY_PATTERN, expand=False)
+    unmatched = company.isna().to_numpy()
+    if unmatched.any():
+        pattern = _known_company_pattern()
+        rows = df[unmatched]
+        found = rows['headline'].astype('str').str.extract(pattern, expand=False)
+        found = found.fillna(rows['summary'].astype('str').str.extract(pattern, expand=False))
+        company = company.astype(object)
+        company[unmatched] = found.to_numpy(dtype=object)
+    return company.astype('category').rename(COMPANY_COLUMN)
+
+
+@traced("data.parse_csv", rows=True)
+def parse_csv(csv_path):
+    """
+    Parse the raw CSV into the typed layout used by the store:
+    categorical sector/sentiment/emotion, datetime64 date and float columns,
+    plus the categorical company column (see extract_companies).
+
+    Args:
+        csv_path (str): Path to the CSV data file.
+
+    Returns:
+        pd.DataFrame: Typed DataFrame.
+    """
+    dtypes = {col: 'category' for col in CATEGORICAL_COLUMNS}
+    dtypes.update({col: 'float64' for col in NUMERIC_COLUMNS})
+    df = pd.read_csv(csv_path, dtype=dtypes, parse_dates=['date'])
+    df[COMPANY_COLUMN] = extract_companies(df)
+    return df
+
+
+def _read_cache(cache_path):
+    from pyarrow import feather
+    return feather.read_table(cache_path, memory_map=True).to_pandas()
+
+
+def _write_cache(df, cache_path, meta_path, meta):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_cache = f"{cache_path}.tmp"
+    df.reset_index(drop=True).to_feather(tmp_cache)
+    os.replace(tmp_cache, cache_path)
+    _write_meta(meta_path, meta)
+
+
+def _write_meta(meta_path, meta):
+    tmp_meta = f"{meta_path}.tmp"
+    with open(tmp_meta, 'w') as fh:
+        json.dump(meta, fh)
+    os.replace(tmp_meta, meta_path)
+
+
+def _load_uncached(csv_path, cache_dir):
+    """Load from the on-disk columnar cache, (re)building it from the CSV if stale."""
+    size, mtime_ns = source_signature(csv_path)
+    if not HAS_ARROW:
+        return parse_csv(csv_path), 'csv'
+
+    cache_path, meta_path = _cache_paths(csv_path, cache_dir)
+    meta = None
+    if os.path.exists(cache_path) and os.path.exists(meta_path):
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+
+    if meta and meta.get('format') != CACHE_FORMAT:
+        meta = None
+    if meta and meta.get('size') == size and meta.get('mtime_ns') == mtime_ns:
+        return _read_cache(cache_path), 'disk-cache'
+
+    # mtime/size changed: only re-parse when the content actually changed.
+    sha256 = _file_sha256(csv_path)
+    new_meta = {'size': size, 'mtime_ns': mtime_ns, 'sha256': sha256, 'format': CACHE_FORMAT}
+    if meta and meta.get('sha256') == sha256:
+        _write_meta(meta_path, new_meta)
+        return _read_cache(cache_path), 'disk-cache'
+
+    df = parse_csv(csv_path)
+    _write_cache(df, cache_path, meta_path, new_meta)
+    return df, 'csv'
+
+
+@traced("data.load_dataset", rows=True)
+def load_dataset(csv_path=None, cache_dir=None):
+    """
+    Load the news dataset through the columnar cache.
+
+    The CSV is parsed once into an Arrow (Feather) file under ``cache_dir``;
+    later loads memory-map that file instead of re-parsing. The cache is
+    invalidated when the source size/mtime changes and its SHA-256 differs.
+    Loaded frames are also kept in process memory, so Streamlit reruns and
+    sessions share a single parsed copy.
+
+    Args:
+        csv_path (str): Path to the CSV data file. Defaults to settings.DATA_PATH.
+        cache_dir (str): Directory for the columnar cache. Defaults to settings.CACHE_DIR.
+
+    Returns:
+        pd.DataFrame: Typed DataFrame (a shallow copy of the shared frame).
+    """
+    csv_path = csv_path or settings.DATA_PATH
+    cache_dir = cache_dir or settings.CACHE_DIR
+    key = os.path.abspath(csv_path)
+
+    start = time.perf_counter()
+    with _lock:
+        signature = source_signature(csv_path)
+        cached = _memory_cache.get(key)
+        if cached and cached[0] == signature:
+            df, source = cached[1], 'memory'
+        else:
+            df, source = _load_uncached(csv_path, cache_dir)
+            _memory_cache[key] = (signature, df)
+
+    last_load_stats.update({
+        'path': csv_path,
+        'source': source,
+        'rows': len(df),
+        'seconds': time.perf_counter() - start,
+    })
+    return df.copy(deep=False)
+
+
+def clear_memory_cache():
+    """Drop all in-process cached frames (the on-disk cache is kept)."""
+    with _lock:
+        _memory_cache.clear()
+
+
+def _shared_path(csv_path, cache_dir):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{stem}{SHARED_SUFFIX}")
+
+
+def _shared_source(path):
+    """Source signature and cache format recorded in a shared dataset file, or None if missing/unreadable."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    try:
+        with pa.memory_map(path) as source:
+            metadata = ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    raw = metadata.get(SHARED_SOURCE_KEY)
+    return tuple(json.loads(raw)) if raw else None
+
+
+@traced("data.publish_shared")
+def publish_shared_dataset(csv_path=None, cache_dir=None):
+    """
+    Write the shared, memory-mappable copy of the dataset if it is missing or stale.
+
+    The file is an uncompressed Arrow IPC file with the rows sorted by date
+    (the order FilterEngine needs) and a ``row_id`` column holding each row's
+    CSV position. It is written to a temporary name and renamed into place,
+    so processes that already mapped the previous version keep reading it.
+
+    Args:
+        csv_path (str): Path to the CSV data file. Defaults to settings.DATA_PATH.
+        cache_dir (str): Directory for the file. Defaults to settings.CACHE_DIR.
+
+    Returns:
+        str: Path of the shared dataset file.
+    """
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    csv_path = csv_path or settings.DATA_PATH
+    cache_dir = cache_dir or settings.CACHE_DIR
+    path = _shared_path(csv_path, cache_dir)
+    signature = source_signature(csv_path)
+    if _shared_source(path) == (*signature, CACHE_FORMAT):
+        return path
+
+    # Bypass the in-process cache so publishing does not pin an unsorted copy.
+    df, _ = _load_uncached(csv_path, cache_dir)
+    df = df.take(np.argsort(df['date'].values, kind='stable'))
+    df.insert(0, 'row_id', df.index.to_numpy(dtype=np.int64))
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False).combine_chunks()
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        SHARED_SOURCE_KEY: json.dumps([*signature, CACHE_FORMAT]),
+    })
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(len(table), 1))
+    os.replace(tmp_path, path)
+    return path
+
+
+@traced("data.open_shared", rows=True)
+def open_shared_dataset(csv_path=None, cache_dir=None):
+    """
+    Memory-map the shared dataset (publishing it first if needed).
+
+    Every column of the returned frame is a view over the mapped file:
+    numbers and dates as NumPy arrays, headlines and summaries as Arrow
+    strings, categories as dictionary codes. The pages live in the OS page
+    cache, so all sessions of this process and every other process that
+    opens the same file share one physical copy instead of each holding its
+    own. Falls back to load_dataset when pyarrow is not installed.
+
+    Args:
+        csv_path (str): Path to the CSV data file. Defaults to settings.DATA_PATH.
+        cache_dir (str): Directory for the file. Defaults to settings.CACHE_DIR.
+
+    Returns:
+        pd.DataFrame: Date-sorted, read-only frame indexed by the CSV row id.
+    """
+    csv_path = csv_path or settings.DATA_PATH
+    if not HAS_ARROW:
+        return load_dataset(csv_path, cache_dir)
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    key = ('shared', os.path.abspath(csv_path))
+    start = time.perf_counter()
+    with _lock:
+        signature = source_signature(csv_path)
+        cached = _memory_cache.get(key)
+        if cached and cached[0] == signature:
+            df, source = cached[1], 'memory'
+        else:
+            path = publish_shared_dataset(csv_path, cache_dir)
+            table = ipc.open_file(pa.memory_map(path)).read_all()
+            # split_blocks keeps one block per column, so no column is consolidated (copied).
+            df = table.to_pandas(split_blocks=True)
+            df.index = pd.Index(df.pop('row_id').to_numpy(), name=None)
+            source = 'shared-mmap'
+            _memory_cache[key] = (signature, df)
+
+    last_load_stats.update({
+        'path': csv_path,
+        'source': source,
+        'rows': len(df),
+        'seconds': time.perf_counter() - start,
+    })
+    return df.copy(deep=False)
+
+
+def ingest_dir(csv_path=None, cache_dir=None, signature=None):
+    """
+    Directory holding the ingested segments of a dataset.
+
+    Keyed by the CSV's source signature, so a regenerated CSV starts without
+    segments instead of replaying rows whose ids collide with its own (the
+    previous version's segments are left in their directory).
+
+    Args:
+        signature (tuple): source_signature of the CSV version. Defaults to the current one.
+    """
+    csv_path = csv_path or settings.DATA_PATH
+    size, mtime_ns = signature or source_signature(csv_path)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir or settings.CACHE_DIR, f"{stem}-{size}-{mtime_ns}{INGEST_SUFFIX}")
+
+
+def ingest_segments(csv_path=None, cache_dir=None, signature=None):
+    """
+    Committed ingest segments, oldest first.
+
+    Returns:
+        list[tuple]: (segment number, path) pairs; empty when nothing was ingested.
+    """
+    directory = ingest_dir(csv_path, cache_dir, signature)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    segments = []
+    for name in names:
+        number, ext = os.path.splitext(name)
+        if ext == '.arrow' and number.startswith('segment-') and number[8:].isdigit():
+            segments.append((int(number[8:]), os.path.join(directory, name)))
+    return sorted(segments)
+
+
+def write_ingest_segment(rows, number, metadata=None, csv_path=None, cache_dir=None, signature=None):
+    """
+    Commit a batch of ingested rows as segment ``number``.
+
+    The rows (indexed by their new row ids) are written to a temporary file
+    and renamed into place, so a segment is either complete or absent.
+
+    Args:
+        rows (pd.DataFrame): Cleaned rows indexed by row id.
+        number (int): Segment number, one above the last committed segment.
+        metadata (dict): JSON-serialisable commit details (e.g. source offsets).
+
+    Returns:
+        str: Path of the segment file.
+    """
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    directory = ingest_dir(csv_path, cache_dir, signature)
+    os.makedirs(directory, exist_ok=True)
+    frame = rows.copy(deep=False)
+    frame.insert(0, 'row_id', frame.index.to_numpy(dtype=np.int64))
+    table = pa.Table.from_pandas(frame.reset_index(drop=True), preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        INGEST_META_KEY: json.dumps(metadata or {}),
+    })
+    path = os.path.join(directory, f"segment-{number:06d}.arrow")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def segment_metadata(path):
+    """Commit details recorded by write_ingest_segment."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    with pa.memory_map(path) as source:
+        raw = (ipc.open_file(source).schema.metadata or {}).get(INGEST_META_KEY)
+    return json.loads(raw) if raw else {}
+
+
+def read_ingest_segments(csv_path=None, cache_dir=None, after=0, signature=None):
+    """
+    Rows of the ingest segments numbered above ``after``.
+
+    Returns:
+        tuple: (frame indexed by row id, or None when there are no such
+        segments; number of the last segment read, ``after`` if none).
+    """
+    segments = [(number, path) for number, path in ingest_segments(csv_path, cache_dir, signature)
+                if number > after]
+    if not segments:
+        return None, after
+    from pyarrow import feather
+
+    frames = [feather.read_table(path, memory_map=True).to_pandas() for _, path in segments]
+    for frame in frames:
+        # Segments committed before the company column existed derive it on read.
+        if COMPANY_COLUMN not in frame:
+            frame[COMPANY_COLUMN] = extract_companies(frame)
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    for col in CATEGORICAL_COLUMNS + [COMPANY_COLUMN]:
+        df[col] = df[col].astype('category')
+    df.index = pd.Index(df.pop('row_id').to_numpy(), name=None)
+    return df, segments[-1][0]
+
+
+def partition_info(dataset_dir=None):
+    """
+    Manifest of a partitioned dataset: source signature, row counts, date
+    range and the sector/sentiment/emotion values, read without scanning data.
+
+    Raises:
+        FileNotFoundError: If the dataset has not been written yet.
+    """
+    dataset_dir = dataset_dir or settings.PARTITIONED_DATA_PATH
+    with open(os.path.join(dataset_dir, PARTITION_MANIFEST)) as fh:
+        return json.load(fh)
+
+
+def _partition_filter(start_date=None, end_date=None, sectors=None):
+    """
+    Filter expression for a date range and sector selection. Conditions on
+    the year/month/sector partition keys prune whole directories; the date
+    condition then skips row groups by their min/max statistics.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    year, month, date = ds.field('year'), ds.field('month'), ds.field('date')
+    conditions = []
+    if start_date is not None:
+        start = pd.Timestamp(start_date)
+        conditions.append((year > start.year) | ((year == start.year) & (month >= start.month)))
+        conditions.append(date >= pa.scalar(start.as_unit('ns'), type=pa.timestamp('ns')))
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        conditions.append((year < end.year) | ((year == end.year) & (month <= end.month)))
+        # Inclusive of the whole end day, like FilterEngine.select.
+        end_exclusive = end.normalize() + pd.Timedelta(days=1)
+        conditions.append(date < pa.scalar(end_exclusive.as_unit('ns'), type=pa.timestamp('ns')))
+    if sectors is not None:
+        conditions.append(ds.field('sector').isin([str(sector) for sector in sectors]))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+@traced("data.load_partitioned", rows=True)
+def load_partitioned(dataset_dir=None, start_date=None, end_date=None, sectors=None, columns=None):
+    """
+    Load only the rows and columns needed for a date range and sector selection
+    from the partitioned Parquet dataset.
+
+    Partitions outside the selected months and sectors are never opened and
+    unrequested columns are never read, so memory follows the size of the
+    selection rather than of the dataset.
+
+    Args:
+        dataset_dir (str): Dataset directory. Defaults to settings.PARTITIONED_DATA_PATH.
+        start_date: First date to include (None = unbounded).
+        end_date: Last date to include, inclusive (None = unbounded).
+        sectors (list): Sectors to include, or None for all.
+        columns (list): Columns to read. Defaults to DASHBOARD_COLUMNS.
+
+    Returns:
+        pd.DataFrame: Typed frame indexed by the CSV row id, in row id order.
+    """
+    import pyarrow.dataset as ds
+
+    dataset_dir = dataset_dir or settings.PARTITIONED_DATA_PATH
+    columns = list(columns or DASHBOARD_COLUMNS)
+    if 'row_id' not in columns:
+        columns.append('row_id')
+    start = time.perf_counter()
+    dataset = ds.dataset(dataset_dir, format='parquet', partitioning='hive')
+    # Datasets written before the company column existed derive it on read.
+    derive_company = COMPANY_COLUMN in columns and COMPANY_COLUMN not in dataset.schema.names
+    if derive_company:
+        requested = columns
+        # The company is read from the headline and summary, requested or not.
+        columns = [col for col in columns if col != COMPANY_COLUMN]
+        columns += [col for col in ('headline', 'summary') if col not in columns]
+    expression = _partition_filter(start_date, end_date, sectors)
+    fragments = list(dataset.get_fragments(filter=expression))
+    table = dataset.to_table(columns=columns, filter=expression)
+    df = table.to_pandas()
+    if derive_company:
+        df[COMPANY_COLUMN] = extract_companies(df)
+        df = df[[col for col in requested if col in df]]
+    for col in CATEGORICAL_COLUMNS + [COMPANY_COLUMN, 'price_movement']:
+        if col in df:
+            df[col] = df[col].astype('category')
+    if 'date' in df:
+        df['date'] = df['date'].astype('datetime64[ns]')
+    df.index = pd.Index(df.pop('row_id').to_numpy(), name=None)
+    df = df.sort_index()
+
+    last_load_stats.update({
+        'path': dataset_dir,
+        'source': 'parquet',
+        'rows': len(df),
+        'files': len(fragments),
+        'seconds': time.perf_counter() - start,
+    })
+    return df
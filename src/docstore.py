@@ -0,0 +1,516 @@
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from src import settings
+from src.ann_index import prepare_index, set_search_params
+
+DOCSTORE_FILE = "docstore.sqlite"
+# Names the version subdirectory holding the current files of a saved store.
+CURRENT_FILE = "CURRENT"
+
+_SCHEMA = """
+CREATE TABLE docs (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    row_id INTEGER,
+    content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE members (
+    row_id INTEGER NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE TABLE member_docs (
+    row_id INTEGER PRIMARY KEY,
+    content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+"""
+# Covering index so the row id -> position map is read without touching the texts.
+_INDEXES = "CREATE INDEX docs_row_id ON docs (row_id, position);"
+_INSERT_DOCS = "INSERT INTO docs VALUES (?, ?, ?, ?, ?)"
+_INSERT_MEMBERS = "INSERT INTO members VALUES (?, ?)"
+_INSERT_MEMBER_DOCS = "INSERT INTO member_docs VALUES (?, ?, ?)"
+
+
+def _members(position, metadata):
+    """(row_id, position) of the other rows a near-duplicate representative stands for."""
+    own = metadata.get('row_id')
+    return [(row_id, position) for row_id in metadata.get('cluster_rows', ()) if row_id != own]
+
+
+def resolve_index_dir(index_dir):
+    """
+    Directory with the current files of a saved vector store: the version
+    subdirectory named by ``index_dir/CURRENT`` (see
+    create_memory_for_llm.save_vectorstore), or ``index_dir`` itself for
+    stores saved before versioning. Resolve once per open so every file
+    comes from the same version.
+    """
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE)) as fh:
+            return os.path.join(index_dir, fh.read().strip())
+    except FileNotFoundError:
+        return index_dir
+
+
+def store_dir(vectorstore, index_dir):
+    """
+    Directory the files of an opened store came from: the version its
+    SQLite docstore lives in, which stays the same when a newer version is
+    published meanwhile. Plain FAISS stores resolve ``index_dir`` now.
+    """
+    if isinstance(vectorstore.docstore, SQLiteDocstore):
+        return os.path.dirname(vectorstore.docstore.path)
+    return resolve_index_dir(index_dir)
+
+
+def write_docstore(vectorstore, path, batch_size=10_000, member_docs=None):
+    """
+    Export a FAISS store's documents to an SQLite docstore file.
+
+    One row per index position with the document id, text and JSON metadata;
+    ``row_id`` is copied into its own column so the dashboard can map its row
+    selection to index positions with a single query. The other rows of a
+    near-duplicate cluster (``cluster_rows`` metadata) go to the ``members``
+    table, pointing at their representative's position, and their own text
+    to ``member_docs`` (see SQLiteDocstore.member_document).
+
+    Args:
+        vectorstore (FAISS): Store whose docstore and id map are exported.
+        path (str): Output file; replaced if it exists.
+        batch_size (int): Rows per executemany batch.
+        member_docs (iterable): (row_id, text, metadata) of the rows collapsed into a representative.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.executescript(_SCHEMA)
+            batch, members = [], []
+            for position, doc_id in sorted(vectorstore.index_to_docstore_id.items()):
+                doc = vectorstore.docstore.search(doc_id)
+                if not isinstance(doc, Document):
+                    continue
+                batch.append((position, doc_id, doc.metadata.get('row_id'), doc.page_content,
+                              json.dumps(doc.metadata)))
+                members += _members(position, doc.metadata)
+                if len(batch) >= batch_size:
+                    conn.executemany(_INSERT_DOCS, batch)
+                    conn.executemany(_INSERT_MEMBERS, members)
+                    batch, members = [], []
+            conn.executemany(_INSERT_DOCS, batch)
+            conn.executemany(_INSERT_MEMBERS, members)
+            conn.executemany(_INSERT_MEMBER_DOCS, ((int(row_id), text, json.dumps(meta))
+                                                   for row_id, text, meta in member_docs or ()))
+            conn.executescript(_INDEXES)
+    finally:
+        conn.close()
+
+
+def insert_documents(path, start, ids, texts, metadatas):
+    """
+    Append documents to a docstore file at index positions ``start``,
+    ``start + 1``, ... (live ingestion, see append_documents).
+
+    Returns:
+        int: Documents inserted.
+    """
+    rows = [(start + i, doc_id, meta.get('row_id'), text, json.dumps(meta))
+            for i, (doc_id, text, meta) in enumerate(zip(ids, texts, metadatas))]
+    members = [member for i, meta in enumerate(metadatas) for member in _members(start + i, meta)]
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.executemany(_INSERT_DOCS, rows)
+            if members:
+                conn.executemany(_INSERT_MEMBERS, members)
+    finally:
+        conn.close()
+    return len(rows)
+
+
+class SQLiteDocstore:
+    """
+    Read-only LangChain docstore over a file written by write_docstore.
+
+    Nothing is loaded up front: each lookup reads just the requested
+    documents, so resident memory and open time do not grow with the corpus.
+    The connection is opened here rather than on first use, so the store
+    keeps reading the file it was opened with (the one matching the index
+    opened next to it) even after save_vectorstore replaces it. Threads share
+    it; queries are serialized, and each reads only a few rows.
+
+    Args:
+        path (str): SQLite docstore file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def _fetch(self, query, params=()):
+        with self._lock:
+            return self._connection.execute(query, params).fetchall()
+
+    def __len__(self):
+        return self._fetch("SELECT COUNT(*) FROM docs")[0][0]
+
+    def search(self, search):
+        """Document for an id, or a not-found message (the InMemoryDocstore contract)."""
+        rows = self._fetch("SELECT content, metadata FROM docs WHERE id = ?", (search,))
+        if not rows:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=rows[0][0], metadata=json.loads(rows[0][1]))
+
+    def doc_id(self, position):
+        rows = self._fetch("SELECT id FROM docs WHERE position = ?", (int(position),))
+        return rows[0][0] if rows else None
+
+    def positions(self):
+        return [row[0] for row in self._fetch("SELECT position FROM docs ORDER BY position")]
+
+    def row_positions(self):
+        """
+        Index positions and dataset row ids of every document with a row id,
+        plus the position of the representative for every row collapsed
+        into a near-duplicate cluster.
+
+        Returns:
+            tuple: (positions, row_ids) int64 arrays.
+        """
+        rows = self._fetch("SELECT position, row_id FROM docs WHERE row_id IS NOT NULL")
+        try:
+            rows += self._fetch("SELECT position, row_id FROM members")
+        except sqlite3.OperationalError:
+            pass  # docstore written before near-duplicate collapsing
+        pairs = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        return pairs[:, 0], pairs[:, 1]
+
+    def member_document(self, row_id):
+        """
+        Document for a row collapsed into a near-duplicate representative,
+        built from the row itself, or None when the file has no such row.
+        """
+        try:
+            rows = self._fetch("SELECT content, metadata FROM member_docs WHERE row_id = ?", (int(row_id),))
+        except sqlite3.OperationalError:
+            return None  # docstore written before member texts were kept
+        if not rows:
+            return None
+        return Document(page_content=rows[0][0], metadata=json.loads(rows[0][1]))
+
+    def documents_from(self, position):
+        """
+        Documents at index positions >= ``position``, in position order.
+
+        Returns:
+            tuple: (ids, texts, metadatas) lists.
+        """
+        rows = self._fetch(
+            "SELECT id, content, metadata FROM docs WHERE position >= ? ORDER BY position", (int(position),))
+        return [row[0] for row in rows], [row[1] for row in rows], [json.loads(row[2]) for row in rows]
+
+    def existing_ids(self, ids):
+        """The subset of ``ids`` already in the docstore."""
+        found = set()
+        ids = list(ids)
+        for offset in range(0, len(ids), 500):
+            chunk = ids[offset:offset + 500]
+            query = f"SELECT id FROM docs WHERE id IN ({','.join('?' * len(chunk))})"
+            found.update(row[0] for row in self._fetch(query, chunk))
+        return found
+
+    def delete(self, ids):
+        raise ValueError("SQLiteDocstore is read-only; rebuild it with python -m src.create_memory_for_llm")
+
+
+class DocstoreIdMap(Mapping):
+    """index position -> document id, answered from the SQLite docstore on demand."""
+
+    def __init__(self, docstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position):
+        doc_id = self.docstore.doc_id(position)
+        if doc_id is None:
+            raise KeyError(position)
+        return doc_id
+
+    def __iter__(self):
+        return iter(self.docstore.positions())
+
+    def __len__(self):
+        return len(self.docstore)
+
+
+class ReadOnlyFAISS(FAISS):
+    """
+    FAISS store opened for serving: memory-mapped vectors plus SQLite docstore.
+
+    Writes through the LangChain API are refused up front; a memory-mapped
+    faiss index cannot grow (attempting it aborts the process). Live
+    ingestion appends documents with append_documents instead.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise ValueError("This vector store is opened read-only; update it with python -m src.create_memory_for_llm")
+
+    add_texts = add_embeddings = add_documents = delete = merge_from = _read_only
+
+
+class AppendedIndex:
+    """
+    A served faiss index plus the vectors appended to it since it was read.
+
+    Appended vectors are kept in a float32 array and searched exactly, and
+    their hits are merged with the base index's by score; positions continue
+    after ``base.ntotal``. Instances are immutable (with_vectors returns a new
+    one), so searches running during an append see a consistent index.
+
+    Implements the part of the faiss.Index interface used by LangChain's FAISS
+    store and src.retrieval (``ntotal``, ``d``, ``metric_type``, ``search``,
+    ``reconstruct``, ``reconstruct_batch``); faiss helpers that need a real
+    index get ``base``.
+
+    Args:
+        base (faiss.Index): Index as read from ``index.faiss``.
+        vectors (np.ndarray): Appended vectors, normalized like the base's.
+    """
+
+    def __init__(self, base, vectors):
+        self.base = base
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, base.d)
+        self.d = base.d
+        self.metric_type = base.metric_type
+        self.ntotal = base.ntotal + len(self.vectors)
+
+    def with_vectors(self, vectors):
+        return AppendedIndex(self.base, np.concatenate([self.vectors, np.asarray(vectors, dtype=np.float32)]))
+
+    def merged(self):
+        """A real faiss index holding the base and appended vectors."""
+        index = faiss.deserialize_index(faiss.serialize_index(self.base))
+        set_search_params(prepare_index(index))
+        index.add(self.vectors)
+        return index
+
+    def search(self, x, k, params=None):
+        x = np.asarray(x, dtype=np.float32)
+        distances, labels = self.base.search(x, k, params=params)
+        positions = np.arange(self.base.ntotal, self.ntotal)
+        vectors = self.vectors
+        selector = getattr(params, 'sel', None)
+        if selector is not None:
+            keep = np.fromiter((selector.is_member(int(p)) for p in positions), dtype=bool, count=len(positions))
+            positions, vectors = positions[keep], vectors[keep]
+        if len(positions) == 0:
+            return distances, labels
+        if self.metric_type == faiss.METRIC_INNER_PRODUCT:
+            scores = x @ vectors.T
+            order = -1
+        else:
+            scores = (x ** 2).sum(axis=1)[:, None] - 2 * x @ vectors.T + (vectors ** 2).sum(axis=1)[None, :]
+            order = 1
+        all_scores = np.concatenate([distances, scores.astype(np.float32)], axis=1)
+        all_labels = np.concatenate([labels, np.broadcast_to(positions, scores.shape)], axis=1)
+        # Empty base slots (label -1) sort last whatever their filler score.
+        rank = np.where(all_labels < 0, np.inf, order * all_scores.astype(np.float64))
+        top = np.argsort(rank, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(all_scores, top, axis=1), np.take_along_axis(all_labels, top, axis=1)
+
+    def reconstruct(self, key):
+        key = int(key)
+        if key < self.base.ntotal:
+            return self.base.reconstruct(key)
+        return self.vectors[key - self.base.ntotal].copy()
+
+    def reconstruct_batch(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        out = np.empty((len(keys), self.d), dtype=np.float32)
+        appended = keys >= self.base.ntotal
+        if (~appended).any():
+            out[~appended] = self.base.reconstruct_batch(keys[~appended])
+        out[appended] = self.vectors[keys[appended] - self.base.ntotal]
+        return out
+
+
+def read_index(path, mmap=True):
+    """
+    Read a faiss index, memory-mapping its vector storage when the index type
+    allows so pages are shared between processes and loaded on demand.
+    """
+    if mmap:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass  # index type without mmap support
+    return faiss.read_index(path)
+
+
+def append_documents(vectorstore, ids, texts, vectors, metadatas):
+    """
+    Add documents to a store opened with open_vectorstore while it serves queries.
+
+    The documents are inserted into ``docstore.sqlite`` first, then their
+    vectors are appended to the served index (see AppendedIndex) without
+    copying it. Searches running meanwhile keep using the index they started with, and a
+    document only becomes searchable once its vector exists (row maps ignore
+    docstore positions beyond the index size). The index file is not
+    rewritten here, see save_index. Plain FAISS stores (no SQLite docstore)
+    are extended in memory.
+
+    Args:
+        vectorstore (FAISS): Store to extend.
+        ids (list[str]): Document ids (see create_memory_for_llm.content_ids).
+        texts (list[str]): Document texts.
+        vectors (array-like): Embedding per document.
+        metadatas (list[dict]): Metadata per document, with ``row_id``.
+
+    Returns:
+        list[str]: Ids of the documents added, in position order (ids already
+        in the store are skipped).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+    if not isinstance(vectorstore.docstore, SQLiteDocstore):
+        known = set(vectorstore.index_to_docstore_id.values())
+        keep = [i for i, doc_id in enumerate(ids) if doc_id not in known]
+        if keep:
+            vectorstore.add_embeddings([(texts[i], vectors[i].tolist()) for i in keep],
+                                       metadatas=[metadatas[i] for i in keep], ids=[ids[i] for i in keep])
+        return [ids[i] for i in keep]
+
+    known = vectorstore.docstore.existing_ids(ids)
+    keep = [i for i, doc_id in enumerate(ids) if doc_id not in known]
+    if not keep:
+        return []
+    start = vectorstore.index.ntotal
+    insert_documents(vectorstore.docstore.path, start, [ids[i] for i in keep], [texts[i] for i in keep],
+                     [metadatas[i] for i in keep])
+    _add_vectors(vectorstore, vectors[keep])
+    return [ids[i] for i in keep]
+
+
+def _add_vectors(vectorstore, vectors):
+    if getattr(vectorstore, '_normalize_L2', False):
+        faiss.normalize_L2(vectors)
+    # The served (possibly memory-mapped) index is never modified or copied
+    # here: new vectors go to a small delta, merged into the file by save_index.
+    index = vectorstore.index
+    if isinstance(index, AppendedIndex):
+        vectorstore.index = index.with_vectors(vectors)
+    else:
+        vectorstore.index = AppendedIndex(index, vectors)
+
+
+def recover_documents(vectorstore, embeddings):
+    """
+    Add the vectors of documents that reached ``docstore.sqlite`` after the
+    index file was last saved (live ingestion stopped before its
+    checkpoint), re-embedding their texts.
+
+    Returns:
+        int: Documents recovered.
+    """
+    if not isinstance(vectorstore.docstore, SQLiteDocstore):
+        return 0
+    _, texts, _ = vectorstore.docstore.documents_from(vectorstore.index.ntotal)
+    if texts:
+        _add_vectors(vectorstore, np.asarray(embeddings.embed_documents(texts), dtype=np.float32))
+    return len(texts)
+
+
+def save_index(vectorstore, index_dir):
+    """
+    Atomically rewrite ``index.faiss`` with the store's current index,
+    including vectors appended by live ingestion (a plain FAISS store is
+    saved whole with save_local). The file goes to the version the store
+    was opened from (see store_dir), never to one published since.
+    """
+    index_dir = store_dir(vectorstore, index_dir)
+    if not isinstance(vectorstore.docstore, SQLiteDocstore):
+        vectorstore.save_local(index_dir)
+        return
+    path = os.path.join(index_dir, "index.faiss")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    index = vectorstore.index
+    if isinstance(index, AppendedIndex):
+        # The one copy of the base index per checkpoint; the file is then
+        # reopened memory-mapped in place of the appended view.
+        index = index.merged()
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+    if isinstance(vectorstore.index, AppendedIndex):
+        vectorstore.index = set_search_params(prepare_index(read_index(path, settings.INDEX_MMAP)))
+
+
+def adopt_appended(vectorstore, index_dir):
+    """
+    Bring a store loaded from ``index.pkl`` up to date with documents that
+    live ingestion appended to ``index.faiss`` and ``docstore.sqlite``.
+
+    Returns:
+        int: Documents adopted into the in-memory docstore.
+    """
+    docstore_path = os.path.join(index_dir, DOCSTORE_FILE)
+    known = len(vectorstore.index_to_docstore_id)
+    if vectorstore.index.ntotal <= known or not os.path.exists(docstore_path):
+        return 0
+    ids, texts, metadatas = SQLiteDocstore(docstore_path).documents_from(known)
+    ids, texts, metadatas = (values[:vectorstore.index.ntotal - known] for values in (ids, texts, metadatas))
+    vectorstore.docstore.add({doc_id: Document(id=doc_id, page_content=text, metadata=meta)
+                              for doc_id, text, meta in zip(ids, texts, metadatas)})
+    vectorstore.index_to_docstore_id.update({known + i: doc_id for i, doc_id in enumerate(ids)})
+    return len(ids)
+
+
+def open_vectorstore(index_dir, embeddings, mmap=True):
+    """
+    Open a saved vector store for querying without unpickling the docstore.
+
+    Uses ``docstore.sqlite`` plus a memory-mapped ``index.faiss`` when the
+    index directory has them; older directories without the SQLite file fall
+    back to FAISS.load_local.
+
+    Args:
+        index_dir (str): Directory written by create_memory_for_llm.
+        embeddings: LangChain embeddings used for queries.
+        mmap (bool): Memory-map the index vectors.
+
+    Returns:
+        FAISS: Store for similarity search (read-only when opened from SQLite).
+    """
+    index_dir = resolve_index_dir(index_dir)
+    docstore_path = os.path.join(index_dir, DOCSTORE_FILE)
+    if not os.path.exists(docstore_path):
+        vectorstore = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    else:
+        docstore = SQLiteDocstore(docstore_path)
+        index = read_index(os.path.join(index_dir, "index.faiss"), mmap)
+        vectorstore = ReadOnlyFAISS(embeddings, index, docstore, DocstoreIdMap(docstore))
+    set_search_params(prepare_index(vectorstore.index))
+    return vectorstore
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export an existing index.pkl docstore to docstore.sqlite (no re-embedding).")
+    parser.add_argument("index_dir", nargs="?", default="vectorstore/", help="directory with index.faiss/index.pkl")
+    args = parser.parse_args()
+
+    store = FAISS.load_local(resolve_index_dir(args.index_dir), None, allow_dangerous_deserialization=True)
+    target = os.path.join(resolve_index_dir(args.index_dir), DOCSTORE_FILE)
+    write_docstore(store, f"{target}.tmp")
+    os.replace(f"{target}.tmp", target)
+    print(f"✅ Exported {len(store.index_to_docstore_id)} documents to {target}")
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src import settings
+
+KEY_DTYPE = 'S20'  # raw SHA-1 digest of the text
+
+
+def text_keys(texts):
+    """SHA-1 digests of ``texts`` as a fixed-width bytes array."""
+    return np.array([hashlib.sha1(text.encode('utf-8')).digest() for text in texts], dtype=KEY_DTYPE)
+
+
+class VectorCache:
+    """
+    Persistent content-hash -> vector store for one embedding model.
+
+    ``keys.bin`` holds the 20-byte text digests and ``vectors.f32`` the
+    matching float32 rows, both append-only. Vectors are read through a
+    numpy memmap, so opening the cache costs only the key array (20 bytes
+    per entry) regardless of how many vectors it holds. Entries are only
+    valid up to the number of keys, which are written after their vectors,
+    so an interrupted write never exposes a partial vector.
+
+    Args:
+        directory (str): Cache directory for this model.
+        dim (int): Vector dimension (taken from meta.json when the cache exists).
+    """
+
+    def __init__(self, directory, dim=None):
+        self.directory = directory
+        self._keys_path = os.path.join(directory, 'keys.bin')
+        self._vectors_path = os.path.join(directory, 'vectors.f32')
+        self._meta_path = os.path.join(directory, 'meta.json')
+        self._lock = threading.Lock()
+        self.dim = dim
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as fh:
+                self.dim = json.load(fh)['dim']
+        self._load()
+
+    def _load(self):
+        keys = np.fromfile(self._keys_path, dtype=KEY_DTYPE) if os.path.exists(self._keys_path) else np.array([], dtype=KEY_DTYPE)
+        self._order = np.argsort(keys, kind='stable')
+        self._sorted = keys[self._order]
+        self._map_vectors()
+
+    def _map_vectors(self):
+        self._vectors = None
+        if len(self._sorted):
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r', shape=(len(self._sorted), self.dim))
+
+    def _extend(self, keys):
+        # Merge the appended keys into the in-memory sorted index instead of
+        # rereading keys.bin, so a build that adds many chunks stays linear.
+        keys = np.asarray(keys, dtype=KEY_DTYPE)
+        rows = np.arange(len(self._sorted), len(self._sorted) + len(keys))
+        order = np.argsort(keys, kind='stable')
+        at = np.searchsorted(self._sorted, keys[order], side='right')
+        self._sorted = np.insert(self._sorted, at, keys[order])
+        self._order = np.insert(self._order, at, rows[order])
+        self._map_vectors()
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def lookup(self, keys):
+        """
+        Find cached vectors.
+
+        Args:
+            keys (np.ndarray): Digests from text_keys.
+
+        Returns:
+            tuple: (found mask, vectors for the found keys in order).
+        """
+        with self._lock:
+            if len(self._sorted) == 0:
+                return np.zeros(len(keys), dtype=bool), np.empty((0, self.dim or 0), dtype=np.float32)
+            pos = np.searchsorted(self._sorted, keys)
+            pos_clipped = np.minimum(pos, len(self._sorted) - 1)
+            found = (pos < len(self._sorted)) & (self._sorted[pos_clipped] == keys)
+            rows = self._order[pos_clipped[found]]
+            return found, np.asarray(self._vectors[rows])
+
+    def add(self, keys, vectors):
+        """Append new (key, vector) pairs and make them visible to lookups."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(keys) == 0:
+            return
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self._meta_path, 'w') as fh:
+                    json.dump({'dim': self.dim}, fh)
+            valid = len(self._sorted)
+            with open(self._vectors_path, 'ab') as fh:
+                fh.truncate(valid * self.dim * 4)  # drop vectors of an interrupted write
+                fh.write(vectors.tobytes())
+            with open(self._keys_path, 'ab') as fh:
+                fh.write(np.asarray(keys, dtype=KEY_DTYPE).tobytes())
+            self._extend(keys)
+
+
+def _model_slug(model_name):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that dedupes, caches and batches document encoding.
+
+    ``embed_documents`` hashes every text, encodes each distinct uncached
+    text once and stores the result in a VectorCache, so rebuilding the
+    index or trying another index type never re-embeds a text already seen.
+    Misses are encoded in chunks (persisted as they finish); with a
+    sentence-transformers backend and more than one process, large jobs run
+    on a multi-process pool. Queries go straight to the wrapped model.
+
+    Args:
+        base: LangChain embeddings to wrap (e.g. HuggingFaceEmbeddings).
+        model_name (str): Names the cache directory; cached vectors are per model.
+        cache_dir (str): Root cache directory. Defaults to settings.EMBEDDING_CACHE_DIR.
+        batch_size (int): Encoder batch size. Defaults to settings.EMBED_BATCH_SIZE.
+        processes (int): CPU worker processes (0 = one per core). Defaults to settings.EMBED_PROCESSES.
+    """
+
+    def __init__(self, base, model_name, cache_dir=None, batch_size=None, processes=None):
+        self.base = base
+        self.model_name = model_name
+        self.batch_size = batch_size or settings.EMBED_BATCH_SIZE
+        processes = settings.EMBED_PROCESSES if processes is None else processes
+        self.processes = processes or os.cpu_count() or 1
+        self.cache = VectorCache(os.path.join(cache_dir or settings.EMBEDDING_CACHE_DIR, _model_slug(model_name)))
+        self.last_stats = {}
+        self.totals = {'texts': 0, 'unique': 0, 'cache_hits': 0, 'encoded': 0, 'seconds': 0.0}
+
+    def _encode(self, texts):
+        client = getattr(self.base, '_client', None)
+        if self.processes > 1 and len(texts) >= settings.EMBED_POOL_MIN_TEXTS and hasattr(client, 'start_multi_process_pool'):
+            normalize = getattr(self.base, 'encode_kwargs', {}).get('normalize_embeddings', False)
+            pool = client.start_multi_process_pool(target_devices=['cpu'] * self.processes)
+            try:
+                return np.asarray(client.encode_multi_process(
+                    texts, pool, batch_size=self.batch_size, normalize_embeddings=normalize), dtype=np.float32)
+            finally:
+                client.stop_multi_process_pool(pool)
+        return np.asarray(self.base.embed_documents(texts), dtype=np.float32)
+
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        texts = list(texts)
+        keys = text_keys(texts)
+        unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        found, _ = self.cache.lookup(unique_keys)
+        missing = np.flatnonzero(~found)
+
+        chunk = self.batch_size * 64
+        if len(missing) and len(missing) >= settings.EMBED_POOL_MIN_TEXTS and self.processes > 1:
+            chunk = len(missing)  # one pool start-up for the whole job
+        for offset in range(0, len(missing), chunk):
+            part = missing[offset:offset + chunk]
+            self.cache.add(unique_keys[part], self._encode([texts[i] for i in first[part]]))
+
+        _, vectors = self.cache.lookup(unique_keys)
+        seconds = time.perf_counter() - start
+        self.last_stats = {
+            'texts': len(texts),
+            'unique': len(unique_keys),
+            'cache_hits': int(found.sum()),
+            'encoded': len(missing),
+            'seconds': seconds,
+        }
+        for name, value in self.last_stats.items():
+            self.totals[name] += value
+        return vectors[inverse].tolist()
+
+    def embed_query(self, text):
+        return self.base.embed_query(text)
+
+    @staticmethod
+    def describe(stats):
+        """One-line summary: throughput, dedupe and cache hit rate."""
+        texts, unique = stats.get('texts', 0), stats.get('unique', 0)
+        seconds = stats.get('seconds', 0.0)
+        rate = texts / seconds if seconds else float('inf')
+        hit_rate = stats.get('cache_hits', 0) / unique if unique else 0.0
+        return (f"{texts:,} texts ({unique:,} unique) in {seconds:.1f}s = {rate:,.0f} texts/sec; "
+                f"cache hit rate {hit_rate:.1%}, {stats.get('encoded', 0):,} encoded")
+
+
+def get_document_embedder(model_name=None):
+    """
+    Embeddings used to index documents: the sentence-transformers model,
+    wrapped in CachedEmbeddings unless FINLYTICS_EMBEDDING_CACHE=0.
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    model_name = model_name or settings.EMBEDDING_MODEL
+    base = HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={'batch_size': settings.EMBED_BATCH_SIZE})
+    if not settings.EMBEDDING_CACHE:
+        return base
+    return CachedEmbeddings(base, model_name)
@@ -0,0 +1,395 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+INDEXED_COLUMNS = ('sector', 'sentiment', 'emotion')
+# Posting lists kept for lookups by value (see FilterEngine.rows_of) but not
+# part of the sidebar filter key.
+LOOKUP_COLUMNS = ('company',)
+
+
+def _normalize_values(values):
+    if values is None:
+        return None
+    return tuple(sorted(set(values), key=str))
+
+
+def filter_key(start_date, end_date, sectors=None, sentiments=None, emotions=None):
+    """
+    Normalized, hashable form of a sidebar filter selection.
+
+    ``None`` for a dimension means "no constraint"; the order of the selected
+    values does not matter.
+
+    Returns:
+        tuple: (start, end, sectors, sentiments, emotions).
+    """
+    return (
+        pd.Timestamp(start_date),
+        pd.Timestamp(end_date),
+        _normalize_values(sectors),
+        _normalize_values(sentiments),
+        _normalize_values(emotions),
+    )
+
+
+class Selection:
+    """
+    Result of a filter: row positions into the engine's date-sorted frame.
+
+    ``row_ids`` are the original index labels (CSV row numbers); ``frame``
+    materializes the rows lazily and is a zero-copy slice when the selection
+    is a contiguous date range. Gathered (non-contiguous) frames are not kept,
+    so memoized selections stay as small as their position arrays.
+    """
+
+    def __init__(self, engine, positions=None, bounds=None):
+        self._engine = engine
+        self._positions = positions
+        self._bounds = bounds
+        self._frame = None
+
+    def __len__(self):
+        if self._positions is None:
+            return self._bounds[1] - self._bounds[0]
+        return len(self._positions)
+
+    @property
+    def positions(self):
+        if self._positions is None:
+            return np.arange(*self._bounds)
+        return self._positions
+
+    @property
+    def row_ids(self):
+        return self._engine.df.index.values[self.positions]
+
+    @property
+    def frame(self):
+        if self._positions is not None:
+            return self._engine.df.iloc[self._positions]
+        if self._frame is None:
+            self._frame = self._engine.df.iloc[self._bounds[0]:self._bounds[1]]
+        return self._frame
+
+
+class FilterEngine:
+    """
+    Date-sorted, indexed view of the news dataset for the sidebar filters.
+
+    Date ranges are resolved with binary search over the sorted dates, and
+    every value of sector/sentiment/emotion keeps a sorted array of row
+    positions, so a query costs O(log n + matches) instead of a full scan.
+    Results are memoized per filter key in a small LRU.
+
+    Args:
+        df (pd.DataFrame): Dataset with a datetime64 ``date`` column.
+        indexed_columns (tuple): Categorical columns to build posting lists for.
+        cache_size (int): Number of filter results to memoize.
+    """
+
+    def __init__(self, df, indexed_columns=INDEXED_COLUMNS + LOOKUP_COLUMNS, cache_size=128):
+        # A frame that is already date-sorted (e.g. the shared memory-mapped
+        # dataset) is used as is instead of being copied.
+        order = None if df['date'].is_monotonic_increasing else np.argsort(df['date'].values, kind='stable')
+        self.df = df if order is None else df.take(order)
+        self._dates = self.df['date'].values
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        index_dtype = np.int32 if len(df) < np.iinfo(np.int32).max else np.int64
+        self._codes = {}
+        self._values = {}
+        self._postings = {}
+        for col in indexed_columns:
+            if col not in df:
+                continue
+            # Factorize on the original order so values keep first-appearance order.
+            codes, uniques = pd.factorize(df[col])
+            if order is not None:
+                codes = codes[order]
+            elif len(uniques) and pd.api.types.is_integer_dtype(df.index):
+                # Pre-sorted input: first appearance in the source is the smallest row id.
+                present = codes >= 0
+                first = pd.Series(df.index.values[present]).groupby(codes[present]).min()
+                rank = np.argsort(first.reindex(range(len(uniques))).to_numpy(), kind='stable')
+                remap = np.empty(len(rank), dtype=codes.dtype)
+                remap[rank] = np.arange(len(rank))
+                codes = np.where(present, remap[codes], -1)
+                uniques = uniques.take(rank)
+            codes = codes.astype(np.int8 if len(uniques) < np.iinfo(np.int8).max else np.int32)
+            grouped = np.argsort(codes, kind='stable').astype(index_dtype)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            offset = int((codes < 0).sum())
+            bounds = np.concatenate([[0], np.cumsum(counts)]) + offset
+            self._codes[col] = codes
+            self._values[col] = list(uniques)
+            self._postings[col] = {
+                value: grouped[bounds[i]:bounds[i + 1]] for i, value in enumerate(uniques)
+            }
+
+    def __len__(self):
+        return len(self.df)
+
+    def values(self, column):
+        """Distinct values of an indexed column, in first-appearance order."""
+        return list(self._values[column])
+
+    def rows_of(self, column, value, start_date=None, end_date=None):
+        """
+        Rows whose ``column`` equals ``value`` (e.g. one company), optionally
+        within an inclusive date range: a slice of the value's posting list,
+        O(log n + matches).
+
+        Returns:
+            Selection: Matching rows in date order (empty for unknown values).
+        """
+        posting = self._postings.get(column, {}).get(value)
+        if posting is None:
+            return Selection(self, positions=np.empty(0, dtype=np.int64))
+        lo, hi = self._date_bounds(
+            start_date if start_date is not None else self._dates[0],
+            end_date if end_date is not None else self._dates[-1],
+        )
+        a, b = np.searchsorted(posting, [lo, hi])
+        return Selection(self, positions=posting[a:b])
+
+    def date_range(self):
+        """(min, max) date of the dataset."""
+        return self._dates[0], self._dates[-1]
+
+    def select(self, start_date, end_date, sectors=None, sentiments=None, emotions=None):
+        """
+        Filter by an inclusive date range and optional category selections.
+
+        Args:
+            start_date: First date to include.
+            end_date: Last date to include.
+            sectors (list): Sectors to keep, or None for all.
+            sentiments (list): Sentiments to keep, or None for all.
+            emotions (list): Emotions to keep, or None for all.
+
+        Returns:
+            Selection: Memoized row selection.
+        """
+        key = filter_key(start_date, end_date, sectors, sentiments, emotions)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        selection = self._select(key)
+
+        with self._lock:
+            self._cache[key] = selection
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return selection
+
+    def _date_bounds(self, start, end):
+        lo = np.searchsorted(self._dates, np.datetime64(start), side='left')
+        hi = np.searchsorted(self._dates, np.datetime64(end), side='right')
+        return int(lo), int(max(hi, lo))
+
+    def _select(self, key):
+        start, end, *category_filters = key
+        lo, hi = self._date_bounds(start, end)
+        constraints = [
+            (col, values) for col, values in zip(INDEXED_COLUMNS, category_filters)
+            if values is not None and col in self._postings
+        ]
+        if not constraints:
+            return Selection(self, bounds=(lo, hi))
+
+        # Posting slices inside [lo, hi) for each constrained column.
+        slices = {}
+        for col, values in constraints:
+            parts = []
+            for value in values:
+                posting = self._postings[col].get(value)
+                if posting is None:
+                    continue
+                a, b = np.searchsorted(posting, [lo, hi])
+                parts.append(posting[a:b])
+            slices[col] = parts
+
+        # Materialize the most selective column, check the others by code lookup.
+        driver = min(slices, key=lambda col: sum(len(p) for p in slices[col]))
+        parts = slices[driver]
+        if not parts:
+            return Selection(self, positions=np.empty(0, dtype=np.int64))
+        positions = parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+        for col, values in constraints:
+            if col == driver or len(positions) == 0:
+                continue
+            allowed = np.zeros(len(self._values[col]) + 1, dtype=bool)
+            lookup = {value: i for i, value in enumerate(self._values[col])}
+            for value in values:
+                if value in lookup:
+                    allowed[lookup[value] + 1] = True
+            positions = positions[allowed[self._codes[col][positions] + 1]]
+
+        return Selection(self, positions=positions)
+
+
+def _align_categories(df, rows):
+    """
+    Give both frames' categorical columns the same categories (new values
+    appended) so concatenating them keeps the columns categorical.
+    """
+    df, rows = df.copy(deep=False), rows.copy(deep=False)
+    for col in df.columns:
+        if col not in rows or not isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        categories = df[col].cat.categories
+        categorical = isinstance(rows[col].dtype, pd.CategoricalDtype)
+        if categorical and rows[col].cat.categories.equals(categories):
+            continue  # e.g. two layers aligned before: nothing to recode
+        added = pd.Index(rows[col].dropna().unique()).difference(categories)
+        if len(added):
+            categories = categories.append(added)
+            df[col] = df[col].cat.add_categories(added)
+        if categorical:
+            rows[col] = rows[col].cat.set_categories(categories)
+        else:
+            rows[col] = pd.Categorical(rows[col].astype(object), categories=categories)
+    return df, rows
+
+
+def _concat_by_date(frames):
+    """Concatenate date-sorted frames, re-sorting (stably) only when they interleave."""
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    combined = frames[0]
+    for frame in frames[1:]:
+        combined = pd.concat(_align_categories(combined, frame))
+    if not combined['date'].is_monotonic_increasing:
+        combined = combined.take(np.argsort(combined['date'].values, kind='stable'))
+    return combined
+
+
+class MergedSelection:
+    """
+    Selection over a LayeredFilterEngine: one Selection per layer.
+
+    ``row_ids`` and ``frame`` follow the same contract as Selection; the frame
+    of a selection that only matches base rows is the base Selection's own.
+    """
+
+    def __init__(self, parts):
+        self._parts = parts
+
+    def __len__(self):
+        return sum(len(part) for part in self._parts)
+
+    @property
+    def row_ids(self):
+        return np.concatenate([part.row_ids for part in self._parts])
+
+    @property
+    def frame(self):
+        return _concat_by_date([part.frame for part in self._parts])
+
+
+class LayeredFilterEngine:
+    """
+    FilterEngine over a base frame plus the rows appended to it since.
+
+    The base engine (e.g. over the shared memory-mapped dataset) is neither
+    copied nor rebuilt on append. Appended rows go to delta FilterEngines
+    kept log-structured: each append adds an engine over its own rows, and
+    adjacent deltas merge while the newer one is at least as large as the
+    older, so the delta sizes shrink geometrically (O(log rows) layers) and
+    each appended row is re-indexed O(log rows) times. Queries merge the
+    layers. The deltas are folded into the base once they outgrow it.
+
+    Args:
+        df (pd.DataFrame): Base dataset, see FilterEngine.
+        **kwargs: FilterEngine options, used for every layer.
+    """
+
+    def __init__(self, df, **kwargs):
+        self._kwargs = kwargs
+        # (base, deltas) swapped as one tuple, so readers never mix layers of two versions.
+        self._layers = (FilterEngine(df, **kwargs), ())
+
+    @property
+    def base(self):
+        return self._layers[0]
+
+    @property
+    def deltas(self):
+        """Delta engines, oldest (and largest) first."""
+        return list(self._layers[1])
+
+    @property
+    def engines(self):
+        base, deltas = self._layers
+        return [base, *deltas]
+
+    @property
+    def frames(self):
+        """The layers' frames, base first; each is date-sorted."""
+        return [engine.df for engine in self.engines]
+
+    @property
+    def df(self):
+        """All rows in date order (materialized on every call once rows were appended)."""
+        frames = self.frames
+        return frames[0] if len(frames) == 1 else _concat_by_date(frames)
+
+    def __len__(self):
+        return sum(len(engine) for engine in self.engines)
+
+    def values(self, column):
+        """Distinct values of an indexed column, base values first, see FilterEngine.values."""
+        values, known = [], set()
+        for engine in self.engines:
+            values += [value for value in engine.values(column) if value not in known]
+            known.update(values)
+        return values
+
+    def date_range(self):
+        """(min, max) date over every layer."""
+        ranges = [engine.date_range() for engine in self.engines]
+        return min(lo for lo, _ in ranges), max(hi for _, hi in ranges)
+
+    def select(self, *args, **kwargs):
+        """Row selection for a filter, see FilterEngine.select."""
+        engines = self.engines
+        if len(engines) == 1:
+            return engines[0].select(*args, **kwargs)
+        return MergedSelection([engine.select(*args, **kwargs) for engine in engines])
+
+    def rows_of(self, *args, **kwargs):
+        """Rows with a given value, see FilterEngine.rows_of."""
+        engines = self.engines
+        if len(engines) == 1:
+            return engines[0].rows_of(*args, **kwargs)
+        return MergedSelection([engine.rows_of(*args, **kwargs) for engine in engines])
+
+    def append(self, rows):
+        """
+        Add new rows as a delta layer, merging deltas as described above and
+        folding them into the base once they hold more rows than it. Not safe
+        against concurrent appends (the DashboardStore serializes them);
+        queries may run concurrently.
+
+        Args:
+            rows (pd.DataFrame): New rows with the dataset columns.
+        """
+        base, deltas = self._layers
+        # An empty slice carries the base dtypes without copying the base.
+        _, rows = _align_categories(base.df.iloc[:0], rows)
+        deltas = list(deltas)
+        while deltas and len(deltas[-1]) <= len(rows):
+            rows = pd.concat(_align_categories(deltas.pop().df, rows))
+        if len(rows) + sum(len(delta) for delta in deltas) > len(base):
+            frames = [base.df, *(delta.df for delta in deltas), rows]
+            self._layers = (FilterEngine(_concat_by_date(frames), **self._kwargs), ())
+        else:
+            self._layers = (base, (*deltas, FilterEngine(rows, **self._kwargs)))
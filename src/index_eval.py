@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+
+from src import settings
+from src.ann_index import build_index, index_size_bytes, resolve_factory, set_search_params
+from src.data_store import load_dataset
+
+DEFAULT_SPECS = ["Flat", "SQ8", "HNSW32", "HNSW32,SQ8", "IVF{nlist},Flat", "IVF{nlist},SQ8", "IVF{nlist},PQ48"]
+
+
+def _embed(texts, embedder):
+    if embedder == 'hash':
+        from src.benchmark import HashingEmbeddings
+        embeddings = HashingEmbeddings()
+    else:
+        from src.embedding_cache import get_document_embedder
+        embeddings = get_document_embedder()
+    return np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+
+
+def load_vectors(csv_path=None, rows=None, queries=200, embedder='model', seed=0):
+    """
+    Document vectors for the first ``rows`` dataset rows, plus query vectors
+    embedded from the headlines of randomly chosen rows.
+
+    Returns:
+        tuple: (documents matrix, queries matrix), both float32.
+    """
+    from src.create_memory_for_llm import rows_to_texts
+
+    df = load_dataset(csv_path)
+    if rows:
+        df = df.head(rows)
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(df), size=min(queries, len(df)), replace=False)
+    print(f"🔗 Embedding {len(df):,} documents and {len(picked)} queries")
+    documents = _embed(rows_to_texts(df), embedder)
+    questions = _embed(df['headline'].astype(str).iloc[picked].tolist(), embedder)
+    return documents, questions
+
+
+def _param_grid(index, nprobes, ef_searches):
+    if faiss.try_extract_index_ivf(index) is not None:
+        return [{'nprobe': value} for value in nprobes]
+    if isinstance(faiss.downcast_index(index), faiss.IndexHNSW):
+        return [{'ef_search': value} for value in ef_searches]
+    return [{}]
+
+
+def evaluate(documents, queries, specs=None, k=10, nprobes=(4, 16, 64), ef_searches=(32, 64, 128)):
+    """
+    Recall@k, query latency and on-disk size for each index spec.
+
+    Recall is measured against exact float32 search over the same vectors.
+    Latency is per query, searched one at a time as the chatbot does.
+
+    Args:
+        documents (np.ndarray): Indexed vectors.
+        queries (np.ndarray): Query vectors.
+        specs (list[str]): faiss factory strings; ``{nlist}`` is replaced by
+            roughly 4 * sqrt(number of documents).
+        k (int): Neighbours per query.
+        nprobes (tuple): IVF nprobe values to try.
+        ef_searches (tuple): HNSW efSearch values to try.
+
+    Returns:
+        list[dict]: One row per (spec, search parameter) combination.
+    """
+    specs = specs or DEFAULT_SPECS
+    nlist = max(1, 2 ** round(np.log2(4 * np.sqrt(len(documents)))))
+    exact = faiss.IndexFlatL2(documents.shape[1])
+    exact.add(documents)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    for spec in specs:
+        spec = resolve_factory(spec.format(nlist=nlist), len(documents))
+        start = time.perf_counter()
+        try:
+            index = build_index(documents, spec)
+        except (ValueError, RuntimeError) as e:
+            print(f"⚠️ {spec}: {e}")
+            continue
+        build_seconds = time.perf_counter() - start
+        size = index_size_bytes(index)
+        for params in _param_grid(index, nprobes, ef_searches):
+            set_search_params(index, **params)
+            latencies = []
+            hits = 0
+            for i in range(len(queries)):
+                start = time.perf_counter()
+                _, found = index.search(queries[i:i + 1], k)
+                latencies.append(time.perf_counter() - start)
+                hits += len(np.intersect1d(found[0], truth[i]))
+            row = {
+                'index': spec,
+                'params': params,
+                'recall': hits / (k * len(queries)),
+                'p50_ms': float(np.percentile(latencies, 50)) * 1000,
+                'p95_ms': float(np.percentile(latencies, 95)) * 1000,
+                'size_mb': size / 2 ** 20,
+                'build_seconds': build_seconds,
+            }
+            results.append(row)
+            print(f"{spec:<18} {json.dumps(params):<20} recall@{k}={row['recall']:.3f} "
+                  f"p50={row['p50_ms']:.3f}ms p95={row['p95_ms']:.3f}ms size={row['size_mb']:.1f}MB "
+                  f"build={build_seconds:.1f}s")
+    return results
+
+
+def recommend(results, min_recall=0.9):
+    """
+    Fastest and smallest configurations that reach ``min_recall``.
+
+    Returns:
+        dict: ``fastest`` and ``smallest`` result rows (None when nothing qualifies).
+    """
+    good = [row for row in results if row['recall'] >= min_recall]
+    if not good:
+        return {'fastest': None, 'smallest': None}
+    return {
+        'fastest': min(good, key=lambda row: (row['p50_ms'], row['size_mb'])),
+        'smallest': min(good, key=lambda row: (row['size_mb'], row['p50_ms'])),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare FAISS index types: recall@k vs exact search, latency and size.")
+    parser.add_argument("--csv", default=settings.DATA_PATH, help="dataset CSV to embed")
+    parser.add_argument("--rows", type=int, help="only index the first N rows")
+    parser.add_argument("--specs", nargs="+", default=DEFAULT_SPECS, help="faiss index_factory strings ({nlist} allowed)")
+    parser.add_argument("--k", type=int, default=10, help="neighbours per query")
+    parser.add_argument("--queries", type=int, default=200, help="number of query vectors")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64], help="IVF nprobe values")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[32, 64, 128], help="HNSW efSearch values")
+    parser.add_argument("--min-recall", type=float, default=0.9, help="recall target for the recommendation")
+    parser.add_argument("--embedder", choices=["hash", "model"], default="model",
+                        help="configured sentence-transformers model or hashing embeddings (fast, for smoke tests)")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    documents, queries = load_vectors(args.csv, args.rows, args.queries, args.embedder)
+    results = evaluate(documents, queries, args.specs, args.k, args.nprobe, args.ef_search)
+    picks = recommend(results, args.min_recall)
+    for label, row in picks.items():
+        if row is None:
+            print(f"❌ No configuration reaches recall {args.min_recall}")
+            break
+        print(f"✅ {label}: {row['index']} {json.dumps(row['params'])} "
+              f"(recall {row['recall']:.3f}, p50 {row['p50_ms']:.3f} ms, {row['size_mb']:.1f} MB)")
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'w') as fh:
+            json.dump({'rows': len(documents), 'k': args.k, 'results': results}, fh, indent=2)
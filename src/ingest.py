@@ -0,0 +1,725 @@
+"""
+Live ingestion of news rows into a running deployment.
+
+    FINLYTICS_INGEST=1 streamlit run app.py     # worker inside the dashboard process
+    python -m src.query_service --ingest         # ... or inside the query service
+    python -m src.ingest                         # standalone worker
+    python -m src.ingest --feed 1000             # drop 1,000 synthetic rows into the inbox
+
+Rows come from files dropped into settings.INGEST_INBOX (``.jsonl``, ``.json``
+or ``.csv``; write them under a name starting with ``.`` or ending in ``.tmp``
+and rename them when complete), which are moved to ``processed/`` once
+committed, and from new complete lines of the append-only JSON-lines file
+settings.INGEST_TAIL_PATH. Each batch commit:
+
+1. cleans the rows with data_processing.clean_incoming and drops rows already
+   in the dataset (a RowHashSet seeded with every existing row);
+2. gives them row ids after the current maximum and writes them as one Arrow
+   segment next to the columnar cache (data_store.write_ingest_segment), the
+   commit point; the tail offset is recorded in the segment;
+3. appends them to the DashboardStore (aggregate cube updated incrementally,
+   appended rows indexed in the filter engine's delta layers,
+   version bumped), so sessions see them on their next rerun; dashboards in
+   other processes pick the segment up on their next rerun (catch_up);
+4. embeds only the new rows and appends them to the vector store and the BM25
+   index. docstore.sqlite is updated on every commit; index.faiss and
+   lexical.npz are rewritten every settings.INGEST_CHECKPOINT_SECONDS.
+
+Only one worker runs per dataset (an flock on the segment directory). Run it
+in the process that serves questions for new rows to be searchable right
+away; other processes see new vectors after a restart.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from src import resources, settings
+from src.data_processing import INCOMING_COLUMNS, RowHashSet, clean_incoming
+from src.data_store import (ingest_dir, ingest_segments, load_dataset, open_shared_dataset, read_ingest_segments,
+                            segment_metadata, source_signature, write_ingest_segment)
+from src.instrumentation import record, span
+
+logger = logging.getLogger(__name__)
+
+INBOX_SUFFIXES = ('.jsonl', '.json', '.csv')
+LOCK_FILE = ".lock"
+
+_catch_up_lock = threading.Lock()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def catch_up(store, csv_path=None, cache_dir=None, signature=None):
+    """
+    Append ingest segments committed since ``store`` was last updated.
+
+    Costs one directory listing when there is nothing new, so it can run on
+    every rerun or request. ``signature`` selects the dataset version whose
+    segments are read (see data_store.ingest_dir); defaults to the current one.
+
+    Returns:
+        int: Rows appended.
+    """
+    with _catch_up_lock:
+        rows, last = read_ingest_segments(csv_path, cache_dir, after=store.segment, signature=signature)
+        if rows is None:
+            return 0
+        store.append(rows)
+        store.segment = last
+        return len(rows)
+
+
+def parse_records(text):
+    """
+    Row dicts from JSON-lines text or a JSON array of rows.
+
+    Returns:
+        tuple: (list of row dicts, number of lines that are not JSON objects).
+    """
+    stripped = text.lstrip()
+    if stripped.startswith('['):
+        rows = json.loads(stripped)
+        return [row for row in rows if isinstance(row, dict)], 0
+    records, bad = [], 0
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            bad += 1
+            continue
+        if isinstance(row, dict):
+            records.append(row)
+        else:
+            bad += 1
+    return records, bad
+
+
+def read_inbox_file(path):
+    """
+    Rows of an inbox file.
+
+    Returns:
+        tuple: (raw DataFrame, number of unparseable lines).
+    """
+    if path.endswith('.csv'):
+        return pd.read_csv(path, dtype=str, keep_default_na=False), 0
+    with open(path, encoding='utf-8') as fh:
+        records, bad = parse_records(fh.read())
+    return pd.DataFrame.from_records(records), bad
+
+
+def _acquire_lock(directory):
+    import fcntl
+
+    os.makedirs(directory, exist_ok=True)
+    handle = open(os.path.join(directory, LOCK_FILE), 'w')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        return None
+    return handle
+
+
+class IngestWorker:
+    """
+    Background worker that batches new rows from the inbox and the tail file
+    into committed segments, the dashboard store and the vector store.
+
+    Args:
+        store (DashboardStore): Store to keep current (None for a standalone worker).
+        csv_path (str): Dataset CSV. Defaults to settings.DATA_PATH.
+        cache_dir (str): Columnar cache directory. Defaults to settings.CACHE_DIR.
+        inbox (str): Inbox directory ('' to disable). Defaults to settings.INGEST_INBOX.
+        tail_path (str): JSON-lines file to tail ('' to disable). Defaults to settings.INGEST_TAIL_PATH.
+        batch_rows (int): Commit once this many rows are pending. Defaults to settings.INGEST_BATCH_ROWS.
+        batch_seconds (float): Commit rows at most this long after reading them.
+            Defaults to settings.INGEST_BATCH_SECONDS.
+        poll_seconds (float): Pause between polls. Defaults to settings.INGEST_POLL_SECONDS.
+        index_vectors (bool): Embed new rows into the vector store. Defaults to settings.INGEST_INDEX_VECTORS.
+    """
+
+    def __init__(self, store=None, csv_path=None, cache_dir=None, inbox=None, tail_path=None, batch_rows=None,
+                 batch_seconds=None, poll_seconds=None, index_vectors=None):
+        self.store = store
+        self.csv_path = csv_path or settings.DATA_PATH
+        self.cache_dir = cache_dir or settings.CACHE_DIR
+        self.inbox = settings.INGEST_INBOX if inbox is None else inbox
+        self.tail_path = settings.INGEST_TAIL_PATH if tail_path is None else tail_path
+        self.batch_rows = batch_rows or settings.INGEST_BATCH_ROWS
+        self.batch_seconds = settings.INGEST_BATCH_SECONDS if batch_seconds is None else batch_seconds
+        self.poll_seconds = settings.INGEST_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.index_vectors = settings.INGEST_INDEX_VECTORS if index_vectors is None else index_vectors
+
+        self._signature = None
+        self._lock_handle = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        # Pending chunks: (raw rows, arrival time, read time, source), source being
+        # ('file', path) or ('tail', offset after the chunk).
+        self._pending = []
+        self._pending_files = set()
+        self._seen = RowHashSet()
+        self._date_dtype = None
+        self._next_row_id = 0
+        self._segment = 0
+        self._tail_offset = 0
+        self._vectorstore = None
+        self._index_dir = None
+        self._embedder = None
+        self._index_dirty = False
+        self._last_checkpoint = time.monotonic()
+        self._lags = deque(maxlen=1000)
+        self._started = None
+        self.totals = {'batches': 0, 'rows': 0, 'rejected': 0, 'duplicates': 0, 'files': 0, 'indexed': 0,
+                       'recovered': 0, 'errors': 0, 'last_error': None, 'commit_seconds': 0.0, 'last_commit': None,
+                       'last_batch': None}
+
+    # --- lifecycle ---
+
+    def _acquire(self):
+        if self._lock_handle is None:
+            # Segments go to the directory of the CSV version seen here, even if the CSV is replaced later.
+            self._signature = source_signature(self.csv_path)
+            self._lock_handle = _acquire_lock(ingest_dir(self.csv_path, self.cache_dir, self._signature))
+        return self._lock_handle is not None
+
+    def open(self):
+        """
+        Take the dataset's ingest lock and load the committed state.
+
+        Returns:
+            bool: False when another worker already ingests into this dataset.
+        """
+        if not self._acquire():
+            return False
+        if self._started is None:
+            self._load_state()
+        return True
+
+    def _load_state(self):
+        with span("ingest.open") as open_span:
+            if self.store is not None:
+                catch_up(self.store, self.csv_path, self.cache_dir, self._signature)
+                frames = self.store.engine.frames
+            else:
+                base = (open_shared_dataset(self.csv_path, self.cache_dir) if settings.SHARED_DATASET
+                        else load_dataset(self.csv_path, self.cache_dir))
+                ingested, _ = read_ingest_segments(self.csv_path, self.cache_dir, signature=self._signature)
+                frames = [base] if ingested is None else [base, ingested]
+            # Seeded frame by frame, so the (possibly memory-mapped) base is not copied.
+            for frame in frames:
+                self._seen.first_seen(frame[INCOMING_COLUMNS])
+            self._date_dtype = frames[0]['date'].dtype
+            self._next_row_id = max((int(frame.index.max()) + 1 for frame in frames if len(frame)), default=0)
+            open_span.set(rows=sum(len(frame) for frame in frames))
+
+            segments = ingest_segments(self.csv_path, self.cache_dir, self._signature)
+            if segments:
+                self._segment = segments[-1][0]
+                meta = segment_metadata(segments[-1][1])
+                if self.tail_path and meta.get('tail_path') == os.path.abspath(self.tail_path):
+                    self._tail_offset = meta.get('tail_offset', 0)
+            if self.index_vectors:
+                self._open_vectorstore()
+        self._started = time.time()
+
+    def _open_vectorstore(self):
+        from src.docstore import recover_documents, resolve_index_dir, store_dir
+        from src.embedding_cache import CachedEmbeddings
+
+        if not os.path.exists(os.path.join(resolve_index_dir(settings.VECTORSTORE_PATH), "index.faiss")):
+            logger.warning("No vector store at %s, ingesting rows without embeddings", settings.VECTORSTORE_PATH)
+            self.index_vectors = False
+            return
+        base = resources.get_embeddings()
+        self._embedder = CachedEmbeddings(base, settings.EMBEDDING_MODEL) if settings.EMBEDDING_CACHE else base
+        self._vectorstore = resources.get_vectorstore()
+        self._index_dir = store_dir(self._vectorstore, settings.VECTORSTORE_PATH)
+        recovered = recover_documents(self._vectorstore, self._embedder)
+        if recovered:
+            logger.info("Recovered %d ingested documents missing from index.faiss", recovered)
+            self.totals['recovered'] = recovered
+            self._index_dirty = True
+
+    def start(self):
+        """
+        Take the ingest lock and run the worker in a daemon thread, which
+        loads the committed state before its first poll.
+
+        Returns:
+            bool: False when another worker already ingests into this dataset.
+        """
+        if self._thread is not None:
+            return True
+        if not self._acquire():
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="finlytics-ingest", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        try:
+            self.open()
+            while not self._stop.is_set():
+                try:
+                    self.run_once()
+                except Exception:
+                    logger.exception("Ingest batch failed")
+                self._stop.wait(self.poll_seconds)
+        except Exception:
+            logger.exception("Cannot start ingestion")
+        finally:
+            # The final flush runs here, so it never overlaps a batch of this thread.
+            try:
+                self._close()
+            except Exception:
+                logger.exception("Final ingest flush failed")
+
+    def _close(self):
+        if self._lock_handle is None:
+            return
+        try:
+            if self._started is not None:
+                self.run_once(flush=True)
+                self.checkpoint()
+        finally:
+            self._lock_handle.close()
+            self._lock_handle = None
+
+    def stop(self, timeout=30):
+        """
+        Stop the worker: commit what is pending, checkpoint the index and
+        release the lock. With a thread running, the thread does this itself
+        once its current batch is done.
+
+        Returns:
+            bool: False when the thread is still busy after ``timeout``; it
+            flushes and releases the lock when it finishes.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning("Ingest worker still busy after %ss, it flushes when its batch is done", timeout)
+                return False
+            self._thread = None
+            return True
+        self._close()
+        return True
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # --- polling ---
+
+    def _pending_rows(self):
+        return _pending_count(self._pending)
+
+    def poll(self):
+        """Read new inbox files and tail lines into the pending batch (up to batch_rows rows)."""
+        now = time.time()
+        if self.inbox and os.path.isdir(self.inbox):
+            entries = [entry for entry in os.scandir(self.inbox)
+                       if entry.is_file() and entry.name.endswith(INBOX_SUFFIXES) and not entry.name.startswith('.')
+                       and entry.path not in self._pending_files]
+            for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+                if self._pending_rows() >= self.batch_rows:
+                    break
+                try:
+                    with span("ingest.read", source='inbox') as read_span:
+                        rows, bad = read_inbox_file(entry.path)
+                        read_span.set(rows=len(rows))
+                except (OSError, ValueError) as e:
+                    logger.warning("Cannot read %s: %s", entry.path, e)
+                    self._move(entry.path, 'rejected')
+                    continue
+                self.totals['rejected'] += bad
+                self._pending.append((rows, entry.stat().st_mtime, now, ('file', entry.path)))
+                self._pending_files.add(entry.path)
+        if self.tail_path and os.path.exists(self.tail_path):
+            self._poll_tail(now)
+
+    def _poll_tail(self, now):
+        offset = self._pending[-1][3][1] if self._pending and self._pending[-1][3][0] == 'tail' else self._tail_offset
+        if os.path.getsize(self.tail_path) < offset:
+            logger.warning("%s was truncated, reading it from the start", self.tail_path)
+            offset = 0
+        budget = self.batch_rows - self._pending_rows()
+        if budget <= 0:
+            return
+        lines = []
+        with open(self.tail_path, 'rb') as fh:
+            fh.seek(offset)
+            for line in fh:
+                if not line.endswith(b'\n'):
+                    break  # partially written line, read it next time
+                offset += len(line)
+                lines.append(line.decode('utf-8', errors='replace'))
+                if len(lines) >= budget:
+                    break
+        if not lines:
+            return
+        with span("ingest.read", source='tail', rows=len(lines)):
+            records, bad = parse_records("".join(lines))
+        self.totals['rejected'] += bad
+        self._pending.append((pd.DataFrame.from_records(records), now, now, ('tail', offset)))
+
+    # --- commits ---
+
+    def run_once(self, flush=False):
+        """
+        Poll once and commit the pending rows when the batch is full, old
+        enough or ``flush`` is set; checkpoint the vector index when due.
+
+        Returns:
+            int: Rows committed.
+        """
+        self.poll()
+        committed = 0
+        if self._pending and (flush or self._pending_rows() >= self.batch_rows
+                              or time.time() - self._pending[0][2] >= self.batch_seconds):
+            committed = self.commit()
+        if self._index_dirty and (flush or time.monotonic() - self._last_checkpoint >= settings.INGEST_CHECKPOINT_SECONDS):
+            self.checkpoint()
+        return committed
+
+    def commit(self):
+        """
+        Commit the pending rows as one batch (see the module docstring).
+
+        An input whose rows cannot be cleaned is rejected on its own (files
+        move to ``rejected/``); when the batch fails before its segment is
+        written, it stays pending and is retried on the next poll.
+
+        Returns:
+            int: Rows committed (after cleaning and deduplication).
+        """
+        pending, self._pending = self._pending, []
+        start = time.perf_counter()
+        with span("ingest.commit", rows=_pending_count(pending)) as commit_span:
+            try:
+                with span("ingest.clean", rows=_pending_count(pending)):
+                    try:
+                        raw = _concat_chunks(pending)
+                        rows = self._clean(raw)
+                    except Exception as e:
+                        logger.warning("Cannot clean the ingest batch (%s), checking its inputs one by one", e)
+                        pending = self._reject_unclean(pending)
+                        raw = _concat_chunks(pending)
+                        rows = self._clean(raw)
+                    fresh = rows[self._seen.first_seen(rows[INCOMING_COLUMNS], remember=False)]
+                fresh.index = pd.RangeIndex(self._next_row_id, self._next_row_id + len(fresh))
+                tail_offsets = [source[1] for _, _, _, source in pending if source[0] == 'tail']
+                files = [source[1] for _, _, _, source in pending if source[0] == 'file']
+                tail_offset = tail_offsets[-1] if tail_offsets else self._tail_offset
+                if len(fresh):
+                    number = self._segment + 1
+                    with span("ingest.segment", rows=len(fresh)):
+                        write_ingest_segment(fresh, number, {
+                            'tail_path': os.path.abspath(self.tail_path) if self.tail_path else None,
+                            'tail_offset': tail_offset,
+                            'files': [os.path.basename(path) for path in files],
+                            'committed_at': time.time(),
+                        }, self.csv_path, self.cache_dir, self._signature)
+            except Exception as e:
+                # Nothing was committed: keep the batch (and its files) for the next attempt.
+                self._pending = pending + self._pending
+                with self._stats_lock:
+                    self.totals['errors'] += 1
+                    self.totals['last_error'] = f"{type(e).__name__}: {e}"
+                raise
+            # The segment is the commit point.
+            self._seen.first_seen(fresh[INCOMING_COLUMNS])
+            if len(fresh):
+                self._segment = number
+                self._next_row_id += len(fresh)
+            self._tail_offset = tail_offset
+            for path in files:
+                self._move(path, 'processed')
+                self._pending_files.discard(path)
+            if len(fresh):
+                if self.store is not None:
+                    with span("ingest.store", rows=len(fresh)):
+                        catch_up(self.store, self.csv_path, self.cache_dir, self._signature)
+                if self.index_vectors and not self._follow_rebuild():
+                    self._index_rows(fresh)
+            commit_span.set(rows=len(fresh))
+
+        done = time.time()
+        seconds = time.perf_counter() - start
+        lags = [done - arrival for chunk, arrival, _, _ in pending if len(chunk)]
+        with self._stats_lock:
+            self._lags.extend(lags)
+            self.totals['batches'] += 1
+            self.totals['rows'] += len(fresh)
+            self.totals['rejected'] += len(raw) - len(rows)
+            self.totals['duplicates'] += len(rows) - len(fresh)
+            self.totals['files'] += len(files)
+            self.totals['commit_seconds'] += seconds
+            self.totals['last_commit'] = done
+            self.totals['last_batch'] = {'rows': len(fresh), 'read': len(raw), 'seconds': seconds,
+                                         'lag_seconds': max(lags) if lags else None}
+        if lags:
+            record("ingest.lag", max(lags), rows=len(fresh))
+        return len(fresh)
+
+    def _clean(self, raw):
+        rows = clean_incoming(raw)
+        rows['date'] = rows['date'].astype(self._date_dtype)
+        return rows
+
+    def _reject_unclean(self, pending):
+        """The pending chunks that clean on their own; the others are rejected."""
+        kept = []
+        for chunk, arrival, read, source in pending:
+            try:
+                if len(chunk):
+                    self._clean(chunk)
+            except Exception as e:
+                where = source[1] if source[0] == 'file' else self.tail_path
+                logger.warning("Rejecting %d rows from %s: %s", len(chunk), where, e)
+                with self._stats_lock:
+                    self.totals['rejected'] += len(chunk)
+                if source[0] == 'file':
+                    self._move(source[1], 'rejected')
+                    self._pending_files.discard(source[1])
+                    continue
+                chunk = chunk.iloc[0:0]  # keep the tail offset, drop the lines
+            kept.append((chunk, arrival, read, source))
+        return kept
+
+    def _index_rows(self, rows):
+        from src.create_memory_for_llm import content_ids, rows_to_metadata, rows_to_texts
+        from src.docstore import append_documents
+
+        texts = rows_to_texts(rows)
+        ids = content_ids(texts)
+        with span("ingest.embed", rows=len(texts)):
+            vectors = self._embedder.embed_documents(texts)
+        lexical = resources.get_lexical_index()
+        before = self._vectorstore.index.ntotal
+        with span("ingest.index", rows=len(texts)):
+            added = append_documents(self._vectorstore, ids, texts, vectors, rows_to_metadata(rows))
+            if lexical is not None and len(lexical) == before and added:
+                # Positions must line up with the vector index: extend with exactly the added documents.
+                lexical_text = dict(zip(ids, (rows['headline'].astype(str) + " " + rows['summary'].astype(str)).tolist()))
+                resources.replace('lexical_index', lexical.extend(
+                    [lexical_text[doc_id] for doc_id in added], added,
+                    [str(sector) for sector in rows['sector'].unique()]))
+        with self._stats_lock:
+            self.totals['indexed'] += len(added)
+        self._index_dirty = self._index_dirty or bool(added)
+
+    def _follow_rebuild(self):
+        """
+        Switch to a vector store version that create_memory_for_llm published
+        since the store was opened, then index the rows of the segments that
+        version does not include (its manifest records the last one it read).
+
+        Returns:
+            bool: True when the store was switched.
+        """
+        from src.create_memory_for_llm import load_manifest
+        from src.docstore import resolve_index_dir, store_dir
+
+        current = resolve_index_dir(settings.VECTORSTORE_PATH)
+        if self._vectorstore is None or current == self._index_dir:
+            return False
+        logger.info("Vector store rebuilt (%s), switching to it", current)
+        resources.reset('vectorstore', 'lexical_index')
+        self._vectorstore = resources.get_vectorstore()
+        self._index_dir = store_dir(self._vectorstore, settings.VECTORSTORE_PATH)
+        self._index_dirty = False
+        after = (load_manifest(self._index_dir) or {}).get('ingest_segment', 0)
+        missing, _ = read_ingest_segments(self.csv_path, self.cache_dir, after=after, signature=self._signature)
+        if missing is not None:
+            self._index_rows(missing)
+        return True
+
+    def checkpoint(self):
+        """Rewrite index.faiss (and lexical.npz when it covers every vector) with the ingested documents."""
+        if self._vectorstore is None:
+            return
+        self._follow_rebuild()
+        if not self._index_dirty:
+            return
+        from src.docstore import save_index
+        from src.lexical_index import LEXICAL_FILE
+
+        with span("ingest.checkpoint", rows=self._vectorstore.index.ntotal):
+            # Into the version the store was opened from, even if a rebuild was published meanwhile.
+            save_index(self._vectorstore, self._index_dir)
+            lexical = resources.get_lexical_index()
+            if lexical is not None and lexical.matches(self._vectorstore):
+                path = os.path.join(self._index_dir, LEXICAL_FILE)
+                lexical.save(f"{path}.tmp")
+                os.replace(f"{path}.tmp", path)
+        self._index_dirty = False
+        self._last_checkpoint = time.monotonic()
+
+    def _move(self, path, folder):
+        target_dir = os.path.join(os.path.dirname(path), folder)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, f"{self._segment:06d}-{os.path.basename(path)}")
+        try:
+            os.replace(path, target)
+        except OSError as e:
+            logger.warning("Cannot move %s to %s: %s", path, target_dir, e)
+
+    # --- reporting ---
+
+    def stats(self):
+        """
+        Ingest totals plus lag and throughput.
+
+        ``lag_seconds`` measures arrival (inbox file modification time, or
+        when a tail line was read) to commit, after which the rows are in
+        the store; percentiles are over the last 1,000 chunks (files or tail
+        reads). ``rows_per_second`` is committed rows over time spent
+        committing, ``rows_per_minute`` over the time the worker has run.
+        """
+        with self._stats_lock:
+            totals = dict(self.totals)
+            lags = np.array(self._lags, dtype=float)
+        elapsed = time.time() - self._started if self._started else 0.0
+        return {
+            **totals,
+            'running': self.running,
+            'segment': self._segment,
+            'pending_rows': self._pending_rows(),
+            'lag_seconds': {
+                'last': float(lags[-1]) if len(lags) else None,
+                'p50': float(np.percentile(lags, 50)) if len(lags) else None,
+                'p95': float(np.percentile(lags, 95)) if len(lags) else None,
+                'max': float(lags.max()) if len(lags) else None,
+            },
+            'rows_per_second': totals['rows'] / totals['commit_seconds'] if totals['commit_seconds'] else None,
+            'rows_per_minute': totals['rows'] / elapsed * 60 if elapsed else None,
+        }
+
+
+def start_ingest_worker(store):
+    """
+    The process-wide worker for ``store``, started on first call; a worker
+    for a previous store of this process is stopped first.
+
+    Returns:
+        IngestWorker or None: None when a worker in another process holds the dataset.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is not None and _worker.store is store:
+            return _worker if _worker.running else None
+        if _worker is not None:
+            _worker.stop()
+        _worker = IngestWorker(store)
+        if not _worker.start():
+            logger.info("Another process is ingesting into %s", ingest_dir())
+        return _worker if _worker.running else None
+
+
+def get_ingest_worker():
+    """The worker started by start_ingest_worker in this process, if running."""
+    return _worker if _worker is not None and _worker.running else None
+
+
+def feed(rows, inbox=None, tail_path=None, seed=None):
+    """
+    Write ``rows`` synthetic news rows from the last week into the inbox
+    (as one JSON-lines file, renamed into place) or append them to the tail
+    file, for trying out or load-testing ingestion.
+
+    Returns:
+        str: The file written or appended to.
+    """
+    from src.data_generation import generate_chunk
+
+    start_date = np.datetime64(pd.Timestamp.now().normalize() - pd.Timedelta(days=6), 'D')
+    frame = generate_chunk(np.random.default_rng(seed), rows, start_date, 6)
+    text = frame.to_json(orient='records', lines=True, date_format='iso')
+    text = text if text.endswith('\n') else text + '\n'
+    if tail_path:
+        with open(tail_path, 'a', encoding='utf-8') as fh:
+            fh.write(text)
+        return tail_path
+    inbox = inbox or settings.INGEST_INBOX
+    os.makedirs(inbox, exist_ok=True)
+    path = os.path.join(inbox, f"feed-{time.time_ns()}.jsonl")
+    tmp_path = os.path.join(inbox, f".{os.path.basename(path)}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as fh:
+        fh.write(text)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _pending_count(pending):
+    return sum(len(chunk) for chunk, _, _, _ in pending)
+
+
+def _concat_chunks(pending):
+    frames = [chunk for chunk, _, _, _ in pending if len(chunk)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=INCOMING_COLUMNS)
+
+
+def _describe(stats):
+    lag = stats['lag_seconds']
+    rate = stats['rows_per_second']
+    return (f"{stats['rows']:,} rows in {stats['batches']} batches ({stats['duplicates']:,} duplicates, "
+            f"{stats['rejected']:,} rejected)"
+            + (f" | {stats['errors']} failed commits, last: {stats['last_error']}" if stats['errors'] else "")
+            + (f" | lag p50={lag['p50']:.2f}s p95={lag['p95']:.2f}s" if lag['p50'] is not None else "")
+            + (f" | {rate:,.0f} rows/s" if rate else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest new news rows from the inbox directory and/or a JSON-lines file.")
+    parser.add_argument("--inbox", default=settings.INGEST_INBOX, help="inbox directory ('' to disable)")
+    parser.add_argument("--tail", default=settings.INGEST_TAIL_PATH, help="append-only JSON-lines file to follow")
+    parser.add_argument("--once", action="store_true", help="ingest what is there now, then exit")
+    parser.add_argument("--no-vectors", action="store_true", help="do not embed new rows")
+    parser.add_argument("--feed", type=int, metavar="ROWS", help="write ROWS synthetic rows instead of ingesting")
+    parser.add_argument("--every", type=float, metavar="SECONDS", help="with --feed: repeat every SECONDS")
+    args = parser.parse_args()
+
+    if args.feed:
+        while True:
+            print(f"📝 {args.feed:,} rows -> {feed(args.feed, args.inbox, args.tail or None)}")
+            if not args.every:
+                break
+            time.sleep(args.every)
+        raise SystemExit(0)
+
+    worker = IngestWorker(inbox=args.inbox, tail_path=args.tail, index_vectors=False if args.no_vectors else None)
+    if not worker.open():
+        raise SystemExit(f"❌ Another process is ingesting into {ingest_dir()}")
+    print(f"📥 Watching {', '.join(filter(None, [args.inbox, args.tail]))} (next row id {worker._next_row_id:,})")
+    try:
+        while True:
+            batches = worker.totals['batches']
+            worker.run_once(flush=args.once)
+            if worker.totals['batches'] > batches:
+                batch = worker.totals['last_batch']
+                print(f"✅ Segment {worker._segment}: +{batch['rows']:,} of {batch['read']:,} rows "
+                      f"in {batch['seconds'] * 1000:.0f} ms | total {_describe(worker.stats())}")
+            elif args.once:
+                break
+            if not args.once:
+                time.sleep(worker.poll_seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+    print(f"📊 {_describe(worker.stats())}")
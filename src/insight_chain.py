@@ -1,8 +1,20 @@
-from src.custom_mistral_llm import ask_question
+from src.custom_mistral_llm import ask_question, stream_question
 
-def generate_insight(user_question, filtered_df, chat_history):
+def generate_insight(user_question, filtered_df, chat_history, instructions=None):
     """
-    Takes the constructed prompt from llm_helpers and queries the LLM pipeline.
+    Answers user_question with the LLM pipeline, restricting retrieval to the
+    rows of filtered_df (its index holds the row ids). ``instructions`` (see
+    llm_helpers.build_instructions) go to the model but not to the retriever.
     """
-    answer, sources = ask_question(user_question, chat_history)
+    answer, sources = ask_question(user_question, chat_history, row_ids=filtered_df.index.values,
+                                   instructions=instructions)
     return answer, sources
+
+
+def stream_insight(user_question, filtered_df, chat_history, instructions=None):
+    """
+    Streaming counterpart of generate_insight: yields ('sources', docs),
+    ('token', text) and ('done', stats) events from the LLM pipeline.
+    """
+    return stream_question(user_question, chat_history, row_ids=filtered_df.index.values,
+                           instructions=instructions)
@@ -0,0 +1,367 @@
+"""
+Lightweight span instrumentation for the dashboard, retrieval and LLM calls.
+
+    with instrumentation.span("filter") as s:
+        selection = store.select(...)
+        s.set(rows=len(selection))
+
+    @instrumentation.traced("retrieval.embed_query")
+    def _embed_query(vectorstore, query): ...
+
+A span records its wall time, the change in process RSS over it and
+attributes such as row counts. Spans are collected when instrumentation is
+enabled (FINLYTICS_INSTRUMENTATION=1) or inside an active trace, e.g. a
+dashboard rerun with the performance panel open:
+
+- the trace keeps its spans for display (Trace.rows());
+- with instrumentation enabled, spans are also appended as JSON lines to a
+  rotating log file (FINLYTICS_SPAN_LOG_PATH) and aggregated into Prometheus
+  histograms (prometheus_text(), served as ``GET /metrics`` by the query
+  service or by start_metrics_server()).
+
+Otherwise span() returns a shared no-op object and traced() functions call
+straight through, so the cost is a flag check and a context variable lookup.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+from src import settings
+
+# Upper bounds (seconds) of the Prometheus duration histogram buckets.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = settings.INSTRUMENTATION
+_current_span = contextvars.ContextVar('finlytics_span', default=None)
+_current_trace = contextvars.ContextVar('finlytics_trace', default=None)
+_lock = threading.Lock()
+_metrics = {}
+_span_logger = None
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(flag):
+    """Turn span export (log file and metrics) on or off for this process."""
+    global _enabled
+    _enabled = bool(flag)
+
+
+def _rss_bytes():
+    # statm is a single short read; smaps (see memory_eval) is too slow per span.
+    try:
+        with open('/proc/self/statm', 'rb') as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class Span:
+    """One timed stage; use through span() or traced()."""
+
+    __slots__ = ('name', 'attrs', 'parent', 'depth', 'start', 'seconds', 'memory_delta', 'error',
+                 '_rss', '_token')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+        self.depth = 0
+        self.start = None
+        self.seconds = None
+        self.memory_delta = None
+        self.error = None
+
+    def set(self, **attrs):
+        """Attach attributes (rows=..., cached=...) to the span."""
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self.depth = self.parent.depth + 1 if self.parent is not None else 0
+        self._token = _current_span.set(self)
+        self._rss = _rss_bytes()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.start
+        rss = _rss_bytes()
+        if rss is not None and self._rss is not None:
+            self.memory_delta = rss - self._rss
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _current_span.reset(self._token)
+        _finish(self)
+        return False
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'parent': self.parent.name if self.parent is not None else None,
+            'depth': self.depth,
+            'seconds': self.seconds,
+            'memory_delta_mb': self.memory_delta / 1e6 if self.memory_delta is not None else None,
+            'error': self.error,
+            **self.attrs,
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name, **attrs):
+    """
+    Context manager timing the enclosed block as span ``name``.
+
+    Returns the shared no-op span when instrumentation is disabled and no
+    trace is active.
+    """
+    if not _enabled and _current_trace.get() is None:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def traced(name=None, rows=False):
+    """
+    Decorator wrapping every call of the function in a span.
+
+    Args:
+        name (str): Span name, defaults to module.qualname.
+        rows (bool): Record ``len()`` of the return value as the span's row count.
+    """
+    def decorate(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled and _current_trace.get() is None:
+                return fn(*args, **kwargs)
+            with Span(label, {}) as current:
+                result = fn(*args, **kwargs)
+                if rows and hasattr(result, '__len__'):
+                    current.set(rows=len(result))
+                return result
+        return wrapper
+    return decorate
+
+
+def record(name, seconds, **attrs):
+    """
+    Record an already measured stage, for work that cannot be wrapped in a
+    ``with`` block (e.g. a generator streaming LLM tokens).
+    """
+    if not _enabled and _current_trace.get() is None:
+        return
+    done = Span(name, attrs)
+    done.parent = _current_span.get()
+    done.depth = done.parent.depth + 1 if done.parent is not None else 0
+    done.start = time.perf_counter() - seconds
+    done.seconds = seconds
+    _finish(done)
+
+
+class Trace:
+    """
+    Spans of one unit of work (a dashboard rerun), in the order they started.
+
+    The trace is bound to the current thread/context between start() and
+    finish() and is itself the root span.
+    """
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:12]
+        self.spans = []
+        self.root = Span(name, {})
+
+    def start(self):
+        _current_trace.set(self)
+        self.root.__enter__()
+        return self
+
+    def finish(self):
+        if self.root.seconds is None:
+            self.root.__exit__(None, None, None)
+        if _current_trace.get() is self:
+            _current_trace.set(None)
+        return self
+
+    __enter__ = start
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish()
+        return False
+
+    def rows(self):
+        """
+        Span dicts ordered by start time, with their start ``offset`` into the
+        trace and ``share`` of its duration.
+        """
+        total = self.root.seconds or 0.0
+        rows = []
+        for done in sorted(self.spans, key=lambda s: s.start):
+            row = done.to_dict()
+            row['offset'] = done.start - self.root.start
+            row['share'] = done.seconds / total if total else None
+            rows.append(row)
+        return rows
+
+
+def start_trace(name):
+    """Start and return a Trace bound to the current thread/context."""
+    return Trace(name).start()
+
+
+def reset_trace():
+    """
+    Unbind the trace and span still bound to the current thread/context,
+    e.g. by a dashboard rerun that Streamlit interrupted (RerunException,
+    StopException) before it reached Trace.finish.
+    """
+    _current_trace.set(None)
+    _current_span.set(None)
+
+
+def _finish(done):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append(done)
+    if _enabled:
+        _observe(done)
+        logger = _get_span_logger()
+        if logger is not None:
+            entry = {'ts': time.time(), 'trace': trace.id if trace is not None else None,
+                     'pid': os.getpid(), **done.to_dict()}
+            logger.info(json.dumps(entry, default=str))
+
+
+def _get_span_logger():
+    global _span_logger
+    if _span_logger is None and settings.SPAN_LOG_PATH:
+        with _lock:
+            if _span_logger is None:
+                directory = os.path.dirname(settings.SPAN_LOG_PATH)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                handler = RotatingFileHandler(settings.SPAN_LOG_PATH, maxBytes=settings.SPAN_LOG_MAX_BYTES,
+                                              backupCount=settings.SPAN_LOG_BACKUPS, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger = logging.getLogger('finlytics.spans')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(handler)
+                _span_logger = logger
+    return _span_logger
+
+
+def _observe(done):
+    with _lock:
+        metric = _metrics.get(done.name)
+        if metric is None:
+            metric = _metrics[done.name] = {'count': 0, 'sum': 0.0, 'buckets': [0] * len(BUCKETS),
+                                            'errors': 0, 'rows': 0, 'memory_delta': 0}
+        metric['count'] += 1
+        metric['sum'] += done.seconds
+        for i, bound in enumerate(BUCKETS):
+            if done.seconds <= bound:
+                metric['buckets'][i] += 1
+        metric['errors'] += done.error is not None
+        rows = done.attrs.get('rows')
+        if isinstance(rows, int):
+            metric['rows'] += rows
+        if done.memory_delta is not None:
+            metric['memory_delta'] = done.memory_delta
+
+
+def reset_metrics():
+    with _lock:
+        _metrics.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """Span metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        metrics = {name: dict(metric, buckets=list(metric['buckets'])) for name, metric in _metrics.items()}
+    lines = [
+        "# HELP finlytics_span_seconds Duration of instrumented stages.",
+        "# TYPE finlytics_span_seconds histogram",
+    ]
+    for name, metric in sorted(metrics.items()):
+        label = f'span="{_label(name)}"'
+        for bound, count in zip(BUCKETS, metric['buckets']):
+            lines.append(f'finlytics_span_seconds_bucket{{{label},le="{bound}"}} {count}')
+        lines.append(f'finlytics_span_seconds_bucket{{{label},le="+Inf"}} {metric["count"]}')
+        lines.append(f'finlytics_span_seconds_sum{{{label}}} {metric["sum"]:.6f}')
+        lines.append(f'finlytics_span_seconds_count{{{label}}} {metric["count"]}')
+    for metric_name, key, kind, help_text in (
+        ('finlytics_span_errors_total', 'errors', 'counter', 'Stages that raised an exception.'),
+        ('finlytics_span_rows_total', 'rows', 'counter', 'Rows processed by instrumented stages.'),
+        ('finlytics_span_memory_delta_bytes', 'memory_delta', 'gauge', 'RSS change over the latest run of a stage.'),
+    ):
+        lines += [f"# HELP {metric_name} {help_text}", f"# TYPE {metric_name} {kind}"]
+        lines += [f'{metric_name}{{span="{_label(name)}"}} {metric[key]}' for name, metric in sorted(metrics.items())]
+    rss = _rss_bytes()
+    if rss is not None:
+        lines += ["# HELP finlytics_process_resident_memory_bytes Resident memory of this process.",
+                  "# TYPE finlytics_process_resident_memory_bytes gauge",
+                  f"finlytics_process_resident_memory_bytes {rss}"]
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0].rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(host="127.0.0.1", port=None):
+    """
+    Serve ``GET /metrics`` from a daemon thread (for processes without the
+    query service, such as the Streamlit dashboard).
+
+    Returns:
+        tuple: (server, url).
+    """
+    port = settings.METRICS_PORT if port is None else port
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='finlytics-metrics', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/metrics"
@@ -0,0 +1,299 @@
+import re
+
+import numpy as np
+
+LEXICAL_FILE = "lexical.npz"
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:&[a-z0-9]+)*")
+
+
+def tokenize(text):
+    """Lower-cased word tokens; "L&T" stays one token, punctuation is dropped."""
+    return _TOKEN.findall(str(text).lower())
+
+
+def known_entities(sectors=()):
+    """
+    Company and sector names the lexical index recognises in questions: the
+    generator's company/sector vocabulary plus any extra sector names.
+    """
+    from src.data_generation import companies_expanded
+
+    names = {company for companies in companies_expanded.values() for company in companies}
+    names.update(companies_expanded)
+    names.update(str(sector) for sector in sectors)
+    return sorted(name for name in names if tokenize(name))
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over document headlines and summaries.
+
+    Document ``i`` is FAISS position ``i`` of the vector store it was built
+    with, so lexical and vector hits share one id space and the dashboard
+    row filter maps onto both. Postings are stored CSR-style: terms sorted
+    alphabetically, ``offsets[t]:offsets[t + 1]`` slicing the (doc, tf)
+    arrays of term ``t``. A query scores only the postings of its own terms.
+
+    Args:
+        terms (np.ndarray): Sorted vocabulary.
+        offsets (np.ndarray): Posting list bounds per term (len(terms) + 1).
+        postings (np.ndarray): Document number of each posting, grouped by term.
+        frequencies (np.ndarray): Term frequency of each posting.
+        lengths (np.ndarray): Token count per document.
+        doc_ids (np.ndarray): Vector store document id per document.
+        entities (list[str]): Entity names matched in questions (see match_entities).
+        k1 (float): BM25 term-frequency saturation.
+        b (float): BM25 length normalisation.
+    """
+
+    def __init__(self, terms, offsets, postings, frequencies, lengths, doc_ids, entities=(), k1=1.2, b=0.75):
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.doc_ids = doc_ids
+        self.entities = list(entities)
+        self.k1 = k1
+        self.b = b
+        n = len(lengths)
+        average = lengths.mean() if n else 1.0
+        document_frequency = np.diff(offsets)
+        self._idf = np.log1p((n - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        self._norm = (k1 * (1 - b + b * lengths / max(average, 1e-9))).astype(np.float32)
+        # Entity phrases by first token, longest first so "Tech Mahindra" wins over "Mahindra".
+        self._entity_tokens = {}
+        for name in sorted(self.entities, key=lambda name: -len(tokenize(name))):
+            phrase = tuple(tokenize(name))
+            self._entity_tokens.setdefault(phrase[0], []).append((phrase, name))
+
+    def __len__(self):
+        return len(self.lengths)
+
+    @classmethod
+    def build(cls, texts, doc_ids, entities=()):
+        """
+        Index ``texts`` (one per vector store position).
+
+        Tokens are numbered in one pass; np.unique over ``term * n + doc``
+        keys then yields the sorted postings and their term frequencies
+        without per-term Python lists.
+
+        Args:
+            texts (list[str]): Headline and summary text per document.
+            doc_ids (list[str]): Vector store document id per document.
+            entities (list[str]): Entity names; ones absent from the corpus are dropped.
+
+        Returns:
+            LexicalIndex: The built index.
+        """
+        n = len(texts)
+        vocabulary = {}
+        term_numbers = []
+        lengths = np.zeros(n, dtype=np.int32)
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[position] = len(tokens)
+            term_numbers.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+        term_numbers = np.asarray(term_numbers, dtype=np.int64)
+        documents = np.repeat(np.arange(n, dtype=np.int64), lengths)
+
+        # Renumber terms alphabetically so queries can binary-search the vocabulary.
+        terms = np.array(list(vocabulary), dtype=str)
+        order = np.argsort(terms)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        keys, frequencies = np.unique(rank[term_numbers] * max(n, 1) + documents, return_counts=True)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(keys // max(n, 1), minlength=len(terms)))
+
+        arrays = (terms[order], offsets, (keys % max(n, 1)).astype(np.int32), frequencies.astype(np.int32),
+                  lengths, np.asarray(doc_ids, dtype=str))
+        probe = cls(*arrays)
+        return cls(*arrays, entities=[name for name in entities if len(probe.entity_positions([name]))])
+
+    def extend(self, texts, doc_ids, entities=()):
+        """
+        Index with ``texts`` appended as the next documents (positions
+        ``len(self)``, ``len(self) + 1``, ...), e.g. rows added by live ingestion.
+
+        Only the new texts are tokenized; their postings are merged into the
+        existing ones by a stable sort on the combined term numbers.
+
+        Args:
+            texts (list[str]): Headline and summary text per new document.
+            doc_ids (list[str]): Vector store document id per new document.
+            entities (list[str]): Extra entity names to match; ones absent from the corpus are dropped.
+
+        Returns:
+            LexicalIndex: A new index; this one is left unchanged.
+        """
+        added = LexicalIndex.build(texts, doc_ids)
+        terms = np.union1d(self.terms, added.terms)
+        n = len(self)
+        term_numbers = np.concatenate([
+            np.repeat(np.searchsorted(terms, self.terms), np.diff(self.offsets)),
+            np.repeat(np.searchsorted(terms, added.terms), np.diff(added.offsets)),
+        ])
+        # Old postings come first and name lower document numbers, so a stable
+        # sort by term keeps every posting list in document order.
+        order = np.argsort(term_numbers, kind='stable')
+        postings = np.concatenate([self.postings, added.postings + n]).astype(np.int32)[order]
+        frequencies = np.concatenate([self.frequencies, added.frequencies])[order]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(term_numbers, minlength=len(terms)))
+        arrays = (terms, offsets, postings, frequencies, np.concatenate([self.lengths, added.lengths]),
+                  np.concatenate([self.doc_ids, added.doc_ids]).astype(str))
+        probe = LexicalIndex(*arrays, k1=self.k1, b=self.b)
+        candidates = self.entities + [name for name in entities if name not in self.entities]
+        return LexicalIndex(*arrays, entities=[name for name in candidates if len(probe.entity_positions([name]))],
+                            k1=self.k1, b=self.b)
+
+    def save(self, path):
+        """Write the index as an uncompressed .npz file."""
+        with open(path, 'wb') as fh:
+            np.savez(fh, terms=self.terms, offsets=self.offsets, postings=self.postings,
+                     frequencies=self.frequencies, lengths=self.lengths, doc_ids=self.doc_ids,
+                     entities=np.array(self.entities, dtype=str), params=np.array([self.k1, self.b]))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            k1, b = data['params']
+            return cls(data['terms'], data['offsets'], data['postings'], data['frequencies'],
+                       data['lengths'], data['doc_ids'], data['entities'].tolist(), float(k1), float(b))
+
+    def matches(self, vectorstore):
+        """Whether this index was built for the store's current documents (same count and last id)."""
+        ntotal = vectorstore.index.ntotal
+        if ntotal != len(self):
+            return False
+        return ntotal == 0 or vectorstore.index_to_docstore_id.get(ntotal - 1) == self.doc_ids[-1]
+
+    def _term(self, token):
+        position = np.searchsorted(self.terms, token)
+        if position < len(self.terms) and self.terms[position] == token:
+            return int(position)
+        return None
+
+    def _postings(self, term):
+        start, end = self.offsets[term], self.offsets[term + 1]
+        return self.postings[start:end], self.frequencies[start:end]
+
+    def match_entities(self, query):
+        """
+        Known company/sector names mentioned in ``query``, scanning left to
+        right and taking the longest name at each token (no overlaps).
+
+        Returns:
+            list[str]: Matched entity names.
+        """
+        tokens = tokenize(query)
+        found = []
+        start = 0
+        while start < len(tokens):
+            width = 1
+            for phrase, name in self._entity_tokens.get(tokens[start], ()):
+                if tuple(tokens[start:start + len(phrase)]) == phrase:
+                    if name not in found:
+                        found.append(name)
+                    width = len(phrase)
+                    break
+            start += width
+        return found
+
+    def entity_positions(self, entities):
+        """
+        Documents mentioning any of ``entities`` (every token of the name present).
+
+        Returns:
+            np.ndarray: Sorted document positions.
+        """
+        hits = []
+        for name in entities:
+            documents = None
+            for token in tokenize(name):
+                term = self._term(token)
+                if term is None:
+                    documents = np.empty(0, dtype=np.int32)
+                    break
+                posted = self._postings(term)[0]
+                documents = posted if documents is None else np.intersect1d(documents, posted, assume_unique=True)
+            if documents is not None:
+                hits.append(documents)
+        if not hits:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(hits))
+
+    def scores(self, query):
+        """BM25 score of every document for ``query`` (zero when no term matches)."""
+        terms = {self._term(token) for token in tokenize(query)} - {None}
+        if not terms or len(self) == 0:
+            return np.zeros(len(self), dtype=np.float32)
+        documents, weights = [], []
+        for term in terms:
+            posted, frequency = self._postings(term)
+            documents.append(posted)
+            weights.append(self._idf[term] * frequency * (self.k1 + 1) / (frequency + self._norm[posted]))
+        return np.bincount(np.concatenate(documents), weights=np.concatenate(weights),
+                           minlength=len(self)).astype(np.float32)
+
+    def search(self, query, k=10, positions=None):
+        """
+        Top-k documents by BM25.
+
+        Args:
+            query (str): Search text.
+            k (int): Number of documents to return.
+            positions (np.ndarray): Only rank these document positions (None = all).
+
+        Returns:
+            tuple: (positions, scores) of matching documents, best first.
+        """
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores > 0) if positions is None else np.asarray(positions, dtype=np.int64)
+        candidates = candidates[scores[candidates] > 0]
+        ranked = scores[candidates]
+        if len(candidates) > k:
+            top = np.argpartition(-ranked, k)[:k]
+            candidates, ranked = candidates[top], ranked[top]
+        order = np.lexsort((candidates, -ranked))  # ties keep index order
+        return candidates[order], ranked[order]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse ranked position lists: each list contributes 1 / (k + rank) per item.
+
+    Args:
+        rankings (list[array-like]): Positions, best first, one list per source.
+        k (int): RRF constant; larger values flatten the rank weighting.
+
+    Returns:
+        np.ndarray: Positions ordered by fused score (ties in first-seen order).
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking, start=1):
+            position = int(position)
+            scores[position] = scores.get(position, 0.0) + 1.0 / (k + rank)
+    return np.array(sorted(scores, key=lambda position: -scores[position]), dtype=np.int64)
+
+
+def build_lexical_index(vectorstore, df, ids):
+    """
+    Lexical index aligned with ``vectorstore``'s positions.
+
+    Args:
+        vectorstore (FAISS): Store whose positions the index follows.
+        df (pd.DataFrame): Dataset rows the store was built from.
+        ids (list[str]): Content id of every row of ``df`` (see content_ids).
+
+    Returns:
+        LexicalIndex: Index over the headline and summary of every stored document.
+    """
+    text_by_id = dict(zip(ids, (df['headline'].astype(str) + " " + df['summary'].astype(str)).tolist()))
+    doc_ids = [vectorstore.index_to_docstore_id[position] for position in range(vectorstore.index.ntotal)]
+    texts = [text_by_id.get(doc_id, "") for doc_id in doc_ids]
+    return LexicalIndex.build(texts, doc_ids, known_entities(df['sector'].dropna().unique()))
@@ -0,0 +1,552 @@
+"""
+Process-wide gateway in front of the chat model.
+
+Every LLM call of the process goes through one LLMGateway, which
+
+- runs upstream calls on its own event loop thread, so the pooled async
+  HTTP client is reused across calls instead of being tied to a
+  short-lived per-request loop;
+- bounds the number of concurrent upstream calls (callers queue);
+- coalesces identical in-flight prompts into one upstream call, for
+  blocking and streaming calls alike: a caller that arrives mid-stream
+  replays the chunks received so far and then follows the live stream;
+- applies a per-attempt timeout and retries transient failures (timeouts,
+  connection errors, 408/409/429/5xx) with exponential backoff;
+- records latency, queueing, retries and token usage per call.
+
+Try it against the stub server:
+
+    python -m src.llm_gateway --stub --clients 16 --fail-first 2
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src import settings
+from src.instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def is_retryable(error):
+    """Whether a failed call may succeed when repeated (timeouts, connection errors, 408/409/429/5xx)."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        import openai
+    except ImportError:
+        openai = None
+    if openai is not None and isinstance(error, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    status = getattr(error, 'status_code', None)
+    return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+
+def backoff_delay(attempt, base, maximum, error=None):
+    """
+    Exponential backoff with full jitter: uniform in [0, base * 2**attempt],
+    capped at ``maximum``; a server's Retry-After header is honoured as a floor.
+    """
+    delay = random.uniform(0, min(maximum, base * 2 ** attempt))
+    response = getattr(error, 'response', None)
+    retry_after = getattr(response, 'headers', {}).get('retry-after') if response is not None else None
+    try:
+        delay = max(delay, min(float(retry_after), maximum))
+    except (TypeError, ValueError):
+        pass
+    return delay
+
+
+def prompt_key(messages, **params):
+    """Fingerprint of a prompt (message roles and contents plus call parameters) used for coalescing."""
+    payload = [(message.type, message.content) for message in messages]
+    raw = json.dumps([payload, params], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _usage(message):
+    usage = getattr(message, 'usage_metadata', None) or {}
+    return usage.get('input_tokens'), usage.get('output_tokens')
+
+
+class _Broadcast:
+    """
+    Chunks of one upstream stream, readable by any number of subscribers from any thread.
+
+    ``activity`` is the monotonic time of the upstream call's latest progress
+    (an attempt starting, a chunk arriving, or the end of a retry backoff);
+    it stays None while the call is queued for a gateway slot.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.future = None
+        self.activity = None
+        self._condition = threading.Condition()
+
+    def mark(self, at=None):
+        """Record upstream progress now (or at the monotonic time ``at``, e.g. the end of a backoff)."""
+        with self._condition:
+            self.activity = time.monotonic() if at is None else at
+            self._condition.notify_all()
+
+    def publish(self, text):
+        with self._condition:
+            self.chunks.append(text)
+            self.activity = time.monotonic()
+            self._condition.notify_all()
+
+    def finish(self, error=None):
+        with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+
+    def read(self, index, timeout, queued_since, queue_timeout):
+        """
+        Chunks after ``index``: (chunks, done, error, started).
+
+        Waits until a chunk arrives, the stream ends, or the deadline passes:
+        ``timeout`` after the upstream call's latest progress once it has
+        started, ``queue_timeout`` after ``queued_since`` while it is still
+        waiting for a gateway slot.
+        """
+        with self._condition:
+            while len(self.chunks) <= index and not self.done:
+                if self.activity is None:
+                    deadline = queued_since + queue_timeout
+                else:
+                    deadline = self.activity + timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self.chunks[index:], self.done, self.error, self.activity is not None
+
+
+class LLMGateway:
+    """
+    Concurrency-limited, coalescing, retrying front of a LangChain chat model.
+
+    Args:
+        llm (BaseChatModel): Upstream chat model (its own retries should be disabled).
+        max_concurrency (int): Upstream calls in flight at once. Defaults to settings.LLM_MAX_CONCURRENCY.
+        max_retries (int): Retries after the first attempt. Defaults to settings.LLM_MAX_RETRIES.
+        backoff (float): Base backoff in seconds. Defaults to settings.LLM_RETRY_BACKOFF_SECONDS.
+        backoff_max (float): Longest backoff in seconds. Defaults to settings.LLM_RETRY_BACKOFF_MAX_SECONDS.
+        timeout (float): Per-attempt timeout for a whole call, or between two streamed chunks.
+            Defaults to settings.LLM_TIMEOUT_SECONDS.
+        queue_timeout (float): Longest wait for a free slot before the call starts.
+            Defaults to settings.LLM_QUEUE_TIMEOUT_SECONDS.
+        history (int): Number of recent calls kept for latency percentiles.
+    """
+
+    def __init__(self, llm, max_concurrency=None, max_retries=None, backoff=None, backoff_max=None,
+                 timeout=None, queue_timeout=None, history=1000):
+        self.llm = llm
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = settings.LLM_RETRY_BACKOFF_SECONDS if backoff is None else backoff
+        self.backoff_max = backoff_max or settings.LLM_RETRY_BACKOFF_MAX_SECONDS
+        self.timeout = timeout or settings.LLM_TIMEOUT_SECONDS
+        self.queue_timeout = queue_timeout or settings.LLM_QUEUE_TIMEOUT_SECONDS
+        self._loop = None
+        self._semaphore = None
+        self._loop_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._calls = deque(maxlen=history)
+        self._totals = {name: 0 for name in ('requests', 'coalesced', 'upstream_calls', 'retries', 'errors',
+                                              'cancelled', 'prompt_tokens', 'completion_tokens')}
+        self._active = 0
+        self._waiting = 0
+        self._peak_active = 0
+
+    # --- event loop ---------------------------------------------------------
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def _submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    # --- metrics ------------------------------------------------------------
+
+    def _record(self, call):
+        with self._lock:
+            self._calls.append(call)
+            self._totals['upstream_calls'] += 1
+            self._totals['retries'] += call['retries']
+            self._totals['errors'] += int(call['error'] is not None and call['error'] != 'cancelled')
+            self._totals['cancelled'] += int(call['error'] == 'cancelled')
+            self._totals['prompt_tokens'] += call['prompt_tokens'] or 0
+            self._totals['completion_tokens'] += call['completion_tokens'] or 0
+        logger.info("LLM %s call: %.3fs (queued %.3fs, %d retries, %s prompt / %s completion tokens)%s",
+                    call['kind'], call['seconds'], call['queue_seconds'], call['retries'],
+                    call['prompt_tokens'], call['completion_tokens'],
+                    f" failed: {call['error']}" if call['error'] else "")
+
+    def stats(self):
+        """
+        Totals since start plus latency percentiles over recent upstream calls.
+
+        Returns:
+            dict: requests, coalesced, upstream_calls, retries, errors, cancelled,
+            token totals, active/waiting/peak_active calls and p50/p95 of
+            latency, queueing and (streams) time to first chunk, in seconds.
+        """
+        with self._lock:
+            stats = dict(self._totals)
+            stats.update(active=self._active, waiting=self._waiting, peak_active=self._peak_active,
+                         max_concurrency=self.max_concurrency)
+            calls = list(self._calls)
+        for name in ('seconds', 'queue_seconds', 'first_chunk_seconds'):
+            values = [call[name] for call in calls if call.get(name) is not None]
+            if values:
+                stats[f'{name}_p50'] = float(np.percentile(values, 50))
+                stats[f'{name}_p95'] = float(np.percentile(values, 95))
+        return stats
+
+    def recent_calls(self, count=20):
+        """The last ``count`` upstream call records, newest last."""
+        with self._lock:
+            return list(self._calls)[-count:]
+
+    # --- upstream calls -----------------------------------------------------
+
+    async def _slot(self, call):
+        """
+        Wait for a concurrency slot (released with _release).
+
+        Raises:
+            TimeoutError: When no slot frees up within ``queue_timeout``.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No free LLM slot within {self.queue_timeout:g}s") from None
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        call['queue_seconds'] = time.perf_counter() - start
+        with self._lock:
+            self._active += 1
+            self._peak_active = max(self._peak_active, self._active)
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+        self._semaphore.release()
+
+    async def _retrying(self, attempt, call, on_retry=None):
+        for number in range(self.max_retries + 1):
+            try:
+                return await attempt()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if number == self.max_retries or not is_retryable(e):
+                    raise
+                delay = backoff_delay(number, self.backoff, self.backoff_max, e)
+                call['retries'] += 1
+                logger.warning("LLM call failed (%s: %s), retry %d in %.2fs",
+                               type(e).__name__, e, number + 1, delay)
+                if on_retry is not None:
+                    on_retry(delay)
+                await asyncio.sleep(delay)
+
+    def _new_call(self, kind):
+        return {'kind': kind, 'seconds': None, 'queue_seconds': 0.0, 'retries': 0, 'error': None,
+                'prompt_tokens': None, 'completion_tokens': None, 'subscribers': 1}
+
+    async def _invoke(self, key, messages, stop):
+        call = self._new_call('invoke')
+        start = time.perf_counter()
+        try:
+            await self._slot(call)
+            try:
+                async def attempt():
+                    try:
+                        return await asyncio.wait_for(self.llm.ainvoke(messages, stop=stop), self.timeout)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"No reply from the LLM within {self.timeout:g}s")
+                message = await self._retrying(attempt, call)
+            finally:
+                self._release()
+            call['prompt_tokens'], call['completion_tokens'] = _usage(message)
+            return message
+        except asyncio.CancelledError:
+            call['error'] = 'cancelled'
+            raise
+        except Exception as e:
+            call['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            call['seconds'] = time.perf_counter() - start
+            with self._lock:
+                self._inflight.pop(('invoke', key), None)
+            self._record(call)
+
+    async def _stream(self, key, messages, stop, broadcast):
+        call = self._new_call('stream')
+        start = time.perf_counter()
+        try:
+            await self._slot(call)
+            try:
+                async def attempt():
+                    # Retried until the first chunk arrives; later failures end the stream.
+                    broadcast.mark()
+                    chunks = self.llm.astream(messages, stop=stop).__aiter__()
+                    try:
+                        first = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                    except StopAsyncIteration:
+                        first = None
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"No token from the LLM within {self.timeout:g}s")
+                    return chunks, first
+
+                # Subscribers keep waiting through the backoff before a retry.
+                chunks, chunk = await self._retrying(
+                    attempt, call, on_retry=lambda delay: broadcast.mark(time.monotonic() + delay))
+                call['first_chunk_seconds'] = time.perf_counter() - start
+                count = 0
+                while chunk is not None:
+                    count += 1
+                    if chunk.content:
+                        broadcast.publish(chunk.content)
+                    prompt_tokens, completion_tokens = _usage(chunk)
+                    if completion_tokens is not None:
+                        call['prompt_tokens'], call['completion_tokens'] = prompt_tokens, completion_tokens
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                    except StopAsyncIteration:
+                        chunk = None
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"No token from the LLM within {self.timeout:g}s")
+                if call['completion_tokens'] is None:
+                    call['completion_tokens'] = count  # no usage reported: one token per chunk
+            finally:
+                self._release()
+            broadcast.finish()
+        except asyncio.CancelledError:
+            call['error'] = 'cancelled'
+            broadcast.finish(error=RuntimeError("LLM stream cancelled"))
+            raise
+        except Exception as e:
+            call['error'] = f"{type(e).__name__}: {e}"
+            broadcast.finish(error=e)
+        finally:
+            call['seconds'] = time.perf_counter() - start
+            call['subscribers'] = broadcast.subscribers
+            with self._lock:
+                if self._inflight.get(('stream', key)) is broadcast:
+                    del self._inflight[('stream', key)]
+            self._record(call)
+
+    # --- public API -----------------------------------------------------------
+
+    def invoke(self, messages, stop=None):
+        """
+        Blocking chat call; identical concurrent calls share one upstream request.
+
+        Returns:
+            AIMessage: The model's reply.
+        """
+        key = prompt_key(messages, stop=stop)
+        with span("llm.invoke") as current:
+            with self._lock:
+                self._totals['requests'] += 1
+                future = self._inflight.get(('invoke', key))
+                coalesced = future is not None
+                if coalesced:
+                    self._totals['coalesced'] += 1
+                else:
+                    future = self._submit(self._invoke(key, messages, stop))
+                    self._inflight[('invoke', key)] = future
+            message = future.result()
+            prompt_tokens, completion_tokens = _usage(message)
+            current.set(coalesced=coalesced, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return message
+
+    def stream(self, messages, stop=None, timeout=None):
+        """
+        Streaming chat call yielding text chunks; identical concurrent streams
+        share one upstream request. Closing the generator unsubscribes, and
+        the upstream request is cancelled once no subscriber is left.
+
+        ``timeout`` only runs once the upstream call holds a gateway slot,
+        and restarts with every attempt, chunk and retry backoff; a call
+        still queued for a slot is bounded by ``queue_timeout`` instead.
+
+        Raises:
+            TimeoutError: When no chunk arrives within ``timeout`` seconds of
+            upstream progress, or the call stays queued for ``queue_timeout``.
+        """
+        timeout = timeout or self.timeout
+        queued_since = time.monotonic()
+        key = prompt_key(messages, stop=stop)
+        with self._lock:
+            self._totals['requests'] += 1
+            broadcast = self._inflight.get(('stream', key))
+            if broadcast is not None:
+                self._totals['coalesced'] += 1
+            else:
+                broadcast = _Broadcast()
+                self._inflight[('stream', key)] = broadcast
+                broadcast.future = self._submit(self._stream(key, messages, stop, broadcast))
+            broadcast.subscribers += 1
+
+        index = 0
+        try:
+            while True:
+                chunks, done, error, started = broadcast.read(index, timeout, queued_since, self.queue_timeout)
+                if not chunks and not done:
+                    if not started:
+                        raise TimeoutError(f"No free LLM slot within {self.queue_timeout:g}s")
+                    raise TimeoutError(f"No token from the LLM within {timeout:g}s")
+                index += len(chunks)
+                yield from chunks
+                if done:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            with self._lock:
+                broadcast.subscribers -= 1
+                abandoned = broadcast.subscribers == 0 and not broadcast.done
+                if abandoned and self._inflight.get(('stream', key)) is broadcast:
+                    del self._inflight[('stream', key)]
+            if abandoned:
+                broadcast.future.cancel()
+
+    def chat_model(self):
+        """LangChain chat model routed through this gateway (for chains)."""
+        return GatewayChatModel(gateway=self)
+
+
+class GatewayChatModel(BaseChatModel):
+    """LangChain adapter: chains call the gateway instead of the raw client."""
+
+    gateway: Any
+
+    @property
+    def _llm_type(self):
+        return "finlytics-gateway"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self.gateway.invoke(messages, stop=stop)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(
+            content=message.content, usage_metadata=getattr(message, 'usage_metadata', None)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for text in self.gateway.stream(messages, stop=stop):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+
+def build_chat_client(api_key, base_url=None, model=None):
+    """
+    Upstream ChatOpenAI client with a pooled async HTTP client sized to the
+    gateway's concurrency; the client's own retries are off (the gateway retries).
+    """
+    import httpx
+    from langchain_openai import ChatOpenAI
+
+    limits = httpx.Limits(max_connections=settings.LLM_MAX_CONNECTIONS,
+                          max_keepalive_connections=settings.LLM_MAX_CONNECTIONS)
+    return ChatOpenAI(
+        api_key=api_key,
+        base_url=base_url or settings.LLM_BASE_URL,
+        model=model or settings.LLM_MODEL,
+        temperature=0.5,
+        max_tokens=512,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=0,
+        http_async_client=httpx.AsyncClient(limits=limits, timeout=settings.LLM_TIMEOUT_SECONDS),
+    )
+
+
+def _drill(gateway, clients):
+    """Concurrent identical, distinct and streamed questions; returns wall time per scenario."""
+    from concurrent.futures import ThreadPoolExecutor
+    from langchain_core.messages import HumanMessage
+
+    def ask(i, same, streamed):
+        messages = [HumanMessage(content="How did banking stocks do?" if same else f"Question {i}: how did sector {i} do?")]
+        if streamed:
+            return "".join(gateway.stream(messages))
+        return gateway.invoke(messages).content
+
+    timings = {}
+    for name, same, streamed in (('identical', True, False), ('distinct', False, False),
+                                 ('identical_stream', True, True), ('distinct_stream', False, True)):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            answers = list(executor.map(lambda i: ask(i, same, streamed), range(clients)))
+        timings[name] = time.perf_counter() - start
+        print(f"   {name:<17} {clients} callers in {timings[name]:.2f}s, {len(set(answers))} distinct answer(s)")
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exercise the LLM gateway with concurrent callers.")
+    parser.add_argument("--stub", action="store_true", help="run against an in-process stub LLM server")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent callers per scenario")
+    parser.add_argument("--fail-first", type=int, default=2, help="stub: fail the first N requests with HTTP 503")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="stub: seconds between streamed words")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="stub: seconds before the first word")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    stub = None
+    if args.stub:
+        from src.stub_llm_server import start_stub_server
+        stub, base_url = start_stub_server(token_delay=args.token_delay, first_token_delay=args.first_token_delay,
+                                           fail_first=args.fail_first)
+        client = build_chat_client("stub", base_url)
+    else:
+        token = os.environ.get("HF_TOKEN")
+        if not token:
+            parser.error("HF_TOKEN is not set (or use --stub)")
+        client = build_chat_client(token)
+    gateway = LLMGateway(client, backoff=0.1)
+    print(f"🚦 Gateway: max {gateway.max_concurrency} concurrent calls, {gateway.max_retries} retries")
+    _drill(gateway, args.clients)
+    stats = gateway.stats()
+    print(f"📊 {stats['requests']} requests -> {stats['upstream_calls']} upstream calls "
+          f"({stats['coalesced']} coalesced), {stats['retries']} retries, {stats['errors']} errors, "
+          f"peak {stats['peak_active']} concurrent")
+    print(f"   latency p50 {stats['seconds_p50']:.3f}s p95 {stats['seconds_p95']:.3f}s, "
+          f"queued p95 {stats['queue_seconds_p95']:.3f}s, "
+          f"tokens {stats['prompt_tokens']} prompt / {stats['completion_tokens']} completion")
+    if stub is not None:
+        print(f"   stub server saw {stub.stats['requests']} requests ({stub.stats['failed']} failed on purpose)")
@@ -1,32 +1,93 @@
-import pandas as pd
-from src.insight_chain import generate_insight as _generate_insight
+from src.answer_cache import get_answer_cache, selection_fingerprint
+from src.context_builder import build_context
+from src.data_store import load_dataset
+from src.instrumentation import traced
+from src.insight_chain import generate_insight as _generate_insight, stream_insight as _stream_insight
 
-def load_data(path="data/indian_stock_news_2024_25.csv"):
+@traced("load_data", rows=True)
+def load_data(path=None):
     """
     Load and return the financial news dataset as a DataFrame.
+    Served from the shared columnar cache (see src/data_store.py);
+    defaults to settings.DATA_PATH.
     """
-    df = pd.read_csv(path)
-    df['date'] = pd.to_datetime(df['date'])
-    return df
+    return load_dataset(path)
+
+SYSTEM_INSTRUCTION = (
+    "You are a senior financial analyst and strategic advisor for businesses and investors in the Indian market. "
+    "Given the filtered financial news data and the user's question, provide a detailed and structured business insight. "
+    "Your output should include: \n"
+    "- Identification of sectors or companies gaining an edge and those showing weaknesses or risks. \n"
+    "- A summary of key problems impacting the market or specific sectors, backed by data. \n"
+    "- Practical and actionable recommendations or solutions for investors or business leaders. \n"
+    "- Highlight the best and worst trends or entities with explanations. \n"
+    "- Use bullet points, numbered lists, and clear sections for readability.\n"
+    "- Avoid generic or vague statements and ensure insights are data-driven and tailored to the context. \n"
+    "Format the response using markdown."
+)
+
+@traced("context_builder")
+def build_instructions(filtered_df, token_budget=None):
+    """
+    Analyst instruction followed by a statistical digest of the filtered rows,
+    kept within ``token_budget`` (defaults to settings.CONTEXT_TOKEN_BUDGET).
+    """
+    return f"{SYSTEM_INSTRUCTION}\n\nDATA:\n{build_context(filtered_df, token_budget)}"
+
+def build_prompt(user_question, filtered_df, token_budget=None):
+    """Single-string prompt: instructions, data digest and the question."""
+    return f"{build_instructions(filtered_df, token_budget)}\n\nQUESTION: {user_question}\nINSIGHT REPORT:"
 
 def generate_insight(user_question, filtered_df, chat_history):
-    context = filtered_df[['date','headline','summary','sector','sentiment']].head(8).to_string(index=False)
-
-    system_instruction = (
-        "You are a senior financial analyst and strategic advisor for businesses and investors in the Indian market. "
-        "Given the filtered financial news data and the user's question, provide a detailed and structured business insight. "
-        "Your output should include: \n"
-        "- Identification of sectors or companies gaining an edge and those showing weaknesses or risks. \n"
-        "- A summary of key problems impacting the market or specific sectors, backed by data. \n"
-        "- Practical and actionable recommendations or solutions for investors or business leaders. \n"
-        "- Highlight the best and worst trends or entities with explanations. \n"
-        "- Use bullet points, numbered lists, and clear sections for readability.\n"
-        "- Avoid generic or vague statements and ensure insights are data-driven and tailored to the context. \n"
-        "Format the response using markdown."
-    )
-
-    prompt = f"{system_instruction}\n\nDATA:\n{context}\n\nQUESTION: {user_question}\nINSIGHT REPORT:"
-
-    answer, sources = _generate_insight(prompt, filtered_df, chat_history)
+    """
+    Answer an analyst question about the filtered rows.
+
+    The model gets the analyst instructions and a statistical digest of the
+    whole selection (see build_instructions); only the question itself is
+    used as the retrieval query.
+
+    Answers are cached per (selected rows, question); repeated or near-identical
+    questions under the same filters are served from the answer cache. Calls
+    with chat history bypass the cache since the answer depends on it.
+    """
+    cache = get_answer_cache() if not chat_history else None
+    if cache is not None:
+        fingerprint = selection_fingerprint(filtered_df)
+        cached = cache.get(fingerprint, user_question)
+        if cached is not None:
+            return cached
+
+    instructions = build_instructions(filtered_df)
+
+    answer, sources = _generate_insight(user_question, filtered_df, chat_history, instructions=instructions)
+    if cache is not None and answer:
+        cache.put(fingerprint, user_question, answer, sources)
     return answer, sources
 
+def stream_insight(user_question, filtered_df, chat_history):
+    """
+    Streaming version of generate_insight, yielding ('sources', docs),
+    ('token', text) and ('done', stats) events. A cached answer is replayed
+    as a single token; a completed stream is stored in the answer cache.
+    """
+    cache = get_answer_cache() if not chat_history else None
+    if cache is not None:
+        fingerprint = selection_fingerprint(filtered_df)
+        cached = cache.get(fingerprint, user_question)
+        if cached is not None:
+            answer, sources = cached
+            yield 'sources', sources
+            yield 'token', answer
+            yield 'done', {'cached': True}
+            return
+
+    instructions = build_instructions(filtered_df)
+    sources, parts = [], []
+    for kind, payload in _stream_insight(user_question, filtered_df, chat_history, instructions=instructions):
+        if kind == 'sources':
+            sources = payload
+        elif kind == 'token':
+            parts.append(payload)
+        elif kind == 'done' and cache is not None and parts:
+            cache.put(fingerprint, user_question, "".join(parts), sources)
+        yield kind, payload
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src import settings
+from src.query_client import QueryClient
+
+# Request mix of a dashboard session: every filter change triggers a count,
+# the KPI rollups and one chart; some sessions then ask a question.
+DEFAULT_MIX = {'filter': 0.3, 'kpis': 0.3, 'series': 0.3, 'ask': 0.1}
+
+QUESTIONS = [
+    "Which sector had the best price change?",
+    "Summarise the sentiment of the selected news.",
+    "What is driving trading volume?",
+    "Which companies moved the most?",
+]
+
+
+def filter_pool(meta, size=20, seed=0):
+    """
+    A fixed set of plausible dashboard filters (date window, 1-3 sectors,
+    1-2 sentiments). Sessions draw from it, so popular filters repeat across
+    sessions the way they do with real users.
+    """
+    rng = np.random.default_rng(seed)
+    min_date, max_date = pd.Timestamp(meta['date_min']), pd.Timestamp(meta['date_max'])
+    span = max((max_date - min_date).days, 1)
+    pool = []
+    for _ in range(size):
+        start = min_date + pd.Timedelta(days=int(rng.integers(span)))
+        end = min(start + pd.Timedelta(days=int(rng.integers(30, 365))), max_date)
+        pool.append({
+            'start_date': start.date(),
+            'end_date': end.date(),
+            'sectors': sorted(rng.choice(meta['sectors'], size=min(len(meta['sectors']), int(rng.integers(1, 4))),
+                                         replace=False).tolist()),
+            'sentiments': sorted(rng.choice(meta['sentiments'], size=min(len(meta['sentiments']), int(rng.integers(1, 3))),
+                                            replace=False).tolist()),
+        })
+    return pool
+
+
+def _call(client, endpoint, filters, rng):
+    if endpoint == 'filter':
+        return client.select(**filters)
+    if endpoint == 'kpis':
+        return client.rollup(by=('sector',), **filters)
+    if endpoint == 'series':
+        return client.series(rng.choice(['price', 'volume', 'sentiment', 'emotion']), **filters)
+    if endpoint == 'ask':
+        return client.ask(QUESTIONS[rng.integers(len(QUESTIONS))], **filters)
+    raise ValueError(f"Unknown endpoint '{endpoint}'")
+
+
+def run_load(base_url, clients=8, requests=400, mix=None, pool_size=20, seed=0):
+    """
+    Drive the query service with ``clients`` concurrent sessions.
+
+    Args:
+        base_url (str): Query service URL.
+        clients (int): Concurrent client threads.
+        requests (int): Total requests across all clients.
+        mix (dict): Endpoint -> share of requests (defaults to DEFAULT_MIX).
+        pool_size (int): Number of distinct filters sessions draw from.
+        seed (int): Random seed.
+
+    Returns:
+        dict: Per-endpoint latency percentiles and errors, overall throughput,
+        and the service's /stats after the run.
+    """
+    mix = mix or DEFAULT_MIX
+    endpoints, weights = list(mix), np.array(list(mix.values()), dtype=float)
+    client = QueryClient(base_url)
+    pool = filter_pool(client.meta(), pool_size, seed)
+    latencies = {endpoint: [] for endpoint in endpoints}
+    errors = {endpoint: 0 for endpoint in endpoints}
+    lock = threading.Lock()
+
+    def session(worker):
+        rng = np.random.default_rng(seed + worker + 1)
+        session_client = QueryClient(base_url)
+        for _ in range(requests // clients + (worker < requests % clients)):
+            endpoint = endpoints[rng.choice(len(endpoints), p=weights / weights.sum())]
+            filters = pool[rng.integers(len(pool))]
+            start = time.perf_counter()
+            try:
+                _call(session_client, endpoint, filters, rng)
+                failed = False
+            except (OSError, ValueError):
+                failed = True
+            seconds = time.perf_counter() - start
+            with lock:
+                if failed:
+                    errors[endpoint] += 1
+                else:
+                    latencies[endpoint].append(seconds)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(session, range(clients)))
+    wall = time.perf_counter() - start
+
+    results = {'clients': clients, 'requests': requests, 'seconds': wall, 'endpoints': {}}
+    completed = 0
+    for endpoint in endpoints:
+        values = latencies[endpoint]
+        completed += len(values)
+        row = {'ok': len(values), 'errors': errors[endpoint]}
+        if values:
+            row.update({f'p{q}_ms': float(np.percentile(values, q)) * 1000 for q in (50, 95, 99)})
+        results['endpoints'][endpoint] = row
+    results['throughput_rps'] = completed / wall if wall else 0.0
+    results['service'] = client.stats()
+    return results
+
+
+def _print_results(results):
+    print(f"🚦 {results['clients']} clients, {results['requests']} requests in {results['seconds']:.2f}s "
+          f"({results['throughput_rps']:.1f} req/s)")
+    for endpoint, row in results['endpoints'].items():
+        latency = (f"p50={row['p50_ms']:.1f}ms p95={row['p95_ms']:.1f}ms p99={row['p99_ms']:.1f}ms"
+                   if row['ok'] else "no successful requests")
+        print(f"   {endpoint:<7} ok={row['ok']:<5} errors={row['errors']:<3} {latency}")
+    cache = results['service']['response_cache']
+    lookups = cache['hits'] + cache['misses']
+    print(f"🗄️ Response cache: {cache['hits']}/{lookups} hits ({cache['hits'] / max(lookups, 1):.0%}), "
+          f"{cache['entries']} entries")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the query service.")
+    parser.add_argument("--url", default=settings.QUERY_SERVICE_URL, help="query service URL")
+    parser.add_argument("--self-host", action="store_true",
+                        help="start an in-process query service backed by the local stub LLM")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--requests", type=int, default=400, help="total requests")
+    parser.add_argument("--mix", type=json.loads, help='endpoint shares as JSON, e.g. \'{"kpis": 1}\'')
+    parser.add_argument("--filters", type=int, default=20, help="distinct filters sessions draw from")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    base_url = args.url
+    if args.self_host:
+        from src.query_service import QueryService, start_query_service
+        from src.stub_llm_server import start_stub_server
+
+        _, settings.LLM_BASE_URL = start_stub_server()
+        os.environ.setdefault("HF_TOKEN", "stub")
+        _, base_url = start_query_service(QueryService(), port=0)
+        print(f"🛰️ Query service on {base_url} (stub LLM at {settings.LLM_BASE_URL})")
+    if not base_url:
+        parser.error("pass --url, set FINLYTICS_QUERY_SERVICE_URL or use --self-host")
+
+    results = run_load(base_url, args.clients, args.requests, args.mix, args.filters)
+    _print_results(results)
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2, default=str)
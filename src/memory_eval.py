@@ -0,0 +1,200 @@
+import argparse
+import json
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+
+from src import settings
+
+MODES = ("copy", "shared")
+
+
+def memory_usage():
+    """
+    Memory of this process from /proc/self/smaps_rollup, in MB.
+
+    ``pss`` charges each shared page to the processes mapping it in equal
+    parts, so summing it over processes gives their true combined footprint;
+    ``anonymous`` is memory private to the process (heap, NumPy arrays),
+    the part that a memory-mapped dataset does not share.
+
+    Returns:
+        dict: rss, pss and anonymous in MB (empty where /proc is unavailable).
+    """
+    fields = {'Rss': 'rss', 'Pss': 'pss', 'Anonymous': 'anonymous'}
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as fh:
+            for line in fh:
+                name, _, value = line.partition(':')
+                if name in fields:
+                    usage[fields[name]] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return usage
+
+
+def _session(store, rng, selections):
+    """What a dashboard session does: filter, roll up KPIs and read the chatbot context."""
+    engine = store.engine
+    min_date, max_date = (pd.Timestamp(d) for d in engine.date_range())
+    span = max((max_date - min_date).days, 1)
+    for _ in range(selections):
+        start = min_date + pd.Timedelta(days=int(rng.integers(span)))
+        end = start + pd.Timedelta(days=int(rng.integers(7, 180)))
+        filters = {
+            'sectors': list(rng.choice(engine.values('sector'), 2, replace=False)),
+            'sentiments': list(rng.choice(engine.values('sentiment'), 2, replace=False)),
+        }
+        selection = store.select(start, end, **filters)
+        store.rollup(start, end, by=('sector',), **filters)
+        selection.frame[['date', 'headline', 'summary', 'sector', 'sentiment']].head(8).to_string()
+
+
+def _load_store(mode, csv_path, cache_dir):
+    from src.dashboard_store import DashboardStore
+    from src.data_store import load_dataset, open_shared_dataset
+
+    df = open_shared_dataset(csv_path, cache_dir) if mode == 'shared' else load_dataset(csv_path, cache_dir)
+    return DashboardStore(df)
+
+
+def _process_worker(mode, csv_path, cache_dir, selections, seed, barrier, results):
+    import src.dashboard_store  # noqa: F401  (imports count towards the idle baseline)
+
+    idle = memory_usage()
+    store = _load_store(mode, csv_path, cache_dir)
+    _session(store, np.random.default_rng(seed), selections)
+    # Measure once every worker holds its store, so shared pages are counted as shared.
+    barrier.wait()
+    results.put((idle, memory_usage()))
+    barrier.wait()
+
+
+def _session_worker(mode, csv_path, cache_dir, session_counts, selections, results):
+    store = _load_store(mode, csv_path, cache_dir)
+    usages = {0: memory_usage()}
+    for session in range(max(session_counts)):
+        _session(store, np.random.default_rng(session), selections)
+        if session + 1 in session_counts:
+            usages[session + 1] = memory_usage()
+    results.put(usages)
+
+
+def measure_processes(mode, processes, csv_path=None, cache_dir=None, selections=20):
+    """
+    Start ``processes`` workers that each serve the dashboard store and run
+    ``selections`` random filters, then read their memory while all are alive.
+
+    Args:
+        mode (str): 'copy' (each process loads its own frame) or 'shared'
+            (each process maps the shared Arrow file).
+        processes (int): Number of worker processes.
+        csv_path (str): Dataset CSV. Defaults to settings.DATA_PATH.
+        cache_dir (str): Cache directory. Defaults to settings.CACHE_DIR.
+        selections (int): Filters run per worker.
+
+    Returns:
+        dict: Combined PSS, mean per-process RSS/PSS/anonymous memory and the
+        anonymous memory above an idle interpreter with the same imports (MB).
+    """
+    csv_path = csv_path or settings.DATA_PATH
+    cache_dir = cache_dir or settings.CACHE_DIR
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [
+        context.Process(target=_process_worker, args=(mode, csv_path, cache_dir, selections, i, barrier, results))
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    measured = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    usages = [usage for _, usage in measured]
+    return {
+        'mode': mode,
+        'processes': processes,
+        'total_pss_mb': sum(usage.get('pss', 0.0) for usage in usages),
+        **{f'{name}_mb': float(np.mean([usage.get(name, 0.0) for usage in usages]))
+           for name in ('rss', 'pss', 'anonymous')},
+        'above_idle_mb': float(np.mean([usage.get('anonymous', 0.0) - idle.get('anonymous', 0.0)
+                                        for idle, usage in measured])),
+    }
+
+
+def measure_sessions(mode, session_counts, csv_path=None, cache_dir=None, selections=20):
+    """
+    Memory of one dashboard process as sessions are added. Sessions share
+    the process's store (as Streamlit sessions share ``st.cache_resource``);
+    each runs ``selections`` filters of its own.
+
+    Returns:
+        list[dict]: Anonymous memory and PSS after 0 and each of ``session_counts`` sessions (MB).
+    """
+    csv_path = csv_path or settings.DATA_PATH
+    cache_dir = cache_dir or settings.CACHE_DIR
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    worker = context.Process(target=_session_worker,
+                             args=(mode, csv_path, cache_dir, sorted(session_counts), selections, results))
+    worker.start()
+    usages = results.get()
+    worker.join()
+    return [
+        {'mode': mode, 'sessions': count, 'anonymous_mb': usage.get('anonymous', 0.0), 'pss_mb': usage.get('pss', 0.0)}
+        for count, usage in sorted(usages.items())
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Memory of N dashboard worker processes: private frame copies vs the shared mapped dataset.")
+    parser.add_argument("--csv", default=settings.DATA_PATH, help="dataset CSV")
+    parser.add_argument("--cache-dir", default=settings.CACHE_DIR, help="cache directory")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8], help="worker counts to measure")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="session counts to measure inside one process")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--selections", type=int, default=20, help="random filters run per worker")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    from src.data_store import load_dataset, publish_shared_dataset
+
+    # Build the columnar cache and the shared file up front so workers only read them.
+    rows = len(load_dataset(args.csv, args.cache_dir))
+    publish_shared_dataset(args.csv, args.cache_dir)
+    print(f"📄 {rows:,} rows")
+
+    results = {'processes': [], 'sessions': []}
+    for mode in args.modes:
+        baseline = None
+        for processes in args.processes:
+            row = measure_processes(mode, processes, args.csv, args.cache_dir, args.selections)
+            if baseline is None:
+                baseline = row
+            elif processes > baseline['processes']:
+                row['added_per_process_mb'] = ((row['total_pss_mb'] - baseline['total_pss_mb'])
+                                               / (processes - baseline['processes']))
+            results['processes'].append(row)
+            added = row.get('added_per_process_mb')
+            print(f"{mode:<6} processes={processes:<3} total PSS={row['total_pss_mb']:8.1f}MB "
+                  f"per process: PSS={row['pss_mb']:7.1f}MB private={row['anonymous_mb']:7.1f}MB "
+                  f"(+{row['above_idle_mb']:.1f}MB over idle)"
+                  + (f" | +{added:.1f}MB per added process" if added is not None else ""))
+    for mode in args.modes:
+        rows = measure_sessions(mode, args.sessions, args.csv, args.cache_dir, args.selections)
+        results['sessions'].extend(rows)
+        loaded = rows[0]['anonymous_mb']
+        print(f"{mode:<6} one process, private memory by sessions: " + ", ".join(
+            f"{row['sessions']}: {row['anonymous_mb']:.1f}MB" + (f" (+{row['anonymous_mb'] - loaded:.1f})" if row['sessions'] else "")
+            for row in rows))
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
@@ -0,0 +1,291 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.trend_rollup import sentiment_indicators
+
+MOMENTUM_LEVELS = ('company', 'sector')
+# Trailing windows in calendar days: "short" is the recent signal, "long" its baseline.
+SHORT_WINDOW = 7
+LONG_WINDOW = 30
+# Columns the engine reads, e.g. for a load that only feeds momentum.
+MOMENTUM_COLUMNS = ['date', 'sector', 'company', 'sentiment', 'price_change', 'trading_volume_crore']
+# Sums kept per (entity, day); every metric is derived from them.
+DAILY_SUMS = ['rows', 'positive', 'negative', 'price_change_sum', 'price_change_count', 'volume']
+
+
+def _metric_columns(short, long):
+    return [
+        f'news_{short}d', f'news_{long}d',
+        f'sentiment_balance_{short}d', f'sentiment_balance_{long}d',
+        f'price_change_{short}d', f'price_change_{long}d', 'cumulative_price_change',
+        'volume_zscore', 'momentum',
+    ]
+
+
+def _rolling_sum(values, window):
+    """Trailing ``window``-day sums along the day axis: one cumsum and one shifted difference."""
+    totals = np.cumsum(values, axis=1)
+    result = totals.copy()
+    result[:, window:] -= totals[:, :-window]
+    return result
+
+
+class _DailyGrid:
+    """Dense (entity, day) sums for one level, extended in place of being rebuilt."""
+
+    def __init__(self):
+        self.entities = pd.Index([], dtype=object)
+        self.first_day = None
+        self.sums = np.zeros((len(DAILY_SUMS), 0, 0))
+        self.sectors = {}
+
+    @property
+    def days(self):
+        return self.sums.shape[2]
+
+    def dates(self):
+        return self.first_day + np.arange(self.days).astype('timedelta64[D]')
+
+    def extend(self, day):
+        """Pad the grid with days without news through ``day`` (datetime64[D])."""
+        if self.first_day is None:
+            return
+        after = int((day - self.first_day).astype(np.int64)) + 1 - self.days
+        if after > 0:
+            self.sums = np.pad(self.sums, ((0, 0), (0, 0), (0, after)))
+
+    def add(self, entities, sectors, days, measures):
+        """
+        Fold rows into the grid; cost is proportional to the rows plus the grid size.
+
+        Args:
+            entities (pd.Series): Entity name per row (missing entries are skipped).
+            sectors (pd.Series): Sector per row, recorded as the entity's sectors.
+            days (np.ndarray): datetime64[D] per row.
+            measures (dict): DAILY_SUMS name -> per-row weights.
+        """
+        codes, uniques = pd.factorize(entities)
+        if len(uniques) == 0:
+            return
+        present = codes >= 0
+        new = pd.Index(uniques).difference(self.entities, sort=False)
+        sums = self.sums
+        if len(new):
+            self.entities = self.entities.append(pd.Index(new, dtype=object))
+            sums = np.concatenate([sums, np.zeros((len(DAILY_SUMS), len(new), self.days))], axis=1)
+
+        first, last = days[present].min(), days[present].max()
+        if self.first_day is None:
+            self.first_day = first
+        before = max(int((self.first_day - first).astype(np.int64)), 0)
+        after = max(int((last - self.first_day).astype(np.int64)) + 1 - sums.shape[2], 0)
+        if before or after:
+            sums = np.pad(sums, ((0, 0), (0, 0), (before, after)))
+            self.first_day = self.first_day - np.timedelta64(before, 'D')
+
+        rows = self.entities.get_indexer(uniques)[codes[present]]
+        offsets = (days[present] - self.first_day).astype(np.int64)
+        cells = rows * sums.shape[2] + offsets
+        size = sums.shape[1] * sums.shape[2]
+        partial = np.stack([
+            np.bincount(cells, weights=measures[name][present], minlength=size) for name in DAILY_SUMS
+        ]).reshape(sums.shape)
+        # A new array rather than an in-place add, so readers never see half an update.
+        self.sums = sums + partial
+
+        # Factorized codes keep this O(rows) on integers, not strings (categoricals are not re-hashed).
+        sector_codes, sector_names = pd.factorize(sectors)
+        pairs = np.unique(codes[present].astype(np.int64) * (len(sector_names) + 1) + sector_codes[present] + 1)
+        for pair in pairs:
+            entity, sector = divmod(int(pair), len(sector_names) + 1)
+            if sector:
+                self.sectors.setdefault(uniques[entity], set()).add(str(sector_names[sector - 1]))
+
+
+class MomentumEngine:
+    """
+    Rolling sentiment, price and volume analytics per company and per sector.
+
+    Rows are summed once into dense (entity, calendar day) grids with
+    bincount; every trailing-window metric is then a cumulative sum and one
+    shifted difference along the day axis, so a full recompute is O(entities
+    x days) and never touches the raw rows again. New rows are folded into
+    the grids (appended days and entities included) and the metrics are
+    recomputed lazily on the next read.
+
+    Metrics, per entity and day, over trailing ``short``/``long``-day windows:
+
+    - ``news_<w>d``: news rows in the window;
+    - ``sentiment_balance_<w>d``: (positive - negative) / rows in the window;
+    - ``price_change_<w>d``: the day's mean price change compounded over the
+      window, in %; ``cumulative_price_change`` compounds from the first day;
+    - ``volume_zscore``: mean daily volume over the short window against the
+      long window's daily mean and standard deviation;
+    - ``momentum``: short minus long sentiment balance (how fast sentiment is
+      improving); rankings sort by it, then by the short-window price change.
+
+    Args:
+        df (pd.DataFrame): Initial rows with date, sector, company, sentiment,
+            price_change and trading_volume_crore (optional).
+        windows (tuple): (short, long) window lengths in days.
+    """
+
+    def __init__(self, df=None, windows=(SHORT_WINDOW, LONG_WINDOW)):
+        self.short_window, self.long_window = windows
+        self.columns = _metric_columns(*windows)
+        self._grids = {level: _DailyGrid() for level in MOMENTUM_LEVELS}
+        self._metrics = {}
+        self._lock = threading.Lock()
+        if df is not None:
+            self.append(df)
+
+    def append(self, df):
+        """
+        Fold new rows into the daily grids.
+
+        Args:
+            df (pd.DataFrame): Newly appended rows.
+        """
+        df = df[df['date'].notna()]
+        if len(df) == 0:
+            return
+        days = df['date'].to_numpy(dtype='datetime64[D]')
+        positive, negative = sentiment_indicators(df)
+        price = df['price_change'].to_numpy(dtype='float64')
+        volume = df['trading_volume_crore'].to_numpy(dtype='float64')
+        measures = {
+            'rows': np.ones(len(df)),
+            'positive': positive.astype(np.float64),
+            'negative': negative.astype(np.float64),
+            'price_change_sum': np.nan_to_num(price),
+            'price_change_count': (~np.isnan(price)).astype(np.float64),
+            'volume': np.nan_to_num(volume),
+        }
+        with self._lock:
+            for level, grid in self._grids.items():
+                if level in df:
+                    grid.add(df[level], df['sector'], days, measures)
+            self._metrics.clear()
+
+    def extend_to(self, date):
+        """
+        Run the grids through ``date`` with days without news, as they would if
+        later rows were loaded (e.g. for rows cut at the end of a date range).
+
+        Args:
+            date: Last day the grids cover.
+        """
+        day = np.datetime64(pd.Timestamp(date), 'D')
+        with self._lock:
+            for grid in self._grids.values():
+                grid.extend(day)
+            self._metrics.clear()
+
+    def _compute(self, level):
+        """Metric arrays (entity x day) for ``level``, cached until the next append."""
+        with self._lock:
+            cached = self._metrics.get(level)
+            if cached is not None:
+                return cached
+            grid = self._grids[level]
+            sums = dict(zip(DAILY_SUMS, grid.sums))
+            short, long = self.short_window, self.long_window
+            metrics = {}
+            with np.errstate(invalid='ignore', divide='ignore'):
+                daily_price = np.where(sums['price_change_count'] > 0,
+                                       sums['price_change_sum'] / sums['price_change_count'], 0.0)
+                log_returns = np.log1p(np.clip(daily_price, -99.0, None) / 100)
+                for window in (short, long):
+                    news = _rolling_sum(sums['rows'], window)
+                    balance = _rolling_sum(sums['positive'] - sums['negative'], window) / news
+                    metrics[f'news_{window}d'] = news
+                    metrics[f'sentiment_balance_{window}d'] = np.where(news > 0, balance, np.nan)
+                    metrics[f'price_change_{window}d'] = np.expm1(_rolling_sum(log_returns, window)) * 100
+                metrics['cumulative_price_change'] = np.expm1(np.cumsum(log_returns, axis=1)) * 100
+                short_mean = _rolling_sum(sums['volume'], short) / short
+                long_mean = _rolling_sum(sums['volume'], long) / long
+                long_var = _rolling_sum(sums['volume'] ** 2, long) / long - long_mean ** 2
+                std = np.sqrt(np.clip(long_var, 0, None))
+                # Days without news in the long window leave only rounding noise in the variance.
+                spread = (std > 1e-9) & (metrics[f'news_{long}d'] > 0)
+                metrics['volume_zscore'] = np.where(spread, (short_mean - long_mean) / std, np.nan)
+                metrics['momentum'] = metrics[f'sentiment_balance_{short}d'] - metrics[f'sentiment_balance_{long}d']
+            cached = (grid.entities, grid.dates() if grid.days else np.array([], dtype='datetime64[D]'),
+                      metrics, dict(grid.sectors))
+            self._metrics[level] = cached
+            return cached
+
+    def entities(self, level, sectors=None):
+        """Entities of ``level`` (companies belonging to one of ``sectors`` when given)."""
+        names, _, _, entity_sectors = self._compute(level)
+        if sectors is None:
+            return list(names)
+        wanted = {str(sector) for sector in sectors}
+        return [name for name in names if entity_sectors.get(name, set()) & wanted]
+
+    def _rows(self, level, sectors):
+        names, _, _, _ = self._compute(level)
+        if sectors is None:
+            return np.arange(len(names))
+        return names.get_indexer(self.entities(level, sectors))
+
+    def series(self, level, start_date=None, end_date=None, sectors=None):
+        """
+        Daily metrics per entity over an inclusive date range.
+
+        Args:
+            level (str): 'company' or 'sector'.
+            start_date: First day (None = first day with data).
+            end_date: Last day (None = last day with data).
+            sectors (list): Restrict to these sectors (companies by their sectors), or None for all.
+
+        Returns:
+            pd.DataFrame: ``level``, date and the metric columns, sorted by entity then date.
+        """
+        names, dates, metrics, _ = self._compute(level)
+        rows = self._rows(level, sectors)
+        lo = 0 if start_date is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date), 'D'))
+        hi = len(dates) if end_date is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date), 'D'),
+                                                                   side='right')
+        hi = max(hi, lo)
+        frame = {
+            level: np.repeat(names.to_numpy(dtype=object)[rows], hi - lo),
+            'date': pd.to_datetime(np.tile(dates[lo:hi], len(rows))).as_unit('ns'),
+        }
+        for column in self.columns:
+            frame[column] = metrics[column][rows, lo:hi].ravel()
+        return pd.DataFrame(frame)
+
+    def ranking(self, level, date=None, sectors=None):
+        """
+        Entities ranked by momentum as of ``date`` (the trailing windows end that day).
+
+        Args:
+            level (str): 'company' or 'sector'.
+            date: Day to rank on, clipped to the data (None = last day with data).
+            sectors (list): Restrict to these sectors, or None for all.
+
+        Returns:
+            pd.DataFrame: Metric columns plus ``sectors``, ``rank`` (1 = strongest;
+            missing for entities without news in the short window) and the ranking
+            ``date``, indexed by entity.
+        """
+        names, dates, metrics, entity_sectors = self._compute(level)
+        rows = self._rows(level, sectors)
+        if len(dates) == 0:
+            return pd.DataFrame(columns=self.columns + ['sectors', 'rank', 'date'], index=pd.Index([], name=level))
+        day = len(dates) - 1 if date is None else np.searchsorted(
+            dates, np.datetime64(pd.Timestamp(date), 'D'), side='right') - 1
+        day = min(max(day, 0), len(dates) - 1)
+        frame = pd.DataFrame({column: metrics[column][rows, day] for column in self.columns},
+                             index=pd.Index(names.take(rows), name=level))
+        frame['sectors'] = [', '.join(sorted(entity_sectors.get(name, ()))) for name in frame.index]
+        frame = frame.sort_values(['momentum', f'price_change_{self.short_window}d'], ascending=False,
+                                  na_position='last', kind='stable')
+        ranked = frame['momentum'].notna().to_numpy()
+        frame['rank'] = pd.Series(pd.NA, index=frame.index, dtype='Int64')
+        frame.loc[ranked, 'rank'] = np.arange(1, ranked.sum() + 1)
+        frame['date'] = pd.Timestamp(dates[day]).as_unit('ns')
+        return frame
@@ -0,0 +1,361 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import settings
+from src.instrumentation import span
+
+# Signature value of a document without tokens; such documents are never clustered.
+EMPTY = np.iinfo(np.uint32).max
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+# Word separator: the lexical index's tokens, "L&T" included.
+_SEPARATOR = r"[^a-z0-9&]+"
+
+
+def near_duplicate_text(df):
+    """Headline and summary of every row: the text compared for near-duplicates."""
+    return df['headline'].astype(str) + " " + df['summary'].astype(str)
+
+
+def _shingle_hashes(texts, shingle_size):
+    """
+    64-bit hashes of every word ``shingle_size``-gram, in document order.
+
+    Lower-casing, splitting and hashing run in Arrow and pandas kernels:
+    each distinct word is hashed once (dictionary encoding) and shingles are
+    combined with shifted array arithmetic, so there is no per-token Python work.
+
+    Returns:
+        tuple: (hashes uint64 array, document index of every hash).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    words = pc.split_pattern_regex(pc.utf8_lower(pa.array(texts, pa.large_string())), _SEPARATOR)
+    flat = pc.list_flatten(words)
+    present = pc.not_equal(flat, "")
+    docs = pc.list_parent_indices(words).filter(present).to_numpy()
+    encoded = pc.dictionary_encode(flat.filter(present))
+    if len(encoded) == 0:
+        return np.zeros(0, dtype=np.uint64), docs.astype(np.int64)
+    hashes = pd.util.hash_array(encoded.dictionary.to_numpy(zero_copy_only=False))[encoded.indices.to_numpy()]
+    docs = docs.astype(np.int64)
+    if shingle_size <= 1:
+        return hashes, docs
+    counts = np.bincount(docs, minlength=len(texts))
+    # Documents shorter than a shingle keep their word hashes.
+    valid = counts[docs] < shingle_size
+    combined = hashes.copy()
+    last = len(hashes) - shingle_size + 1
+    if last > 0:
+        window = np.ones(last, dtype=bool)
+        for offset in range(1, shingle_size):
+            combined[:last] = combined[:last] * _GOLDEN + hashes[offset:offset + last]
+            window &= docs[offset:offset + last] == docs[:last]
+        valid[:last] |= window
+    return combined[valid], docs[valid]
+
+
+def minhash_signatures(texts, num_perm=None, shingle_size=None, seed=0, chunk_rows=50_000):
+    """
+    MinHash signature of every text over its word shingles.
+
+    Permutations are multiply-shift hashes of the 64-bit shingle hashes
+    (``(a * x + b) >> 32``, odd ``a``), and each document's minimum is taken
+    with one ``np.minimum.reduceat`` per permutation, in chunks of
+    ``chunk_rows`` documents to bound memory. The fraction of equal
+    signature positions of two documents estimates the Jaccard similarity
+    of their shingle sets.
+
+    Args:
+        texts (list[str]): Documents.
+        num_perm (int): Signature length. Defaults to settings.DEDUPE_PERMUTATIONS.
+        shingle_size (int): Words per shingle. Defaults to settings.DEDUPE_SHINGLE_SIZE.
+        seed (int): Seed of the permutation family.
+        chunk_rows (int): Documents hashed per chunk.
+
+    Returns:
+        np.ndarray: uint32 array (len(texts), num_perm); documents without
+        tokens are all EMPTY.
+    """
+    num_perm = num_perm or settings.DEDUPE_PERMUTATIONS
+    shingle_size = shingle_size or settings.DEDUPE_SHINGLE_SIZE
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+    texts = list(texts)
+    signatures = np.full((len(texts), num_perm), EMPTY, dtype=np.uint32)
+    for start in range(0, len(texts), chunk_rows):
+        hashes, docs = _shingle_hashes(texts[start:start + chunk_rows], shingle_size)
+        if len(hashes) == 0:
+            continue
+        starts = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+        rows = start + docs[starts]
+        for i in range(num_perm):
+            # The shift is monotonic, so it is applied to the minima only.
+            minima = np.minimum.reduceat(hashes * a[i] + b[i], starts)
+            signatures[rows, i] = (minima >> np.uint64(32)).astype(np.uint32)
+    return signatures
+
+
+def _band_keys(signatures, band):
+    """One 64-bit key per document for the signature columns in ``band``."""
+    keys = np.zeros(len(signatures), dtype=np.uint64)
+    for column in band:
+        keys = keys * _GOLDEN + signatures[:, column].astype(np.uint64)
+    return keys
+
+
+def lsh_bands(threshold, num_perm, recall=0.99):
+    """
+    Fewest LSH bands (so the fewest candidate pairs) for which a pair at
+    exactly ``threshold`` similarity shares a bucket with probability
+    ``recall``: 1 - (1 - threshold ** rows) ** bands.
+    """
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands
+    return num_perm
+
+
+def candidate_pairs(signatures, bands=None, threshold=None):
+    """
+    Near-duplicate pairs found by LSH banding, verified on the signatures.
+
+    The signature is cut into ``bands`` bands; documents whose band values
+    are all equal share a bucket. Within a bucket every document is paired
+    with the bucket's first one only, so a band costs one sort and at most
+    n - 1 pairs however large the buckets are (no all-pairs comparison).
+    A pair is kept when its estimated Jaccard similarity reaches
+    ``threshold``; transitive matches are recovered by cluster_labels.
+
+    Args:
+        signatures (np.ndarray): From minhash_signatures.
+        bands (int): LSH bands. Defaults to settings.DEDUPE_BANDS, or
+            lsh_bands(threshold) when that is 0.
+        threshold (float): Minimum estimated Jaccard similarity. Defaults to settings.DEDUPE_THRESHOLD.
+
+    Returns:
+        tuple: (left, right) int64 arrays of document indexes, left < right.
+    """
+    threshold = settings.DEDUPE_THRESHOLD if threshold is None else threshold
+    bands = bands or settings.DEDUPE_BANDS or lsh_bands(threshold, signatures.shape[1])
+    candidates = np.flatnonzero(signatures[:, 0] != EMPTY)
+    if len(candidates) < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    present = signatures[candidates]
+    pair_keys = []
+    for band in np.array_split(np.arange(signatures.shape[1]), bands):
+        keys = _band_keys(present, band)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        first = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        heads = order[np.maximum.accumulate(np.where(first, np.arange(len(order)), 0))]
+        # Stable sort: the head is the bucket's smallest index, so head < member.
+        pair_keys.append(heads[~first] * len(candidates) + order[~first])
+    pair_keys = np.sort(np.concatenate(pair_keys))
+    pair_keys = pair_keys[np.diff(pair_keys, prepend=-1) != 0]
+    left, right = np.divmod(pair_keys, len(candidates))
+    similarity = np.empty(len(left))
+    for offset in range(0, len(left), 100_000):
+        chunk = slice(offset, offset + 100_000)
+        similarity[chunk] = (present[left[chunk]] == present[right[chunk]]).mean(axis=1)
+    keep = similarity >= threshold
+    return candidates[left[keep]], candidates[right[keep]]
+
+
+def cluster_labels(size, left, right):
+    """
+    Connected components of the pair graph by vectorized min-label
+    propagation with pointer jumping.
+
+    Returns:
+        np.ndarray: Per document, the smallest index in its component
+        (the cluster representative).
+    """
+    labels = np.arange(size, dtype=np.int64)
+    while len(left):
+        low = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        # Hook both endpoints and their current labels, then jump to the roots.
+        for nodes in (left, right, labels[left], labels[right]):
+            np.minimum.at(updated, nodes, low)
+        updated = updated[updated]
+        while not np.array_equal(updated, updated[updated]):
+            updated = updated[updated]
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    return labels
+
+
+def cluster_near_duplicates(texts, threshold=None, num_perm=None, bands=None, shingle_size=None):
+    """
+    Cluster near-duplicate texts with MinHash signatures and LSH banding.
+
+    Cost grows with the number of documents times the signature length,
+    not with the number of document pairs.
+
+    Args:
+        texts (list[str]): Documents, e.g. near_duplicate_text(df).
+        threshold (float): Minimum estimated Jaccard similarity of a pair.
+        num_perm (int): Signature length.
+        bands (int): LSH bands.
+        shingle_size (int): Words per shingle.
+
+    Returns:
+        np.ndarray: Cluster label per text: the position of the cluster's
+        first text (its representative).
+    """
+    with span("dedupe.minhash", rows=len(texts)):
+        signatures = minhash_signatures(texts, num_perm, shingle_size)
+    with span("dedupe.lsh", rows=len(texts)):
+        left, right = candidate_pairs(signatures, bands, threshold)
+        return cluster_labels(len(signatures), left, right)
+
+
+def collapse(df, labels):
+    """
+    One representative row per cluster plus the cluster's aggregates.
+
+    Args:
+        df (pd.DataFrame): Rows; the index holds the dataset row ids.
+        labels (np.ndarray): Per row, the position of its representative (cluster_labels).
+
+    Returns:
+        pd.DataFrame: The representative rows (in ``df`` order) with
+        ``cluster_size``, ``cluster_rows`` (member row ids, representative
+        first), ``first_date`` and ``last_date``.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    representatives = np.flatnonzero(labels == np.arange(len(labels)))
+    result = df.iloc[representatives].copy()
+    sizes = np.bincount(labels, minlength=len(labels))
+    result['cluster_size'] = sizes[representatives]
+    order = np.argsort(labels, kind='stable')
+    row_ids = df.index.to_numpy(dtype=np.int64)[order]
+    bounds = np.cumsum(sizes[representatives])[:-1]
+    result['cluster_rows'] = [members.tolist() for members in np.split(row_ids, bounds)]
+    dates = pd.Series(df['date'].to_numpy(), index=labels)
+    result['first_date'] = dates.groupby(level=0).min().reindex(representatives).to_numpy()
+    result['last_date'] = dates.groupby(level=0).max().reindex(representatives).to_numpy()
+    return result
+
+
+def collapse_near_duplicates(df):
+    """
+    The rows to embed with settings.DEDUPE_INDEX: one representative (its
+    first row) per near-duplicate cluster of ``df``, with its aggregates.
+
+    Returns:
+        tuple: (collapsed rows as returned by collapse, clustering seconds).
+    """
+    start = time.perf_counter()
+    labels = cluster_near_duplicates(near_duplicate_text(df).tolist())
+    with span("dedupe.collapse", rows=len(df)):
+        collapsed = collapse(df, labels)
+    return collapsed, time.perf_counter() - start
+
+
+def describe_cluster(metadata):
+    """
+    "Similar Reports" line for a representative document's metadata, or
+    None for a document without near-duplicates.
+    """
+    size = metadata.get('cluster_size', 1)
+    if size <= 1:
+        return None
+    return f"Similar Reports: {size} ({metadata.get('first_date')} to {metadata.get('last_date')})"
+
+
+def jaccard_matrix(texts, shingle_size=None):
+    """Exact pairwise Jaccard similarity of a few texts' word shingles (query-time diversification)."""
+    shingle_size = shingle_size or settings.DEDUPE_SHINGLE_SIZE
+    hashes, docs = _shingle_hashes(list(texts), shingle_size)
+    sets = [set(hashes[docs == i].tolist()) for i in range(len(texts))]
+    matrix = np.eye(len(sets))
+    for i in range(len(sets)):
+        for j in range(i + 1, len(sets)):
+            union = len(sets[i] | sets[j])
+            matrix[i, j] = matrix[j, i] = len(sets[i] & sets[j]) / union if union else 0.0
+    return matrix
+
+
+def _directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import tempfile
+
+    from src.create_memory_for_llm import build_vectorstore, content_ids, rows_to_texts, save_vectorstore
+    from src.data_store import load_dataset
+    from src.docstore import resolve_index_dir
+    from src.lexical_index import build_lexical_index
+    from src.retrieval_eval import evaluate, make_questions
+
+    parser = argparse.ArgumentParser(
+        description="Index size, build time and answer diversity with and without near-duplicate collapsing.")
+    parser.add_argument("--csv", default=settings.DATA_PATH, help="dataset CSV to index")
+    parser.add_argument("--rows", type=int, help="only index the first N rows")
+    parser.add_argument("--questions", type=int, default=150, help="number of labelled questions")
+    parser.add_argument("--k", type=int, default=3, help="documents per question")
+    parser.add_argument("--embedder", choices=["hash", "model"], default="model",
+                        help="configured sentence-transformers model or hashing embeddings (fast, for smoke tests)")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    df = load_dataset(args.csv)
+    if args.rows:
+        df = df.head(args.rows)
+    if args.embedder == 'hash':
+        from src.benchmark import HashingEmbeddings
+        embeddings = HashingEmbeddings()
+    else:
+        from src.embedding_cache import get_document_embedder
+        embeddings = get_document_embedder()
+
+    questions = None
+    report = {}
+    for name, dedupe in (('before', False), ('after', True)):
+        print(f"🔗 {name}: {'one document per near-duplicate cluster, MMR retrieval' if dedupe else 'one document per row'}")
+        start = time.perf_counter()
+        indexed, cluster_seconds = collapse_near_duplicates(df) if dedupe else (df, 0.0)
+        vectorstore = build_vectorstore(indexed, embeddings)
+        lexical = build_lexical_index(vectorstore, indexed, content_ids(rows_to_texts(indexed)))
+        build_seconds = time.perf_counter() - start
+        with tempfile.TemporaryDirectory() as tmp:
+            save_vectorstore(vectorstore, os.path.join(tmp, "index"), lexical=lexical)
+            index_bytes = _directory_bytes(resolve_index_dir(os.path.join(tmp, "index")))
+        questions = questions or make_questions(df, lexical, args.questions)
+        results = evaluate(vectorstore, lexical, questions, args.k, diversify=dedupe)
+        hybrid = next(row for row in results if row['method'] == 'hybrid' and row['questions'] == 'all')
+        report[name] = {
+            'documents': len(indexed),
+            'cluster_seconds': cluster_seconds,
+            'build_seconds': build_seconds,
+            'index_mb': index_bytes / 1e6,
+            f'precision@{args.k}': hybrid[f'precision@{args.k}'],
+            'distinct_stories': hybrid['distinct_stories'],
+            'mean_similarity': hybrid['mean_similarity'],
+            'p50_ms': hybrid['p50_ms'],
+            'results': results,
+        }
+
+    print(f"\n📊 {len(df):,} rows, hybrid retrieval, k={args.k}")
+    print(f"{'':<8}{'docs':>10}{'build s':>10}{'index MB':>10}{'precision':>11}{'distinct':>10}{'similarity':>12}{'p50 ms':>9}")
+    for name, row in report.items():
+        print(f"{name:<8}{row['documents']:>10,}{row['build_seconds']:>10.2f}{row['index_mb']:>10.2f}"
+              f"{row[f'precision@{args.k}']:>11.3f}{row['distinct_stories']:>10.3f}{row['mean_similarity']:>12.3f}"
+              f"{row['p50_ms']:>9.2f}")
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'w') as fh:
+            json.dump({'rows': len(df), 'k': args.k, 'threshold': settings.DEDUPE_THRESHOLD, **report}, fh, indent=2)
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from src import resources, settings
+from src.context_builder import estimate_tokens
+from src.load_test import QUESTIONS, filter_pool
+
+MODES = ("legacy", "digest")
+
+
+def legacy_prompt(user_question, filtered_df):
+    """
+    The prompt generate_insight used to send: the analyst instruction, the
+    first eight filtered rows as text and the question in one string, which
+    was also the retrieval query.
+    """
+    from src.llm_helpers import SYSTEM_INSTRUCTION
+
+    context = filtered_df[['date', 'headline', 'summary', 'sector', 'sentiment']].head(8).to_string(index=False)
+    return f"{SYSTEM_INSTRUCTION}\n\nDATA:\n{context}\n\nQUESTION: {user_question}\nINSIGHT REPORT:"
+
+
+def _ask(mode, user_question, frame, token_budget):
+    from src.custom_mistral_llm import ask_question
+    from src.llm_helpers import build_instructions
+
+    row_ids = frame.index.values
+    if mode == 'legacy':
+        prompt = legacy_prompt(user_question, frame)
+        return estimate_tokens(prompt), lambda: ask_question(prompt, [], row_ids=row_ids)
+    instructions = build_instructions(frame, token_budget)
+    return (estimate_tokens(instructions) + estimate_tokens(user_question),
+            lambda: ask_question(user_question, [], row_ids=row_ids, instructions=instructions))
+
+
+def make_cases(store, count=40, seed=0):
+    """
+    (question, entity, filters) cases over random dashboard filters.
+
+    Questions name a company or sector known to the BM25 index when there is
+    one (``entity`` is then the phrase a relevant source contains), otherwise
+    they are the load generator's generic questions with ``entity`` None.
+    """
+    engine = store.engine
+    min_date, max_date = engine.date_range()
+    meta = {
+        'date_min': str(min_date), 'date_max': str(max_date),
+        'sectors': [str(v) for v in engine.values('sector')],
+        'sentiments': [str(v) for v in engine.values('sentiment')],
+    }
+    pool = filter_pool(meta, size=count, seed=seed)
+    lexical = resources.get_lexical_index()
+    if lexical is not None:
+        from src.retrieval_eval import make_questions
+        labelled = [(question, entity) for question, entity, _ in make_questions(store.df, lexical, count, seed)]
+    else:
+        labelled = [(QUESTIONS[i % len(QUESTIONS)], None) for i in range(count)]
+    return [(question, entity, filters) for (question, entity), filters in zip(labelled, pool)]
+
+
+def evaluate(store, cases, modes=MODES, token_budget=None):
+    """
+    Ask every case in each mode and compare what reaches the model.
+
+    ``legacy`` sends the old single-string prompt through the retrieval
+    chain; ``digest`` sends the question alone to the retriever and the
+    instructions plus the token-budgeted digest to the model.
+
+    Returns:
+        dict: Per mode: estimated and upstream-reported prompt tokens (mean),
+        end-to-end latency percentiles and, for labelled cases, the share of
+        answers whose sources mention the asked-about entity.
+    """
+    gateway = resources.get_llm_gateway()
+    results = {}
+    for mode in modes:
+        estimated, reported, latencies, hits, labelled = [], [], [], 0, 0
+        for question, entity, filters in cases:
+            start = time.perf_counter()
+            frame = store.select(filters['start_date'], filters['end_date'], sectors=filters['sectors'],
+                                 sentiments=filters['sentiments']).frame
+            tokens, call = _ask(mode, question, frame, token_budget)
+            _, sources = call()
+            latencies.append(time.perf_counter() - start)
+            estimated.append(tokens)
+            last = gateway.recent_calls(1)
+            if last and last[-1]['prompt_tokens'] is not None:
+                reported.append(last[-1]['prompt_tokens'])
+            if entity is not None:
+                labelled += 1
+                hits += any(entity.lower() in doc.page_content.lower() for doc in sources)
+        results[mode] = {
+            'questions': len(cases),
+            'estimated_prompt_tokens': float(np.mean(estimated)),
+            'reported_prompt_tokens': float(np.mean(reported)) if reported else None,
+            **{f'p{q}_ms': float(np.percentile(latencies, q)) * 1000 for q in (50, 95)},
+            'source_hit_rate': hits / labelled if labelled else None,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Prompt tokens and end-to-end latency per question: old head(8) prompt vs the statistical digest.")
+    parser.add_argument("--questions", type=int, default=40, help="questions (each with its own random filter)")
+    parser.add_argument("--budget", type=int, default=settings.CONTEXT_TOKEN_BUDGET, help="digest token budget")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--stub", action="store_true", help="answer with the local stub LLM server")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    if args.stub:
+        from src.stub_llm_server import start_stub_server
+
+        _, settings.LLM_BASE_URL = start_stub_server()
+        os.environ.setdefault("HF_TOKEN", "stub")
+        print(f"🧪 Stub LLM at {settings.LLM_BASE_URL}")
+
+    from src.dashboard_store import DashboardStore
+    from src.data_store import open_shared_dataset
+
+    store = DashboardStore(open_shared_dataset(settings.DATA_PATH))
+    cases = make_cases(store, args.questions)
+    results = evaluate(store, cases, args.modes, args.budget)
+    for mode, row in results.items():
+        reported = row['reported_prompt_tokens']
+        hit_rate = row['source_hit_rate']
+        print(f"{mode:<7} prompt ≈{row['estimated_prompt_tokens']:.0f} tokens"
+              + (f" ({reported:.0f} reported)" if reported is not None else "")
+              + f" | latency p50={row['p50_ms']:.0f}ms p95={row['p95_ms']:.0f}ms"
+              + (f" | sources mention the entity: {hit_rate:.0%}" if hit_rate is not None else ""))
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'w') as fh:
+            json.dump({'budget': args.budget, 'modes': results}, fh, indent=2)
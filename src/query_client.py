@@ -0,0 +1,163 @@
+import json
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+from src import settings
+from src.instrumentation import span
+from src.query_service import frame_from_json
+
+
+def _filter_payload(start_date, end_date, sectors=None, sentiments=None, emotions=None):
+    return {
+        'start': pd.Timestamp(start_date).strftime('%Y-%m-%d'),
+        'end': pd.Timestamp(end_date).strftime('%Y-%m-%d'),
+        'sectors': list(sectors) if sectors is not None else None,
+        'sentiments': list(sentiments) if sentiments is not None else None,
+        'emotions': list(emotions) if emotions is not None else None,
+    }
+
+
+def _document(payload):
+    from langchain_core.documents import Document
+    return Document(page_content=payload['page_content'], metadata=payload['metadata'])
+
+
+class QueryClient:
+    """
+    HTTP/JSON client of the query service (src/query_service.py).
+
+    Args:
+        base_url (str): Service URL. Defaults to settings.QUERY_SERVICE_URL.
+        timeout (float): Socket timeout in seconds. Defaults to settings.LLM_TIMEOUT_SECONDS
+            (answers can take as long as the LLM).
+    """
+
+    def __init__(self, base_url=None, timeout=None):
+        self.base_url = (base_url or settings.QUERY_SERVICE_URL).rstrip('/')
+        self.timeout = timeout or settings.LLM_TIMEOUT_SECONDS
+
+    def _open(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode('utf-8')
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error', str(e))
+            except ValueError:
+                message = str(e)
+            raise ValueError(f"Query service {path}: {message}") from None
+
+    def _request(self, path, payload=None):
+        with span(f"query_service{path}"), self._open(path, payload) as response:
+            return json.loads(response.read())
+
+    def meta(self):
+        return self._request('/meta')
+
+    def stats(self):
+        return self._request('/stats')
+
+    def select(self, start_date, end_date, include_row_ids=False, **filters):
+        """Row count and fingerprint of a filter selection (plus row ids on request)."""
+        payload = _filter_payload(start_date, end_date, **filters)
+        if include_row_ids:
+            payload['include_row_ids'] = True
+        return self._request('/filter', payload)
+
+    def rollup(self, start_date, end_date, by=('sector',), **filters):
+        """Aggregate cube rollup, same frame as DashboardStore.rollup."""
+        payload = dict(_filter_payload(start_date, end_date, **filters), by=list(by))
+        return frame_from_json(self._request('/kpis', payload)['frame'])
+
+    def series(self, view, start_date, end_date, max_points=None, **filters):
+        """Chart series for one view: 'price', 'volume', 'sentiment' or 'emotion'."""
+        payload = dict(_filter_payload(start_date, end_date, **filters), view=view)
+        if max_points is not None:
+            payload['max_points'] = max_points
+        return frame_from_json(self._request('/series', payload)['frame'])
+
+    def momentum(self, level, start_date, end_date, sectors=None, latest=False):
+        """Rolling momentum series (or the ranking on ``end_date``), same frame as DashboardStore.momentum."""
+        payload = dict(_filter_payload(start_date, end_date, sectors=sectors), level=level, latest=latest)
+        return frame_from_json(self._request('/momentum', payload)['frame'])
+
+    def company_news(self, company, start_date, end_date, limit=5):
+        """Latest rows naming ``company``, same frame as DashboardStore.company_news."""
+        payload = dict(_filter_payload(start_date, end_date), company=company, limit=limit)
+        return frame_from_json(self._request('/company', payload)['frame'])
+
+    def ask(self, question, start_date, end_date, **filters):
+        """
+        Analyst AI answer for the filtered rows.
+
+        Returns:
+            tuple: (answer, source documents).
+        """
+        response = self._request('/ask', dict(_filter_payload(start_date, end_date, **filters), question=question))
+        return response['answer'], [_document(doc) for doc in response['sources']]
+
+    def stream(self, question, start_date, end_date, **filters):
+        """
+        Streaming answer: yields ('sources', docs), ('token', text) and
+        ('done', stats) events like llm_helpers.stream_insight. Closing the
+        generator closes the connection, which cancels the upstream request.
+
+        Raises:
+            ValueError: If the service reports an error.
+        """
+        payload = dict(_filter_payload(start_date, end_date, **filters), question=question)
+        with self._open('/ask/stream', payload) as response:
+            for line in response:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                kind, data = event['kind'], event['payload']
+                if kind == 'error':
+                    raise ValueError(data)
+                if kind == 'sources':
+                    data = [_document(doc) for doc in data]
+                yield kind, data
+
+
+class RemoteSelection:
+    """Selection stand-in: the row count of a filter evaluated by the service."""
+
+    def __init__(self, response):
+        self.count = response['count']
+        self.fingerprint = response['fingerprint']
+
+    def __len__(self):
+        return self.count
+
+
+class RemoteStore:
+    """
+    DashboardStore stand-in backed by the query service, so the dashboard
+    code paths are the same in thin-client mode.
+
+    Args:
+        client (QueryClient): Service client.
+        meta (dict): Result of client.meta() (read once per script run).
+    """
+
+    def __init__(self, client, meta=None):
+        self.client = client
+        self.meta = meta or client.meta()
+        self.version = self.meta['version']
+        self.signature = tuple(self.meta.get('signature') or ())
+
+    def select(self, start_date, end_date, **filters):
+        return RemoteSelection(self.client.select(start_date, end_date, **filters))
+
+    def rollup(self, start_date, end_date, by=('sector',), **filters):
+        return self.client.rollup(start_date, end_date, by=by, **filters)
+
+    def momentum(self, level, start_date, end_date, sectors=None, latest=False):
+        return self.client.momentum(level, start_date, end_date, sectors=sectors, latest=latest)
+
+    def company_news(self, company, start_date, end_date, limit=5):
+        return self.client.company_news(company, start_date, end_date, limit)
@@ -0,0 +1,396 @@
+"""
+Headless analytics service shared by every dashboard session.
+
+One process holds the dataset, its filter/aggregate indexes and the LLM
+client; Streamlit sessions (or any other client) query it over HTTP/JSON:
+
+    python -m src.query_service --port 8765
+    FINLYTICS_QUERY_SERVICE_URL=http://127.0.0.1:8765 streamlit run app.py
+
+Endpoints (filters are ``{"start", "end", "sectors", "sentiments", "emotions"}``):
+
+- ``GET /health``, ``GET /meta`` (date range, category values, data version), ``GET /stats``
+  (including live ingestion lag and throughput, see src/ingest.py);
+- ``GET /metrics``: span timings in the Prometheus text format (see src/instrumentation.py);
+- ``POST /filter``: selected row count and fingerprint (row ids on request);
+- ``POST /kpis``: aggregate cube rollup ``by`` any of date/sector/sentiment/emotion;
+- ``POST /series``: chart series for one dashboard view;
+- ``POST /momentum``: rolling company/sector momentum (``level``; ``latest`` for the
+  ranking on the end date, see src/momentum.py);
+- ``POST /company``: latest rows naming one ``company`` in the date range;
+- ``POST /ask`` and ``POST /ask/stream`` (NDJSON events): Analyst AI answers.
+
+Responses to filter/KPI/series requests are cached per (endpoint, request,
+data version), so identical requests from different sessions are answered
+once. Rows committed by live ingestion are picked up before each request.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from src import instrumentation, resources, settings
+from src.momentum import MOMENTUM_LEVELS
+
+SERIES_VIEWS = ('price', 'volume', 'sentiment', 'emotion')
+
+
+def frame_to_json(frame):
+    """DataFrame as {'columns', 'index', 'data'} with ISO dates; named index levels become columns."""
+    index = [name for name in frame.index.names if name is not None]
+    frame = frame.reset_index() if index else frame.reset_index(drop=True)
+    for col in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[col]):
+            frame[col] = frame[col].dt.strftime('%Y-%m-%d')
+    return {
+        'columns': [str(col) for col in frame.columns],
+        'index': index,
+        'data': json.loads(frame.to_json(orient='values')),
+    }
+
+
+def frame_from_json(payload):
+    """Inverse of frame_to_json: dates parsed, index levels restored."""
+    frame = pd.DataFrame(payload['data'], columns=payload['columns'])
+    if 'date' in frame:
+        frame['date'] = pd.to_datetime(frame['date'])
+    if payload.get('index'):
+        frame = frame.set_index(payload['index'])
+    return frame
+
+
+def _doc_to_json(doc):
+    return {'page_content': doc.page_content, 'metadata': dict(doc.metadata)}
+
+
+class ResponseCache:
+    """LRU of serialized responses keyed by (endpoint, canonical request, data version)."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or settings.QUERY_CACHE_ENTRIES
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._items[key] = body
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._items), 'hits': self.hits, 'misses': self.misses}
+
+
+class QueryService:
+    """
+    Transport-independent request handlers over one shared DashboardStore.
+
+    Args:
+        store (DashboardStore): Shared store; built from settings.DATA_PATH when omitted.
+        cache (ResponseCache): Request-level cache.
+    """
+
+    def __init__(self, store=None, cache=None):
+        if store is None:
+            from src.dashboard_store import DashboardStore
+            from src.data_store import load_dataset, open_shared_dataset, source_signature
+            signature = source_signature(settings.DATA_PATH)
+            store = DashboardStore(open_shared_dataset() if settings.SHARED_DATASET else load_dataset(), signature)
+        self.store = store
+        self.cache = cache or ResponseCache()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def record(self, endpoint, seconds, cached=False):
+        with self._stats_lock:
+            entry = self._stats.setdefault(endpoint, {'requests': 0, 'cached': 0, 'seconds': 0.0})
+            entry['requests'] += 1
+            entry['cached'] += int(cached)
+            entry['seconds'] += seconds
+
+    def refresh(self):
+        """Append rows committed by live ingestion since the last request (bumps the data version)."""
+        from src.ingest import catch_up
+
+        catch_up(self.store)
+
+    def _filter_args(self, params):
+        min_date, max_date = self.store.engine.date_range()
+        start = pd.Timestamp(params.get('start') or min_date).date()
+        end = pd.Timestamp(params.get('end') or max_date).date()
+        filters = {name: params.get(name) for name in ('sectors', 'sentiments', 'emotions')}
+        return start, end, filters
+
+    def cache_key(self, endpoint, params):
+        canonical = json.dumps(params, sort_keys=True, default=str)
+        return endpoint, canonical, self.store.version
+
+    def meta(self, params=None):
+        engine = self.store.engine
+        min_date, max_date = engine.date_range()
+        return {
+            'rows': len(engine),
+            'version': self.store.version,
+            'signature': list(self.store.signature) if self.store.signature is not None else None,
+            'date_min': pd.Timestamp(min_date).strftime('%Y-%m-%d'),
+            'date_max': pd.Timestamp(max_date).strftime('%Y-%m-%d'),
+            'sectors': [str(v) for v in engine.values('sector')],
+            'sentiments': [str(v) for v in engine.values('sentiment')],
+            'emotions': [str(v) for v in engine.values('emotion')],
+        }
+
+    def filter(self, params):
+        start, end, filters = self._filter_args(params)
+        selection = self.store.select(start, end, **filters)
+        row_ids = np.sort(np.asarray(selection.row_ids, dtype=np.int64))
+        response = {
+            'count': len(selection),
+            'fingerprint': hashlib.sha1(row_ids.tobytes()).hexdigest(),
+        }
+        if params.get('include_row_ids'):
+            response['row_ids'] = row_ids.tolist()
+        return response
+
+    def kpis(self, params):
+        start, end, filters = self._filter_args(params)
+        by = tuple(params.get('by') or ())
+        return {'by': list(by), 'frame': frame_to_json(self.store.rollup(start, end, by=by, **filters))}
+
+    def series(self, params):
+        from src.charts import emotion_series, price_series
+
+        start, end, filters = self._filter_args(params)
+        view = params.get('view')
+        max_points = params.get('max_points', settings.CHART_MAX_POINTS)
+
+        def rollup(*by):
+            return self.store.rollup(start, end, by=by, **filters)
+
+        if view == 'price':
+            frame = price_series(rollup, max_points)
+        elif view == 'emotion':
+            frame = emotion_series(rollup, max_points)
+        elif view == 'volume':
+            frame = rollup('sector')[['trading_volume_crore_sum']]
+        elif view == 'sentiment':
+            frame = rollup('sentiment')[['count']]
+        else:
+            raise ValueError(f"Unknown view '{view}', expected one of {', '.join(SERIES_VIEWS)}")
+        return {'view': view, 'frame': frame_to_json(frame)}
+
+    def momentum(self, params):
+        start, end, filters = self._filter_args(params)
+        level = params.get('level', 'company')
+        if level not in MOMENTUM_LEVELS:
+            raise ValueError(f"Unknown level '{level}', expected one of {', '.join(MOMENTUM_LEVELS)}")
+        frame = self.store.momentum(level, start, end, filters['sectors'], latest=bool(params.get('latest')))
+        return {'level': level, 'frame': frame_to_json(frame)}
+
+    def company(self, params):
+        start, end, _ = self._filter_args(params)
+        frame = self.store.company_news(params['company'], start, end, int(params.get('limit', 5)))
+        return {'company': params['company'], 'frame': frame_to_json(frame)}
+
+    def _selection_frame(self, params):
+        start, end, filters = self._filter_args(params)
+        return self.store.select(start, end, **filters).frame
+
+    def ask(self, params):
+        from src.llm_helpers import generate_insight
+
+        answer, sources = generate_insight(params['question'], self._selection_frame(params), [])
+        return {'answer': answer, 'sources': [_doc_to_json(doc) for doc in sources]}
+
+    def ask_stream(self, params):
+        """Event dicts for /ask/stream: sources, token, done (or error)."""
+        from src.llm_helpers import stream_insight
+
+        events = stream_insight(params['question'], self._selection_frame(params), [])
+        try:
+            for kind, payload in events:
+                if kind == 'sources':
+                    payload = [_doc_to_json(doc) for doc in payload]
+                yield {'kind': kind, 'payload': payload}
+        finally:
+            events.close()
+
+    def stats(self, params=None):
+        from src.answer_cache import get_answer_cache
+        from src.ingest import get_ingest_worker
+
+        worker = get_ingest_worker()
+        with self._stats_lock:
+            endpoints = {name: dict(entry) for name, entry in self._stats.items()}
+        return {
+            'endpoints': endpoints,
+            'response_cache': self.cache.stats(),
+            'answer_cache': get_answer_cache().stats(),
+            'timings': resources.startup_timings(),
+            'llm': resources.get_llm_gateway().stats() if resources.is_loaded('llm_gateway') else None,
+            'ingest': worker.stats() if worker is not None else None,
+        }
+
+
+# Endpoint -> (method, handler name, cache the response).
+ROUTES = {
+    '/health': ('GET', None, False),
+    '/meta': ('GET', 'meta', False),
+    '/stats': ('GET', 'stats', False),
+    '/filter': ('POST', 'filter', True),
+    '/kpis': ('POST', 'kpis', True),
+    '/series': ('POST', 'series', True),
+    '/momentum': ('POST', 'momentum', True),
+    '/company': ('POST', 'company', True),
+    '/ask': ('POST', 'ask', False),
+}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, default=str).encode('utf-8'))
+
+    def _read_params(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _dispatch(self, method):
+        path = self.path.split('?', 1)[0].rstrip('/') or '/'
+        start = time.perf_counter()
+        if method == 'POST' and path == '/ask/stream':
+            try:
+                params = self._read_params()
+            except (KeyError, ValueError, TypeError) as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            self.service.refresh()
+            self._stream(params)
+            self.service.record(path, time.perf_counter() - start)
+            return
+        if method == 'GET' and path == '/metrics':
+            self._send(200, instrumentation.prometheus_text().encode('utf-8'), 'text/plain; version=0.0.4')
+            return
+        self.service.refresh()
+        route = ROUTES.get(path)
+        if route is None or route[0] != method:
+            self._send_json(404, {'error': f'no {method} {path}'})
+            return
+        _, name, cacheable = route
+        if name is None:
+            self._send_json(200, {'status': 'ok', 'version': self.service.store.version})
+            return
+        try:
+            params = self._read_params() if method == 'POST' else {}
+            key = self.service.cache_key(path, params) if cacheable else None
+            body = self.service.cache.get(key) if cacheable else None
+            cached = body is not None
+            if body is None:
+                with instrumentation.span(f"service.{name}"):
+                    body = json.dumps(getattr(self.service, name)(params), default=str).encode('utf-8')
+                if cacheable:
+                    self.service.cache.put(key, body)
+        except (KeyError, ValueError, TypeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:  # keep serving other sessions
+            self._send_json(500, {'error': f'{type(e).__name__}: {e}'})
+            return
+        self._send(200, body)
+        self.service.record(path, time.perf_counter() - start, cached)
+
+    def _stream(self, params):
+        # Newline-delimited JSON events; the response ends when the connection closes.
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        events = self.service.ask_stream(params)
+        try:
+            for event in events:
+                self.wfile.write((json.dumps(event, default=str) + "\n").encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away: closing the generator cancels the LLM request
+        except Exception as e:
+            self.wfile.write((json.dumps({'kind': 'error', 'payload': str(e)}) + "\n").encode('utf-8'))
+        finally:
+            events.close()
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+
+def start_query_service(service=None, host=None, port=None):
+    """
+    Serve ``service`` from a daemon thread.
+
+    Returns:
+        tuple: (server, base_url). Call server.shutdown() to stop it.
+    """
+    service = service or QueryService()
+    host = host or settings.QUERY_SERVICE_HOST
+    port = settings.QUERY_SERVICE_PORT if port is None else port
+    handler = type('BoundQueryHandler', (QueryHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='finlytics-query-service', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the dashboard store and Analyst AI over HTTP/JSON.")
+    parser.add_argument("--host", default=settings.QUERY_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=settings.QUERY_SERVICE_PORT)
+    parser.add_argument("--ingest", action="store_true", default=settings.INGEST,
+                        help="run the live ingestion worker in this process (see src/ingest.py)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    service = QueryService()
+    print(f"📄 Loaded {len(service.store.engine):,} rows in {time.perf_counter() - start:.2f}s")
+    resources.warm_up(background=True)
+    if args.ingest:
+        from src.ingest import start_ingest_worker
+
+        if start_ingest_worker(service.store) is not None:
+            print(f"📥 Ingesting from {', '.join(filter(None, [settings.INGEST_INBOX, settings.INGEST_TAIL_PATH]))}")
+    server, base_url = start_query_service(service, args.host, args.port)
+    print(f"🛰️ Query service listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,162 @@
+import logging
+import os
+import threading
+import time
+
+from src import instrumentation, settings
+
+logger = logging.getLogger(__name__)
+
+_resources = {}
+_locks = {}
+_registry_lock = threading.Lock()
+_timings = {}
+_warm_up_thread = None
+
+
+def _lock_for(name):
+    with _registry_lock:
+        return _locks.setdefault(name, threading.Lock())
+
+
+def _get_or_create(name, factory):
+    """Create a process-wide resource once, timing the load; concurrent callers wait for it."""
+    if name in _resources:
+        return _resources[name]
+    # The span also covers waiting for a load already running in another thread (e.g. warm-up).
+    with instrumentation.span(f"load.{name}"), _lock_for(name):
+        if name not in _resources:
+            start = time.perf_counter()
+            _resources[name] = factory()
+            record_timing(f"load_{name}", time.perf_counter() - start)
+    return _resources[name]
+
+
+def replace(name, value):
+    """Swap a loaded resource for a newer version, e.g. a lexical index extended by live ingestion."""
+    with _lock_for(name):
+        _resources[name] = value
+
+
+def reset(*names):
+    """Drop loaded resources so the next get_* call loads them again, e.g. after the vector store was rebuilt."""
+    for name in names:
+        with _lock_for(name):
+            _resources.pop(name, None)
+
+
+def record_timing(name, seconds):
+    """Record a startup/loading duration in seconds (first value wins)."""
+    if name not in _timings:
+        _timings[name] = seconds
+        logger.info("%s took %.3fs", name, seconds)
+
+
+def startup_timings():
+    """Copy of the recorded timings, e.g. {'load_vectorstore': 1.2, 'first_render': 0.4}."""
+    return dict(_timings)
+
+
+def is_loaded(name):
+    return name in _resources
+
+
+def get_embeddings():
+    """Sentence-transformers embedding model, loaded on first use."""
+    def factory():
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
+    return _get_or_create('embeddings', factory)
+
+
+def get_vectorstore():
+    """
+    FAISS vector store from settings.VECTORSTORE_PATH, opened on first use:
+    memory-mapped vectors plus the SQLite docstore (see src/docstore.py).
+    """
+    def factory():
+        from src.docstore import open_vectorstore
+        return open_vectorstore(settings.VECTORSTORE_PATH, get_embeddings(), mmap=settings.INDEX_MMAP)
+    return _get_or_create('vectorstore', factory)
+
+
+def get_lexical_index():
+    """
+    BM25 index saved next to the vector store (see src/lexical_index.py), or
+    None when hybrid retrieval is disabled, the file is missing or it was
+    built for different documents than the opened store.
+    """
+    def factory():
+        if not settings.HYBRID_RETRIEVAL:
+            return None
+        from src.docstore import resolve_index_dir
+        from src.lexical_index import LEXICAL_FILE, LexicalIndex
+        path = os.path.join(resolve_index_dir(settings.VECTORSTORE_PATH), LEXICAL_FILE)
+        if not os.path.exists(path):
+            logger.info("No %s, using vector-only retrieval", path)
+            return None
+        lexical = LexicalIndex.load(path)
+        if not lexical.matches(get_vectorstore()):
+            logger.warning("%s does not match the vector store, using vector-only retrieval", path)
+            return None
+        return lexical
+    return _get_or_create('lexical_index', factory)
+
+
+def get_llm_gateway():
+    """
+    Process-wide LLM gateway (concurrency limit, request coalescing, retries
+    and call metrics) in front of the Mistral model behind the HuggingFace
+    OpenAI-compatible router. See src/llm_gateway.py.
+
+    Raises:
+        ValueError: If HF_TOKEN is not set.
+    """
+    def factory():
+        hf_token = os.environ.get("HF_TOKEN")
+        if not hf_token:
+            raise ValueError("HF_TOKEN not found in environment variables. Please set it before running.")
+        from src.llm_gateway import LLMGateway, build_chat_client
+        return LLMGateway(build_chat_client(hf_token))
+    return _get_or_create('llm_gateway', factory)
+
+
+def get_llm():
+    """
+    Chat model for LangChain chains; every call goes through the shared LLM gateway.
+
+    Raises:
+        ValueError: If HF_TOKEN is not set.
+    """
+    return _get_or_create('llm', lambda: get_llm_gateway().chat_model())
+
+
+def warm_up(background=True):
+    """
+    Load the embedder, indexes and LLM client ahead of the first question.
+
+    Args:
+        background (bool): Run in a daemon thread (started at most once per process).
+
+    Returns:
+        threading.Thread or None: The warm-up thread when run in the background.
+    """
+    global _warm_up_thread
+
+    def run():
+        start = time.perf_counter()
+        for loader in (get_embeddings, get_vectorstore, get_lexical_index, get_llm):
+            try:
+                loader()
+            except Exception as e:  # a missing token must not break the dashboard
+                logger.warning("Warm-up of %s failed: %s", loader.__name__, e)
+        record_timing("warm_up", time.perf_counter() - start)
+
+    if not background:
+        run()
+        return None
+    with _registry_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=run, name="finlytics-warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
@@ -0,0 +1,363 @@
+import threading
+import weakref
+from typing import Any, List, Optional
+
+import faiss
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src import settings
+from src.instrumentation import span, traced
+from src.lexical_index import reciprocal_rank_fusion
+
+# Selections up to this size are searched exactly over their own vectors;
+# larger ones use a FAISS IDSelector over the full index.
+SUBSET_SEARCH_LIMIT = 50_000
+
+_row_maps = weakref.WeakKeyDictionary()
+_row_maps_lock = threading.Lock()
+
+
+def _row_position_map(vectorstore):
+    """
+    Array mapping dataset row id -> FAISS position (-1 when not indexed),
+    built from the documents' ``row_id`` metadata and cached per index state.
+    Rows collapsed into a near-duplicate cluster map to their representative.
+
+    Returns:
+        tuple: (mapping, whether several rows share a position).
+    """
+    ntotal = vectorstore.index.ntotal
+    state = (ntotal, vectorstore.index_to_docstore_id.get(ntotal - 1))
+    with _row_maps_lock:
+        cached = _row_maps.get(vectorstore)
+        if cached and cached[0] == state:
+            return cached[1:]
+
+    if hasattr(vectorstore.docstore, 'row_positions'):
+        # SQLite docstore: one query instead of loading every document.
+        positions, row_ids = vectorstore.docstore.row_positions()
+    else:
+        pairs = []
+        for position, doc_id in vectorstore.index_to_docstore_id.items():
+            doc = vectorstore.docstore.search(doc_id)
+            if isinstance(doc, Document) and 'row_id' in doc.metadata:
+                pairs += [(position, row_id) for row_id in doc.metadata.get('cluster_rows', [doc.metadata['row_id']])]
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        positions, row_ids = pairs[:, 0], pairs[:, 1]
+    keep = (positions < ntotal) & (row_ids >= 0)
+    positions, row_ids = positions[keep], row_ids[keep]
+    mapping = np.full(int(row_ids.max()) + 1 if len(row_ids) else 0, -1, dtype=np.int64)
+    mapping[row_ids] = positions
+    shared = len(positions) > 0 and np.bincount(positions).max() > 1
+
+    with _row_maps_lock:
+        _row_maps[vectorstore] = (state, mapping, shared)
+    return mapping, shared
+
+
+@traced("retrieval.embed_query")
+def _embed_query(vectorstore, query):
+    vector = np.asarray([vectorstore.embedding_function.embed_query(query)], dtype=np.float32)
+    if getattr(vectorstore, '_normalize_L2', False):
+        faiss.normalize_L2(vector)
+    return vector
+
+
+def _subset_search(index, vector, positions, k):
+    """Exact top-k over the selected vectors only: O(len(positions) * dim)."""
+    vectors = index.reconstruct_batch(positions)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        scores = vectors @ vector[0]
+        order = np.argsort(-scores)[:k] if len(scores) <= k else np.argpartition(-scores, k)[:k]
+        order = order[np.argsort(-scores[order])]
+    else:
+        scores = ((vectors - vector[0]) ** 2).sum(axis=1)
+        order = np.argsort(scores)[:k] if len(scores) <= k else np.argpartition(scores, k)[:k]
+        order = order[np.argsort(scores[order])]
+    return positions[order], scores[order]
+
+
+def _search_parameters(index, selector):
+    """SearchParameters of the right subclass, keeping the index's own nprobe/efSearch."""
+    index = getattr(index, 'base', index)  # docstore.AppendedIndex
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def _selector_search(index, vector, positions, k):
+    """Top-k over the full index restricted to ``positions`` by an IDSelector."""
+    selector = faiss.IDSelectorBatch(positions)
+    params = _search_parameters(index, selector)
+    scores, found = index.search(vector, k, params=params)
+    keep = found[0] >= 0
+    return found[0][keep], scores[0][keep]
+
+
+def _allowed_positions(vectorstore, row_ids):
+    """
+    FAISS positions of the dataset rows in ``row_ids``, or None when
+    everything may be searched (no filter, or an index without row metadata).
+    """
+    if row_ids is None:
+        return None
+    mapping, shared = _row_position_map(vectorstore)
+    if len(mapping) == 0:
+        # Index built without row metadata: filtering is not possible.
+        return None
+    row_ids = np.asarray(row_ids, dtype=np.int64)
+    row_ids = row_ids[(row_ids >= 0) & (row_ids < len(mapping))]
+    positions = mapping[row_ids]
+    positions = positions[positions >= 0]
+    if shared:
+        # Near-duplicate rows selected together share their representative's position.
+        positions = np.sort(positions)
+        positions = positions[np.diff(positions, prepend=-1) != 0]
+    return positions
+
+
+def _vector_positions(vectorstore, query, positions, k):
+    """Top-k FAISS positions for ``query``, restricted to ``positions`` unless None."""
+    index = vectorstore.index
+    vector = _embed_query(vectorstore, query)
+    with span("retrieval.faiss_search", rows=index.ntotal if positions is None else len(positions)):
+        if positions is None:
+            _, found = index.search(vector, k)
+            return found[0][found[0] >= 0]
+        if len(positions) == 0:
+            return positions
+        search, fallback = _subset_search, _selector_search
+        if len(positions) > SUBSET_SEARCH_LIMIT:
+            search, fallback = fallback, search
+        try:
+            found, _ = search(index, vector, positions, k)
+        except RuntimeError:
+            # Index type without reconstruct (IVF without direct map) or selector support.
+            found, _ = fallback(index, vector, positions, k)
+        return found
+
+
+@traced("retrieval.docstore", rows=True)
+def _documents(vectorstore, positions, row_ids=None):
+    docs = []
+    for position in positions:
+        doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(position)])
+        if isinstance(doc, Document):
+            docs.append(doc)
+    return docs if row_ids is None else _within_selection(vectorstore, docs, row_ids)
+
+
+def _within_selection(vectorstore, docs, row_ids):
+    """
+    ``docs`` as seen from the row selection. A near-duplicate representative
+    is reached through any selected row of its cluster, but its own row may
+    have a date or price outside the filter; it is then replaced by its
+    first selected member's document (SQLiteDocstore.member_document), which
+    keeps the cluster metadata. Stores without member documents drop it.
+    """
+    selected = None
+    kept = []
+    for doc in docs:
+        cluster = doc.metadata.get('cluster_rows')
+        if not cluster:
+            kept.append(doc)
+            continue
+        if selected is None:
+            selected = np.unique(np.asarray(row_ids, dtype=np.int64))
+        cluster = np.asarray(cluster, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(selected, cluster), max(len(selected) - 1, 0))
+        members = cluster[selected[pos] == cluster] if len(selected) else cluster[:0]
+        if doc.metadata.get('row_id') in members:
+            kept.append(doc)
+            continue
+        member_document = getattr(vectorstore.docstore, 'member_document', None)
+        member = member_document(members[0]) if len(members) and member_document else None
+        if member is None:
+            continue
+        member.id = doc.id
+        member.metadata.update({key: doc.metadata[key] for key in ('cluster_size', 'cluster_rows', 'first_date',
+                                                                    'last_date') if key in doc.metadata})
+        kept.append(member)
+    return kept
+
+
+def _comparable_text(doc):
+    """Headline and summary of a document (the labelled fields every document shares are left out)."""
+    fields = dict(line.split(": ", 1) for line in doc.page_content.splitlines() if ": " in line)
+    if 'Headline' not in fields:
+        return doc.page_content
+    return f"{fields['Headline']} {fields.get('Summary', '')}"
+
+
+@traced("retrieval.diversify", rows=True)
+def mmr_diversify(docs, k, lambda_mult=None, threshold=None):
+    """
+    Pick ``k`` of the ranked ``docs`` by maximal marginal relevance over
+    near-duplicate clusters.
+
+    Relevance is the candidate's rank (1 for the best, falling linearly) and
+    redundancy its highest word-shingle Jaccard similarity to a document
+    already picked. Candidates at or above the near-duplicate ``threshold``
+    are only used when fewer than ``k`` distinct stories were retrieved, so
+    the answer sees one document per story before it sees repeats.
+
+    Args:
+        docs (list[Document]): Candidates, best first.
+        k (int): Documents to return.
+        lambda_mult (float): Weight of relevance against redundancy. Defaults to settings.MMR_LAMBDA.
+        threshold (float): Similarity treated as the same story. Defaults to settings.DEDUPE_THRESHOLD.
+
+    Returns:
+        list[Document]: ``k`` documents (fewer if fewer were given), best first.
+    """
+    from src.near_duplicates import jaccard_matrix
+
+    if len(docs) <= 1:
+        return docs[:k]
+    lambda_mult = settings.MMR_LAMBDA if lambda_mult is None else lambda_mult
+    threshold = settings.DEDUPE_THRESHOLD if threshold is None else threshold
+    similarity = jaccard_matrix([_comparable_text(doc) for doc in docs])
+    relevance = 1 - np.arange(len(docs)) / len(docs)
+    picked = [0]
+    redundancy = similarity[0].copy()
+    remaining = np.ones(len(docs), dtype=bool)
+    remaining[0] = False
+    while len(picked) < min(k, len(docs)):
+        score = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        score[~remaining] = -np.inf
+        distinct = remaining & (redundancy < threshold)
+        if distinct.any():
+            score[~distinct] = -np.inf
+        best = int(np.argmax(score))
+        picked.append(best)
+        remaining[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return [docs[i] for i in picked]
+
+
+def _fetch_k(k, diversify):
+    return max(settings.DIVERSIFY_FETCH_K, k) if diversify else k
+
+
+@traced("retrieval.vector")
+def filtered_similarity_search(vectorstore, query, row_ids=None, k=3, diversify=None):
+    """
+    Top-k documents for ``query`` among the dataset rows in ``row_ids``.
+
+    The search is restricted before ranking rather than over-fetching and
+    post-filtering: small selections are scored exactly over their own
+    vectors (cost independent of corpus size), large ones go through a FAISS
+    IDSelector. With diversification the top settings.DIVERSIFY_FETCH_K
+    documents are re-ranked by mmr_diversify.
+
+    Args:
+        vectorstore (FAISS): LangChain FAISS store whose documents carry ``row_id`` metadata.
+        query (str): Search text.
+        row_ids (array-like): Allowed dataset row ids, or None to search everything.
+        k (int): Number of documents to return.
+        diversify (bool): Re-rank for distinct stories. Defaults to settings.DIVERSIFY_RETRIEVAL.
+
+    Returns:
+        list[Document]: Matching documents, best first.
+    """
+    if diversify is None:
+        diversify = settings.DIVERSIFY_RETRIEVAL
+    fetch_k = _fetch_k(k, diversify)
+    positions = _allowed_positions(vectorstore, row_ids)
+    if positions is None:
+        docs = vectorstore.similarity_search(query, k=fetch_k)
+    else:
+        docs = _documents(vectorstore, _vector_positions(vectorstore, query, positions, fetch_k), row_ids)
+    return mmr_diversify(docs, k) if diversify else docs
+
+
+@traced("retrieval.hybrid")
+def hybrid_search(vectorstore, lexical, query, row_ids=None, k=3, fetch_k=None, rrf_k=None, stats=None,
+                  diversify=None):
+    """
+    Top-k documents from BM25 and vector search, fused by reciprocal rank.
+
+    Questions naming a known company or sector are answered from the lexical
+    index first: when at least ``k`` documents mention the entity they are
+    ranked by BM25 and returned without embedding the question. Otherwise
+    the BM25 and vector top ``fetch_k`` lists are fused with RRF. Both
+    sources honour the dashboard row filter. With diversification the top
+    settings.DIVERSIFY_FETCH_K documents of either route are re-ranked by
+    mmr_diversify.
+
+    Args:
+        vectorstore (FAISS): Store the lexical index was built for.
+        lexical (LexicalIndex): BM25 index aligned with the store's positions.
+        query (str): Search text.
+        row_ids (array-like): Allowed dataset row ids, or None to search everything.
+        k (int): Number of documents to return.
+        fetch_k (int): Candidates taken from each source. Defaults to settings.HYBRID_FETCH_K.
+        rrf_k (int): RRF constant. Defaults to settings.RRF_K.
+        stats (dict): Optional dict that receives the route taken and matched entities.
+        diversify (bool): Re-rank for distinct stories. Defaults to settings.DIVERSIFY_RETRIEVAL.
+
+    Returns:
+        list[Document]: Matching documents, best first.
+    """
+    if diversify is None:
+        diversify = settings.DIVERSIFY_RETRIEVAL
+    top_k = _fetch_k(k, diversify)
+    fetch_k = max(fetch_k or settings.HYBRID_FETCH_K, top_k)
+    rrf_k = settings.RRF_K if rrf_k is None else rrf_k
+    positions = _allowed_positions(vectorstore, row_ids)
+    if positions is not None and len(positions) == 0:
+        return []
+
+    entities = lexical.match_entities(query)
+    # Documents appended to the vector index after the lexical index was last
+    # extended are only reachable through the vector search.
+    candidates = positions if positions is None else positions[positions < len(lexical)]
+    if entities:
+        candidates = lexical.entity_positions(entities)
+        if positions is not None:
+            allowed = np.zeros(len(lexical), dtype=bool)
+            allowed[positions[positions < len(lexical)]] = True
+            candidates = candidates[allowed[candidates]]
+    with span("retrieval.bm25"):
+        lexical_hits, _ = lexical.search(query, fetch_k, candidates)
+    if stats is not None:
+        stats['entities'] = entities
+    if entities and len(lexical_hits) >= k:
+        if stats is not None:
+            stats['route'] = 'lexical'
+        hits = lexical_hits
+    else:
+        vector_hits = _vector_positions(vectorstore, query, positions, fetch_k)
+        if stats is not None:
+            stats['route'] = 'fused'
+        hits = reciprocal_rank_fusion([lexical_hits, vector_hits], rrf_k)
+    docs = _documents(vectorstore, hits[:top_k], None if positions is None else row_ids)
+    return mmr_diversify(docs, k) if diversify else docs
+
+
+class FilteredRetriever(BaseRetriever):
+    """
+    LangChain retriever that only searches the rows selected in the dashboard,
+    using hybrid BM25 + vector retrieval when a lexical index is given.
+    """
+
+    vectorstore: Any
+    k: int = 3
+    row_ids: Optional[Any] = None
+    lexical: Optional[Any] = None
+    diversify: Optional[bool] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if self.lexical is not None:
+            return hybrid_search(self.vectorstore, self.lexical, query, self.row_ids, self.k,
+                                 diversify=self.diversify)
+        return filtered_similarity_search(self.vectorstore, query, self.row_ids, self.k, self.diversify)
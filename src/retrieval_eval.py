@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from src import settings
+from src.data_store import load_dataset
+from src.lexical_index import build_lexical_index
+from src.near_duplicates import cluster_labels, jaccard_matrix
+from src.retrieval import _allowed_positions, _comparable_text, _documents, filtered_similarity_search, hybrid_search
+
+METHODS = ("vector", "bm25", "hybrid")
+
+COMPANY_QUESTIONS = [
+    "How did {entity} shares perform?",
+    "What is the latest news about {entity}?",
+    "Why did {entity} stock move?",
+]
+SECTOR_QUESTIONS = [
+    "How are {entity} stocks doing?",
+    "What is driving the {entity} sector?",
+]
+TOPIC_QUESTIONS = [
+    "Which stocks moved on {entity}?",
+    "What happened after {entity}?",
+]
+
+
+def make_questions(df, lexical, count=100, seed=0):
+    """
+    Labelled questions: (question, relevant phrase, kind).
+
+    Company and sector questions name an entity the lexical index knows;
+    topic questions name a news reason (no entity) and exercise the fused
+    route. A returned document is relevant when its text contains the phrase.
+    """
+    from src.data_generation import companies_expanded, reasons_expanded
+
+    rng = np.random.default_rng(seed)
+    sectors = [name for name in lexical.entities if name in companies_expanded or name in set(df['sector'].astype(str))]
+    companies = [name for name in lexical.entities if name not in sectors]
+    pools = [
+        ('company', companies, COMPANY_QUESTIONS),
+        ('sector', sectors, SECTOR_QUESTIONS),
+        ('topic', reasons_expanded, TOPIC_QUESTIONS),
+    ]
+    pools = [pool for pool in pools if pool[1]]
+    questions = []
+    for i in range(count):
+        kind, names, templates = pools[i % len(pools)]
+        entity = names[rng.integers(len(names))]
+        template = templates[rng.integers(len(templates))]
+        questions.append((template.format(entity=entity), entity, kind))
+    return questions
+
+
+def _window_rows(df, rng, days):
+    """Row ids of a random ``days``-long date window (the dashboard's date filter)."""
+    dates = df['date'].dropna()
+    start = dates.min() + (dates.max() - dates.min() - np.timedelta64(days, 'D')) * rng.random()
+    mask = (df['date'] >= start) & (df['date'] < start + np.timedelta64(days, 'D'))
+    return df.index[mask.to_numpy()].to_numpy()
+
+
+def answer_diversity(docs, threshold=None):
+    """
+    How different the retrieved documents are from each other.
+
+    Returns:
+        tuple: (distinct stories / documents, where near-duplicates at
+        ``threshold`` count as one story; mean pairwise word-shingle Jaccard
+        similarity, 0 for fewer than two documents).
+    """
+    if len(docs) < 2:
+        return 1.0, 0.0
+    threshold = settings.DEDUPE_THRESHOLD if threshold is None else threshold
+    similarity = jaccard_matrix([_comparable_text(doc) for doc in docs])
+    left, right = np.triu_indices(len(docs), 1)
+    same = similarity[left, right] >= threshold
+    stories = len(np.unique(cluster_labels(len(docs), left[same], right[same])))
+    return stories / len(docs), float(similarity[left, right].mean())
+
+
+def evaluate(vectorstore, lexical, questions, k=3, row_id_sets=None, diversify=None):
+    """
+    Precision@k, hit rate@1, answer diversity and per-query latency for each
+    retrieval method, plus how often hybrid search answered from the lexical
+    index alone.
+
+    Args:
+        vectorstore (FAISS): Store with row_id metadata.
+        lexical (LexicalIndex): BM25 index aligned with the store.
+        questions (list[tuple]): (question, relevant phrase, kind) from make_questions.
+        k (int): Documents per question.
+        row_id_sets (list): Optional dashboard row filter per question.
+        diversify (bool): MMR re-ranking for the vector and hybrid methods.
+            Defaults to settings.DIVERSIFY_RETRIEVAL.
+
+    Returns:
+        list[dict]: One row per (method, question kind), plus 'all' per method.
+    """
+    def run(method, question, row_ids, stats):
+        if method == 'vector':
+            return filtered_similarity_search(vectorstore, question, row_ids, k, diversify)
+        if method == 'bm25':
+            hits, _ = lexical.search(question, k, _allowed_positions(vectorstore, row_ids))
+            return _documents(vectorstore, hits, row_ids)
+        return hybrid_search(vectorstore, lexical, question, row_ids, k, stats=stats, diversify=diversify)
+
+    results = []
+    for method in METHODS:
+        per_kind = {kind: None for kind in ('company', 'sector', 'topic', 'all')}
+        for i, (question, phrase, kind) in enumerate(questions):
+            row_ids = row_id_sets[i] if row_id_sets is not None else None
+            start = time.perf_counter()
+            stats = {}
+            docs = run(method, question, row_ids, stats)
+            seconds = time.perf_counter() - start
+            relevant = [phrase.lower() in doc.page_content.lower() for doc in docs]
+            distinct, similarity = answer_diversity(docs)
+            for key in (kind, 'all'):
+                bucket = per_kind[key] = per_kind[key] or {'precision': [], 'hit1': [], 'latency': [], 'lexical': [],
+                                                           'distinct': [], 'similarity': []}
+                bucket['precision'].append(sum(relevant) / k)
+                bucket['hit1'].append(bool(relevant and relevant[0]))
+                bucket['latency'].append(seconds)
+                bucket['lexical'].append(stats.get('route') == 'lexical')
+                bucket['distinct'].append(distinct)
+                bucket['similarity'].append(similarity)
+        for kind, bucket in per_kind.items():
+            if bucket is None:
+                continue
+            row = {
+                'method': method,
+                'questions': kind,
+                'count': len(bucket['latency']),
+                f'precision@{k}': float(np.mean(bucket['precision'])),
+                'hit@1': float(np.mean(bucket['hit1'])),
+                'p50_ms': float(np.percentile(bucket['latency'], 50)) * 1000,
+                'p95_ms': float(np.percentile(bucket['latency'], 95)) * 1000,
+                'lexical_route': float(np.mean(bucket['lexical'])),
+                'distinct_stories': float(np.mean(bucket['distinct'])),
+                'mean_similarity': float(np.mean(bucket['similarity'])),
+            }
+            results.append(row)
+            print(f"{method:<7} {kind:<8} n={row['count']:<4} precision@{k}={row[f'precision@{k}']:.3f} "
+                  f"hit@1={row['hit@1']:.3f} distinct={row['distinct_stories']:.3f} "
+                  f"similarity={row['mean_similarity']:.3f} p50={row['p50_ms']:.3f}ms p95={row['p95_ms']:.3f}ms"
+                  + (f" lexical-only={row['lexical_route']:.0%}" if method == 'hybrid' else ""))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare vector, BM25 and hybrid retrieval: quality and latency.")
+    parser.add_argument("--csv", default=settings.DATA_PATH, help="dataset CSV to index")
+    parser.add_argument("--rows", type=int, help="only index the first N rows")
+    parser.add_argument("--questions", type=int, default=150, help="number of labelled questions")
+    parser.add_argument("--k", type=int, default=3, help="documents per question")
+    parser.add_argument("--filter-days", type=int, default=0,
+                        help="also restrict each question to a random N-day date window (0 = no filter)")
+    parser.add_argument("--embedder", choices=["hash", "model"], default="model",
+                        help="configured sentence-transformers model or hashing embeddings (fast, for smoke tests)")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    from src.create_memory_for_llm import build_vectorstore, content_ids, rows_to_texts
+
+    df = load_dataset(args.csv)
+    if args.rows:
+        df = df.head(args.rows)
+    if args.embedder == 'hash':
+        from src.benchmark import HashingEmbeddings
+        embeddings = HashingEmbeddings()
+    else:
+        from src.embedding_cache import get_document_embedder
+        embeddings = get_document_embedder()
+    print(f"🔗 Indexing {len(df):,} documents")
+    vectorstore = build_vectorstore(df, embeddings)
+    start = time.perf_counter()
+    lexical = build_lexical_index(vectorstore, df, content_ids(rows_to_texts(df)))
+    print(f"🔤 BM25 index: {len(lexical.terms)} terms, {len(lexical.entities)} entities "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    questions = make_questions(df, lexical, args.questions)
+    row_id_sets = None
+    if args.filter_days:
+        rng = np.random.default_rng(1)
+        row_id_sets = [_window_rows(df, rng, args.filter_days) for _ in questions]
+    results = evaluate(vectorstore, lexical, questions, args.k, row_id_sets)
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'w') as fh:
+            json.dump({'rows': len(df), 'k': args.k, 'filter_days': args.filter_days, 'results': results}, fh, indent=2)
@@ -0,0 +1,125 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Source dataset used by the dashboard and the vector store builder.
+DATA_PATH = os.environ.get("FINLYTICS_DATA_PATH", "data/indian_stock_news_2024_25.csv")
+
+# Directory for derived artefacts (columnar caches, aggregates, ...).
+CACHE_DIR = os.environ.get("FINLYTICS_CACHE_DIR", "data/.cache")
+# Serve the dashboard from one date-sorted, memory-mapped Arrow copy of the dataset
+# shared by all sessions and processes (see data_store.open_shared_dataset).
+SHARED_DATASET = os.environ.get("FINLYTICS_SHARED_DATASET", "1") == "1"
+
+# Vector store and models used by the Analyst AI chatbot.
+VECTORSTORE_PATH = os.environ.get("FINLYTICS_VECTORSTORE_PATH", "vectorstore/")
+EMBEDDING_MODEL = os.environ.get("FINLYTICS_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LLM_MODEL = os.environ.get("FINLYTICS_LLM_MODEL", "mistralai/Mistral-7B-Instruct-v0.2")
+LLM_BASE_URL = os.environ.get("FINLYTICS_LLM_BASE_URL", "https://api-inference.huggingface.co/v1")
+
+# Warm the embedder/index/LLM client in a background thread after the first page paint.
+WARM_UP_ON_START = os.environ.get("FINLYTICS_WARM_UP", "1") == "1"
+
+# Analyst AI answer cache.
+ANSWER_CACHE_PATH = os.environ.get("FINLYTICS_ANSWER_CACHE_PATH", os.path.join(CACHE_DIR, "answers.sqlite"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("FINLYTICS_ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("FINLYTICS_ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Cosine similarity above which a differently worded question reuses a cached answer.
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("FINLYTICS_ANSWER_CACHE_SIMILARITY", "0.92"))
+
+# LLM request timeout (seconds); for streaming also the maximum wait between tokens.
+LLM_TIMEOUT_SECONDS = float(os.environ.get("FINLYTICS_LLM_TIMEOUT_SECONDS", "60"))
+# LLM gateway: concurrent upstream calls, pooled connections and retry backoff (src/llm_gateway.py).
+LLM_MAX_CONCURRENCY = int(os.environ.get("FINLYTICS_LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("FINLYTICS_LLM_MAX_CONNECTIONS", "8"))
+LLM_MAX_RETRIES = int(os.environ.get("FINLYTICS_LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BACKOFF_SECONDS = float(os.environ.get("FINLYTICS_LLM_RETRY_BACKOFF_SECONDS", "0.5"))
+LLM_RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get("FINLYTICS_LLM_RETRY_BACKOFF_MAX_SECONDS", "8"))
+# Longest wait for a free gateway slot before a queued call fails (separate from LLM_TIMEOUT_SECONDS).
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("FINLYTICS_LLM_QUEUE_TIMEOUT_SECONDS", "300"))
+
+# Approximate token budget of the statistical digest of the filtered rows sent with
+# Analyst AI questions (see src/context_builder.py).
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("FINLYTICS_CONTEXT_TOKEN_BUDGET", "600"))
+
+# Dashboard chart rendering.
+CHART_DPI = int(os.environ.get("FINLYTICS_CHART_DPI", "110"))
+# Line views are averaged into at most this many date buckets (0 disables downsampling).
+CHART_MAX_POINTS = int(os.environ.get("FINLYTICS_CHART_MAX_POINTS", "240"))
+
+# Vector index type as a faiss index_factory string ("Flat", "SQ8", "HNSW32",
+# "IVF1024,PQ48", ...) or "auto" to pick by corpus size; see src/ann_index.py.
+INDEX_FACTORY = os.environ.get("FINLYTICS_INDEX_FACTORY", "Flat")
+INDEX_TRAIN_SIZE = int(os.environ.get("FINLYTICS_INDEX_TRAIN_SIZE", "100000"))
+# Query-time accuracy/speed knobs for IVF (nprobe) and HNSW (efSearch) indexes.
+INDEX_NPROBE = int(os.environ.get("FINLYTICS_INDEX_NPROBE", "16"))
+INDEX_EF_SEARCH = int(os.environ.get("FINLYTICS_INDEX_EF_SEARCH", "64"))
+# Memory-map the saved index vectors in the app instead of reading them into RAM.
+INDEX_MMAP = os.environ.get("FINLYTICS_INDEX_MMAP", "1") == "1"
+
+# Document embedding: persistent content-hash cache, encoder batch size and
+# CPU worker processes (0 = one per core) for jobs of at least EMBED_POOL_MIN_TEXTS texts.
+EMBEDDING_CACHE = os.environ.get("FINLYTICS_EMBEDDING_CACHE", "1") == "1"
+EMBEDDING_CACHE_DIR = os.environ.get("FINLYTICS_EMBEDDING_CACHE_DIR", os.path.join(CACHE_DIR, "embeddings"))
+EMBED_BATCH_SIZE = int(os.environ.get("FINLYTICS_EMBED_BATCH_SIZE", "64"))
+EMBED_PROCESSES = int(os.environ.get("FINLYTICS_EMBED_PROCESSES", "0"))
+EMBED_POOL_MIN_TEXTS = int(os.environ.get("FINLYTICS_EMBED_POOL_MIN_TEXTS", "5000"))
+
+# Hybrid retrieval: BM25 over headlines/summaries fused with vector search
+# (reciprocal rank fusion, constant RRF_K) over HYBRID_FETCH_K candidates per source.
+HYBRID_RETRIEVAL = os.environ.get("FINLYTICS_HYBRID_RETRIEVAL", "1") == "1"
+HYBRID_FETCH_K = int(os.environ.get("FINLYTICS_HYBRID_FETCH_K", "20"))
+RRF_K = int(os.environ.get("FINLYTICS_RRF_K", "60"))
+
+# Out-of-core preprocessing (python -m src.data_processing --partitioned) writes a
+# year/month/sector partitioned Parquet dataset; with FINLYTICS_PARTITIONED_DATA=1 the
+# dashboard reads only the partitions and columns for the current filters from it.
+PARTITIONED_DATA_PATH = os.environ.get("FINLYTICS_PARTITIONED_DATA_PATH", "data/processed")
+USE_PARTITIONED_DATA = os.environ.get("FINLYTICS_PARTITIONED_DATA", "0") == "1"
+PREPROCESS_CHUNK_ROWS = int(os.environ.get("FINLYTICS_PREPROCESS_CHUNK_ROWS", "100000"))
+
+# Shared query service (python -m src.query_service). When QUERY_SERVICE_URL is set the
+# dashboard is a thin client of it instead of loading data and calling the LLM itself.
+QUERY_SERVICE_URL = os.environ.get("FINLYTICS_QUERY_SERVICE_URL", "")
+QUERY_SERVICE_HOST = os.environ.get("FINLYTICS_QUERY_SERVICE_HOST", "127.0.0.1")
+QUERY_SERVICE_PORT = int(os.environ.get("FINLYTICS_QUERY_SERVICE_PORT", "8765"))
+QUERY_CACHE_ENTRIES = int(os.environ.get("FINLYTICS_QUERY_CACHE_ENTRIES", "2048"))
+
+# Span instrumentation (src/instrumentation.py): per-stage durations, row counts and
+# memory deltas written to a rotating JSONL log and exported as Prometheus metrics
+# (GET /metrics on the query service; the dashboard serves them on METRICS_PORT, 0 = off).
+INSTRUMENTATION = os.environ.get("FINLYTICS_INSTRUMENTATION", "0") == "1"
+SPAN_LOG_PATH = os.environ.get("FINLYTICS_SPAN_LOG_PATH", "logs/spans.jsonl")
+SPAN_LOG_MAX_BYTES = int(os.environ.get("FINLYTICS_SPAN_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+SPAN_LOG_BACKUPS = int(os.environ.get("FINLYTICS_SPAN_LOG_BACKUPS", "3"))
+METRICS_PORT = int(os.environ.get("FINLYTICS_METRICS_PORT", "0"))
+
+# Live ingestion (src/ingest.py): news rows dropped into INGEST_INBOX as .jsonl/.json/.csv
+# files or appended to the INGEST_TAIL_PATH JSON-lines file are cleaned and committed in
+# batches of up to INGEST_BATCH_ROWS rows, at most INGEST_BATCH_SECONDS after they arrive.
+# FINLYTICS_INGEST=1 runs the worker inside the dashboard / query service process.
+INGEST = os.environ.get("FINLYTICS_INGEST", "0") == "1"
+INGEST_INBOX = os.environ.get("FINLYTICS_INGEST_INBOX", "data/inbox")
+INGEST_TAIL_PATH = os.environ.get("FINLYTICS_INGEST_TAIL_PATH", "")
+INGEST_POLL_SECONDS = float(os.environ.get("FINLYTICS_INGEST_POLL_SECONDS", "1"))
+INGEST_BATCH_ROWS = int(os.environ.get("FINLYTICS_INGEST_BATCH_ROWS", "5000"))
+INGEST_BATCH_SECONDS = float(os.environ.get("FINLYTICS_INGEST_BATCH_SECONDS", "2"))
+# Embed new rows into the vector store; index.faiss and lexical.npz are rewritten every
+# INGEST_CHECKPOINT_SECONDS (the SQLite docstore is updated on every batch).
+INGEST_INDEX_VECTORS = os.environ.get("FINLYTICS_INGEST_INDEX_VECTORS", "1") == "1"
+INGEST_CHECKPOINT_SECONDS = float(os.environ.get("FINLYTICS_INGEST_CHECKPOINT_SECONDS", "60"))
+
+# Near-duplicate collapsing (src/near_duplicates.py): MinHash signatures of DEDUPE_PERMUTATIONS
+# values over DEDUPE_SHINGLE_SIZE-word shingles of headline + summary, LSH with DEDUPE_BANDS
+# bands (0 = derived from the threshold), pairs kept at an estimated Jaccard similarity >= DEDUPE_THRESHOLD. DEDUPE_INDEX=1
+# embeds one representative per cluster; DIVERSIFY_RETRIEVAL re-ranks retrieved documents
+# by MMR (weight MMR_LAMBDA on relevance) over DIVERSIFY_FETCH_K candidates.
+DEDUPE_INDEX = os.environ.get("FINLYTICS_DEDUPE_INDEX", "1") == "1"
+DEDUPE_THRESHOLD = float(os.environ.get("FINLYTICS_DEDUPE_THRESHOLD", "0.8"))
+DEDUPE_PERMUTATIONS = int(os.environ.get("FINLYTICS_DEDUPE_PERMUTATIONS", "64"))
+DEDUPE_BANDS = int(os.environ.get("FINLYTICS_DEDUPE_BANDS", "0"))
+DEDUPE_SHINGLE_SIZE = int(os.environ.get("FINLYTICS_DEDUPE_SHINGLE_SIZE", "2"))
+DIVERSIFY_RETRIEVAL = os.environ.get("FINLYTICS_DIVERSIFY_RETRIEVAL", "1") == "1"
+DIVERSIFY_FETCH_K = int(os.environ.get("FINLYTICS_DIVERSIFY_FETCH_K", "12"))
+MMR_LAMBDA = float(os.environ.get("FINLYTICS_MMR_LAMBDA", "0.5"))
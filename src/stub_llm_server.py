@@ -0,0 +1,164 @@
+"""
+Minimal OpenAI-compatible chat completions server for local testing.
+
+It returns a canned answer, optionally streamed word by word as server-sent
+events, so the chatbot can be exercised without a real model or token:
+
+    python -m src.stub_llm_server --port 8001 --token-delay 0.05
+    FINLYTICS_LLM_BASE_URL=http://127.0.0.1:8001/v1 HF_TOKEN=stub streamlit run app.py
+
+``--fail-first N`` answers the first N completion requests with an error
+status, to exercise client retries.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "### Overview\n- Stub analyst answer generated locally for testing.\n"
+    "### Recommendations\n- Replace the stub server with a real model endpoint."
+)
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    reply = DEFAULT_REPLY
+    token_delay = 0.0
+    first_token_delay = 0.0
+    fail_first = 0
+    fail_status = 503
+    # Shared per configured handler: request counters and the lock guarding them.
+    stats = {'requests': 0, 'streams': 0, 'failed': 0}
+    stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'stub', 'object': 'model'}]})
+        else:
+            self._send_json(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'not found'}})
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['streams'] += int(bool(request.get('stream')))
+            fail = self.stats['requests'] <= self.fail_first
+            self.stats['failed'] += int(fail)
+        if fail:
+            self._send_json(self.fail_status, {'error': {'message': 'stub failure (fail_first)'}})
+            return
+        model = request.get('model', 'stub')
+        prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in request.get('messages', []))
+        words = self.reply.split(' ')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': len(words),
+            'total_tokens': prompt_tokens + len(words),
+        }
+
+        if not request.get('stream'):
+            time.sleep(self.first_token_delay + self.token_delay * len(words))
+            try:
+                self._send_json(200, {
+                    'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': self.reply}}],
+                    'usage': usage,
+                })
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up (timeout)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        time.sleep(self.first_token_delay)
+        try:
+            for i, word in enumerate(words):
+                delta = {'content': word if i == 0 else f" {word}"}
+                if i == 0:
+                    delta['role'] = 'assistant'
+                self._send_event({
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}],
+                })
+                time.sleep(self.token_delay)
+            self._send_event({
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': model, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+                'usage': usage,
+            })
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client cancelled the stream
+
+    def _send_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+
+def start_stub_server(host='127.0.0.1', port=0, reply=None, token_delay=0.0, first_token_delay=0.0,
+                      fail_first=0, fail_status=503):
+    """
+    Start the stub server in a daemon thread.
+
+    Args:
+        fail_first (int): Answer the first N completion requests with ``fail_status``.
+        fail_status (int): HTTP status of the injected failures.
+
+    Returns:
+        tuple: (server, base_url), e.g. base_url 'http://127.0.0.1:PORT/v1'.
+        ``server.stats`` counts requests, streams and injected failures.
+        Call server.shutdown() to stop it.
+    """
+    handler = type('ConfiguredStubLLMHandler', (StubLLMHandler,), {
+        'reply': reply or DEFAULT_REPLY,
+        'token_delay': token_delay,
+        'first_token_delay': first_token_delay,
+        'fail_first': fail_first,
+        'fail_status': fail_status,
+        'stats': {'requests': 0, 'streams': 0, 'failed': 0},
+        'stats_lock': threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.stats = handler.stats
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stub OpenAI-compatible chat server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--token-delay", type=float, default=0.05, help="seconds between streamed words")
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="seconds before the first word")
+    parser.add_argument("--fail-first", type=int, default=0, help="fail the first N requests with HTTP 503")
+    args = parser.parse_args()
+    server, base_url = start_stub_server(args.host, args.port, token_delay=args.token_delay,
+                                         first_token_delay=args.first_token_delay, fail_first=args.fail_first)
+    print(f"🧪 Stub LLM serving at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,157 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# Sums kept per (sector, day); every trend column is a ratio of two of them.
+# Measures carry their own non-null counts so means skip NaN like pandas does.
+TREND_MEASURES = {'price_change': 'price_change', 'trading_volume': 'trading_volume_crore'}
+TREND_SUMS = ['rows', 'positive', 'negative'] + [
+    f'{name}_{part}' for name in TREND_MEASURES for part in ('sum', 'count')
+]
+
+# Pandas 3 removed the plain 'M' alias; keep accepting it for month-end bins.
+FREQ_ALIASES = {'M': 'ME'}
+
+
+def sentiment_indicators(df):
+    """
+    Boolean positive/negative sentiment indicators, reusing the precomputed
+    ``is_positive``/``is_negative`` columns when feature_engineering added them.
+    """
+    if 'is_positive' in df and 'is_negative' in df:
+        return df['is_positive'].to_numpy(dtype=bool), df['is_negative'].to_numpy(dtype=bool)
+    sentiment = df['sentiment']
+    return (sentiment == 'Positive').to_numpy(dtype=bool), (sentiment == 'Negative').to_numpy(dtype=bool)
+
+
+def daily_sums(df):
+    """
+    Per (sector, day) sums of the trend measures in one sorted pass.
+
+    Rows are keyed by ``sector code * days + day offset``; np.unique sorts the
+    keys once and bincount accumulates every measure over the resulting
+    groups, so no per-group Python code runs.
+
+    Args:
+        df (pd.DataFrame): Rows with date, sector, sentiment, price_change and trading_volume_crore.
+
+    Returns:
+        pd.DataFrame: sector, date and TREND_SUMS, sorted by sector then date.
+    """
+    df = df[df['date'].notna() & df['sector'].notna()]
+    if len(df) == 0:
+        return pd.DataFrame(columns=['sector', 'date'] + TREND_SUMS)
+    days = df['date'].to_numpy(dtype='datetime64[D]')
+    first = days.min()
+    offsets = (days - first).astype(np.int64)
+    span = int(offsets.max()) + 1
+    sector_codes, sectors = pd.factorize(df['sector'].astype(str), sort=True)
+
+    keys, group = np.unique(sector_codes.astype(np.int64) * span + offsets, return_inverse=True)
+    size = len(keys)
+    positive, negative = sentiment_indicators(df)
+    sums = {
+        'sector': sectors.take(keys // span),
+        'date': pd.to_datetime(first + (keys % span).astype('timedelta64[D]')).as_unit('ns'),
+        'rows': np.bincount(group, minlength=size).astype(np.int64),
+        'positive': np.bincount(group, weights=positive, minlength=size),
+        'negative': np.bincount(group, weights=negative, minlength=size),
+    }
+    for name, column in TREND_MEASURES.items():
+        values = df[column].to_numpy(dtype='float64')
+        present = ~np.isnan(values)
+        sums[f'{name}_sum'] = np.bincount(group, weights=np.where(present, values, 0.0), minlength=size)
+        sums[f'{name}_count'] = np.bincount(group, weights=present, minlength=size)
+    return pd.DataFrame(sums)
+
+
+def _trends_from_sums(sums):
+    """Turn summed cells into the aggregate_trends columns."""
+    rows = sums['rows'].to_numpy(dtype='float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({
+            'sector': sums['sector'].to_numpy(),
+            'date': sums['date'].to_numpy(),
+            'sentiment_positive_pct': sums['positive'].to_numpy() / rows,
+            'sentiment_negative_pct': sums['negative'].to_numpy() / rows,
+            'avg_price_change': sums['price_change_sum'].to_numpy() / sums['price_change_count'].to_numpy(),
+            'avg_trading_volume': sums['trading_volume_sum'].to_numpy() / sums['trading_volume_count'].to_numpy(),
+        })
+
+
+class TrendRollup:
+    """
+    Sector sentiment/price trends at several time granularities.
+
+    The raw rows are scanned once into daily (sector, day) sums. Coarser
+    frequencies (weekly, monthly, ...) are rolled up from those daily cells,
+    never from the raw rows, and every frequency is computed at most once.
+
+    Args:
+        df (pd.DataFrame): News rows (see daily_sums for the columns used).
+    """
+
+    def __init__(self, df):
+        self.daily = daily_sums(df)
+        self._trends = {}
+        self._lock = threading.Lock()
+
+    def sums(self, freq='D'):
+        """Summed cells per (sector, period) for a pandas frequency string."""
+        freq = FREQ_ALIASES.get(freq, freq)
+        if freq == 'D':
+            return self.daily
+        grouped = self.daily.groupby(['sector', pd.Grouper(key='date', freq=freq)], sort=True)[TREND_SUMS].sum()
+        return grouped.reset_index()
+
+    def trends(self, freq='W'):
+        """
+        Trend table for ``freq``, cached per frequency.
+
+        Args:
+            freq (str): Pandas frequency string ('D', 'W', 'M'/'ME', ...).
+
+        Returns:
+            pd.DataFrame: sector, date, sentiment_positive_pct,
+            sentiment_negative_pct, avg_price_change and avg_trading_volume.
+        """
+        freq = FREQ_ALIASES.get(freq, freq)
+        with self._lock:
+            cached = self._trends.get(freq)
+        if cached is None:
+            cached = _trends_from_sums(self.sums(freq))
+            with self._lock:
+                self._trends[freq] = cached
+        return cached.copy()
+
+    def all_trends(self, freqs=('D', 'W', 'M')):
+        """Trend tables for several frequencies, keyed by the requested names."""
+        return {freq: self.trends(freq) for freq in freqs}
+
+
+_rollups = {}
+_rollups_lock = threading.Lock()
+
+
+def shared_rollup(df):
+    """
+    The TrendRollup of ``df``, built on the first call for that frame and
+    reused while it is alive, so every frequency of a frame is computed once
+    across calls. The frame is treated as read-only after the first call;
+    a change of its length or columns builds a new rollup.
+    """
+    key = id(df)
+    state = (len(df), tuple(df.columns))
+    with _rollups_lock:
+        cached = _rollups.get(key)
+        if cached is not None and cached[0]() is df and cached[1] == state:
+            return cached[2]
+    rollup = TrendRollup(df)
+    with _rollups_lock:
+        if key not in _rollups:
+            # Drop the entry with the frame, before its id can be reused.
+            weakref.finalize(df, _rollups.pop, key, None)
+        _rollups[key] = (weakref.ref(df), state, rollup)
+    return rollup
@@ -0,0 +1,160 @@
+"""LLMGateway against the local stub OpenAI-compatible server (src/stub_llm_server.py)."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from src import llm_gateway
+from src.llm_gateway import LLMGateway, build_chat_client
+from src.stub_llm_server import start_stub_server
+
+SHORT_REPLY = "one two three four five six seven eight nine ten"
+
+
+@pytest.fixture
+def stub():
+    """Start a stub server with the given options; every server is shut down after the test."""
+    servers = []
+
+    def start(**options):
+        server, base_url = start_stub_server(**options)
+        servers.append(server)
+        return server, build_chat_client("stub", base_url)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def question(text="How did banking stocks do?"):
+    return [HumanMessage(content=text)]
+
+
+def concurrently(fn, count):
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [executor.submit(fn, i) for i in range(count)]
+        return [future.exception() or future.result() for future in futures]
+
+
+def test_identical_concurrent_calls_share_one_upstream_request(stub):
+    server, client = stub(reply=SHORT_REPLY, first_token_delay=0.3)
+    gateway = LLMGateway(client)
+
+    answers = concurrently(lambda i: gateway.invoke(question()).content, 8)
+
+    assert answers == [SHORT_REPLY] * 8
+    assert server.stats['requests'] == 1
+    assert gateway.stats()['coalesced'] == 7
+
+
+def test_identical_concurrent_streams_share_one_upstream_request(stub):
+    server, client = stub(reply=SHORT_REPLY, first_token_delay=0.3, token_delay=0.01)
+    gateway = LLMGateway(client)
+
+    answers = concurrently(lambda i: "".join(gateway.stream(question())), 6)
+
+    assert answers == [SHORT_REPLY] * 6
+    assert server.stats['requests'] == 1
+
+
+def test_retry_succeeds_after_transient_failures(stub):
+    server, client = stub(reply=SHORT_REPLY, fail_first=2)
+    gateway = LLMGateway(client, max_retries=3, backoff=0.01)
+
+    assert gateway.invoke(question()).content == SHORT_REPLY
+    assert server.stats['requests'] == 3
+    assert gateway.stats()['retries'] == 2
+    assert gateway.stats()['errors'] == 0
+
+
+def test_non_retryable_status_is_not_retried(stub):
+    server, client = stub(fail_first=5, fail_status=400)
+    gateway = LLMGateway(client, backoff=0.01)
+
+    with pytest.raises(Exception):
+        gateway.invoke(question())
+    assert server.stats['requests'] == 1
+
+
+def test_peak_active_stays_within_max_concurrency(stub):
+    server, client = stub(reply=SHORT_REPLY, first_token_delay=0.2)
+    gateway = LLMGateway(client, max_concurrency=2)
+
+    answers = concurrently(lambda i: gateway.invoke(question(f"Question {i}")).content, 6)
+
+    assert answers == [SHORT_REPLY] * 6
+    stats = gateway.stats()
+    assert server.stats['requests'] == 6
+    assert stats['peak_active'] == 2
+    assert stats['active'] == 0
+
+
+def test_attempt_timeout_is_retried_then_raised(stub):
+    server, client = stub(first_token_delay=1.0)
+    gateway = LLMGateway(client, timeout=0.2, max_retries=1, backoff=0.01)
+
+    with pytest.raises(TimeoutError):
+        gateway.invoke(question())
+    assert gateway.stats()['retries'] == 1
+
+
+def test_queued_streams_do_not_time_out(stub):
+    # Each stream takes about 1s upstream; with one slot the third waits about 2s for it.
+    server, client = stub(reply=SHORT_REPLY, token_delay=0.1)
+    gateway = LLMGateway(client, max_concurrency=1, timeout=1.0)
+
+    answers = concurrently(lambda i: "".join(gateway.stream(question(f"Question {i}"))), 3)
+
+    assert answers == [SHORT_REPLY] * 3
+    assert gateway.stats()['cancelled'] == 0
+
+
+def test_queue_has_its_own_deadline(stub):
+    server, client = stub(reply=SHORT_REPLY, token_delay=0.1)
+    gateway = LLMGateway(client, max_concurrency=1, timeout=5.0, queue_timeout=0.3)
+
+    results = concurrently(lambda i: "".join(gateway.stream(question(f"Question {i}"))), 2)
+
+    assert sorted(map(type, results), key=lambda kind: kind.__name__) == [TimeoutError, str]
+    error = next(result for result in results if isinstance(result, TimeoutError))
+    assert "slot" in str(error)
+
+
+def test_stream_waits_through_retry_backoff(stub, monkeypatch):
+    # The backoff (0.5s) is longer than the subscriber's timeout (0.3s).
+    monkeypatch.setattr(llm_gateway, 'backoff_delay', lambda *args, **kwargs: 0.5)
+    server, client = stub(reply=SHORT_REPLY, fail_first=1)
+    gateway = LLMGateway(client, timeout=0.3, max_retries=2)
+
+    assert "".join(gateway.stream(question())) == SHORT_REPLY
+    assert gateway.stats()['retries'] == 1
+
+
+def test_stream_token_timeout(stub):
+    server, client = stub(first_token_delay=2.0)
+    gateway = LLMGateway(client, timeout=0.3, max_retries=0)
+
+    with pytest.raises(TimeoutError, match="No token"):
+        list(gateway.stream(question()))
+
+
+def test_cancelled_stream_releases_its_slot(stub):
+    server, client = stub(reply=SHORT_REPLY, token_delay=0.2)
+    gateway = LLMGateway(client, max_concurrency=1, queue_timeout=5.0)
+
+    stream = gateway.stream(question())
+    assert next(stream) == "one"
+    stream.close()
+
+    # The only slot is free again: another call gets through and nothing is left running.
+    assert gateway.invoke(question("Another question")).content == SHORT_REPLY
+    deadline = time.monotonic() + 2
+    while gateway.stats()['cancelled'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = gateway.stats()
+    assert stats['cancelled'] == 1
+    assert stats['active'] == 0
+    assert not gateway._inflight
+    assert "llm-gateway" in {thread.name for thread in threading.enumerate()}